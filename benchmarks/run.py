@@ -0,0 +1,263 @@
+# 离线基准测试：使用合成数据和进程内假数据源，覆盖各条数据管线的热点路径
+#
+#   python benchmarks/run.py                       运行全部基准
+#   python benchmarks/run.py -k resample           只运行名称包含 resample 的基准
+#   python benchmarks/run.py --save bench.json     保存结果作为基线
+#   python benchmarks/run.py --baseline bench.json 与基线比较，变慢超过阈值时返回非零退出码
+#
+# 这里只计时，不检查结果是否正确；正确性由 tests/ 下的 pytest 测试负责
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+# 被测代码位于 src/，合成数据与假数据源位于 tests/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "tests")]
+
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+
+import pandas  # noqa: E402
+import yfinance  # noqa: E402
+
+import constituents  # noqa: E402
+import fundamentals  # noqa: E402
+import market_change  # noqa: E402
+import providers  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+import utils  # noqa: E402
+from sp500 import calculate_pe  # noqa: E402
+
+SYMBOLS = [index.symbol for index in market_change.INDEXES]
+# 约 100 年的日线数据
+HISTORY_START = "1925-01-01"
+HISTORY_END = "2025-07-01"
+# 合成成分股数量
+TICKER_COUNT = 5000
+# 模拟单次 .info 请求的网络延迟（秒）
+INFO_LATENCY = 0.005
+# 每个基准重复运行的次数
+REPEAT = 5
+# 与基线相比中位数耗时超过该倍数即视为性能退化
+REGRESSION_RATIO = 1.5
+
+BENCHMARKS = []
+
+
+def benchmark(repeat: int = REPEAT):
+    """
+    注册基准测试。被装饰的函数负责准备数据，并返回 (待计时的函数, 每次处理的条目数)
+    """
+
+    def decorator(setup):
+        BENCHMARKS.append((setup.__name__.removeprefix("bench_"), setup, repeat))
+        return setup
+
+    return decorator
+
+
+def synthetic_bars():
+    return synthetic.daily_bars(SYMBOLS, start=HISTORY_START, end=HISTORY_END)
+
+
+@benchmark()
+def bench_resample_changes():
+    close = synthetic_bars()["Close"]
+    return lambda: market_change.resample_changes(close), close.size
+
+
+@benchmark(repeat=3)
+def bench_full_download_to_csv():
+    fake = synthetic.FakeYFinance(synthetic_bars())
+
+    def run():
+        with mock.patch.object(yfinance, "download", fake.download):
+            market_change.download_to_csv(incremental=False)
+
+    return run, fake.bars["Close"].size
+
+
+@benchmark()
+def bench_incremental_download_to_csv():
+    bars = synthetic_bars()
+    fake = synthetic.FakeYFinance(bars.iloc[:-10])
+    with mock.patch.object(yfinance, "download", fake.download):
+        market_change.download_to_csv(incremental=False)
+    fake.bars = bars
+
+    def run():
+        with mock.patch.object(yfinance, "download", fake.download):
+            market_change.download_to_csv()
+
+    return run, len(SYMBOLS)
+
+
+@benchmark()
+def bench_calculate_weighted_pe():
+    infos = synthetic.ticker_infos(synthetic.ticker_symbols(TICKER_COUNT))
+    df = pandas.DataFrame(
+        [
+            {"Ticker": ticker, "MarketCap": info["marketCap"], "PE": info["trailingPE"]}
+            for ticker, info in infos.items()
+            if info["trailingPE"] is not None
+        ]
+    )
+    return lambda: calculate_pe.calculate_weighted_pe(df.copy()), len(df)
+
+
+@benchmark(repeat=3)
+def bench_get_stock_data():
+    tickers = synthetic.ticker_symbols(1000)
+    provider = synthetic.fake_info_provider(
+        synthetic.ticker_infos(tickers), latency=INFO_LATENCY
+    )
+
+    def run():
+        fundamentals.get_stock_data(
+            tickers, provider, bucket=fundamentals.TokenBucket(1e6, 1e6)
+        )
+
+    return run, len(tickers)
+
+
+@benchmark()
+def bench_scrape_tickers():
+    html = synthetic.constituents_html(synthetic.ticker_symbols(500))
+    fake = synthetic.FakeWikipedia({"S%26P_500": html})
+
+    def run():
+        with mock.patch.object(providers, "http_get", fake.get):
+            calculate_pe.get_sp500_tickers(refresh=True)
+
+    return run, 500
+
+
+@benchmark()
+def bench_parse_constituents():
+    html = synthetic.constituents_html(synthetic.ticker_symbols(500))
+    return lambda: constituents.parse_tickers(html, 0), 500
+
+
+def written_series() -> list[str]:
+    """确保合成数据已写入 data/csv，返回全部序列名称"""
+    if not os.path.exists(market_change.csv_path("sp500", "weekly")):
+        fake = synthetic.FakeYFinance(synthetic_bars())
+        with mock.patch.object(yfinance, "download", fake.download):
+            market_change.download_to_csv(incremental=False)
+    return [
+        market_change.series_name(index.prefix, freq)
+        for index in market_change.INDEXES
+        for freq in market_change.FREQ_RULES
+    ]
+
+
+@benchmark()
+def bench_load_csv():
+    names = written_series()
+
+    def run():
+        for name in names:
+            df = pandas.read_csv(storage.csv_path(name))
+            df["Date"] = pandas.to_datetime(df["Date"])
+
+    return run, len(names)
+
+
+@benchmark()
+def bench_load_series():
+    names = written_series()
+    storage.load_all(names)  # 首次加载时生成 Parquet
+    return lambda: storage.load_all(names), len(names)
+
+
+@benchmark(repeat=3)
+def bench_render_weekly_chart():
+    df = storage.load_series(written_series()[0])
+    output = os.path.join(tempfile.gettempdir(), "benchmark_chart.png")
+
+    def run():
+        utils.matplotlib_show(df.copy(), "合成指数", "weekly", output=output)
+
+    return run, len(df)
+
+
+def run_benchmarks(pattern: str | None = None) -> dict[str, dict]:
+    results = {}
+    for name, setup, repeat in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        # 被测函数的进度输出与警告不计入结果
+        with contextlib.redirect_stdout(io.StringIO()):
+            func, items = setup()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        results[name] = {
+            "min": min(timings),
+            "median": median,
+            "items": items,
+            "throughput": items / median if median else float("inf"),
+        }
+        print(
+            f"{name:<32} 中位数 {median * 1000:10.2f} ms  "
+            f"最快 {min(timings) * 1000:10.2f} ms  "
+            f"吞吐 {results[name]['throughput']:14,.0f} 条/秒"
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, ratio: float) -> list[str]:
+    """返回相对基线变慢超过 ratio 倍的基准名称"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        slowdown = result["median"] / baseline[name]["median"]
+        if slowdown > ratio:
+            print(f"性能退化: {name} 慢了 {slowdown:.2f} 倍")
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("-k", dest="pattern", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--save", help="把结果保存为 JSON 文件")
+    parser.add_argument("--baseline", help="与该 JSON 基线比较")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args()
+
+    # 在临时目录中运行，避免覆盖仓库中的 data/ 与 .cache/
+    save = os.path.abspath(args.save) if args.save else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            results = run_benchmarks(args.pattern)
+        finally:
+            os.chdir(cwd)
+
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            if compare(results, json.load(f), args.ratio):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import cross_market
+import market_change
+import storage
+from market_change import IndexSpec
+from risk_stats import PERIODS_PER_YEAR
+
+# 回测：每个策略对「参数组合 × 起始期」一次性计算，结果的每一行对应一组参数、每一列对应一个起始期。
+# 期限固定为 horizon 期，起始期为所有满足 起始期 + horizon 不超过序列末尾的期。
+
+
+@dataclass
+class SweepResult:
+    """
+    一次参数扫描的结果
+
+    multiples[c, s] 为第 c 组参数（params 的第 c 行）从 starts[s] 开始持有 horizon 期后
+    期末市值与累计投入之比
+    """
+
+    freq: str
+    horizon: int
+    starts: np.ndarray  # datetime64[ns]
+    params: pandas.DataFrame
+    multiples: np.ndarray
+
+    def annualized(self) -> np.ndarray:
+        """按期限折算的年化收益率（以累计投入计，定投时为近似值）"""
+        years = self.horizon / PERIODS_PER_YEAR[self.freq]
+        return self.multiples ** (1 / years) - 1
+
+    def summary(self) -> pandas.DataFrame:
+        """每组参数在所有起始期上的分布：平均、最差、P5、中位数与亏损概率"""
+        annualized = self.annualized()
+        stats = pandas.DataFrame(
+            {
+                "平均倍数": self.multiples.mean(axis=1),
+                "最差倍数": self.multiples.min(axis=1),
+                "P5 倍数": np.percentile(self.multiples, 5, axis=1),
+                "中位数倍数": np.median(self.multiples, axis=1),
+                "年化中位数": np.median(annualized, axis=1),
+                "亏损概率": (self.multiples < 1).mean(axis=1),
+            }
+        )
+        return pandas.concat([self.params.reset_index(drop=True), stats], axis=1)
+
+    def best(self, by: str = "中位数倍数", top: int = 10) -> pandas.DataFrame:
+        return self.summary().nlargest(top, by)
+
+
+def load_close(prefix: str, freq: str) -> pandas.Series:
+    """已保存序列的收盘价，以日期为索引；尚未结束的最后一期不参与回测"""
+    index = market_change.find_index(prefix)
+    df = storage.closed_periods(
+        storage.load_series(market_change.series_name(prefix, freq))
+    )
+    return df.set_index("Date")[index.symbol].astype(np.float64)
+
+
+def _starts(dates: np.ndarray, horizon: int) -> np.ndarray:
+    if len(dates) <= horizon:
+        raise ValueError(f"序列只有 {len(dates)} 期，不足以回测 {horizon} 期")
+    return dates[: len(dates) - horizon]
+
+
+def lump_sum(close: pandas.Series, freq: str, horizon: int) -> SweepResult:
+    """在起始期一次性买入并持有 horizon 期"""
+    prices = close.to_numpy()
+    starts = _starts(close.index.to_numpy(), horizon)
+    multiples = prices[horizon:] / prices[: len(starts)]
+    return SweepResult(
+        freq, horizon, starts, pandas.DataFrame({"策略": ["一次性"]}), multiples[None]
+    )
+
+
+def _strided_cumsum(values: np.ndarray, step: int) -> np.ndarray:
+    """步长为 step 的前缀和：out[t] = values[t] + values[t - step] + values[t - 2·step] + …"""
+    n = len(values)
+    padded = np.zeros(-(-n // step) * step)
+    padded[:n] = values
+    # 按 step 折成二维后沿列累加，同一列即同余类
+    return np.cumsum(padded.reshape(-1, step), axis=0).ravel()[:n]
+
+
+def dca(
+    close: pandas.Series,
+    freq: str,
+    horizon: int,
+    intervals=(1,),
+    amounts=(1.0,),
+    initial=(0.0,),
+) -> SweepResult:
+    """
+    定期定额投资：起始期先投入 initial，之后每 interval 期投入 amount，持有到第 horizon 期
+
+    期末市值 = initial·P[末] / P[起] + amount·P[末]·Σ 1/P[投入期]，
+    其中 Σ 1/P 对所有起始期用步长前缀和一次求出，参数组合之间只差一次广播。
+    """
+    prices = close.to_numpy()
+    starts = _starts(close.index.to_numpy(), horizon)
+    n_starts = len(starts)
+    s = np.arange(n_starts)
+    inverse = 1 / prices
+    end = prices[horizon:]
+    rows, multiples = [], []
+    for interval in intervals:
+        # 投入期为 s, s + interval, …，共 count 次，均早于第 horizon 期
+        count = -(-horizon // interval)
+        cumsum = _strided_cumsum(inverse, interval)
+        last = s + (count - 1) * interval
+        before = s - interval
+        units = cumsum[last] - np.where(before >= 0, cumsum[np.maximum(before, 0)], 0)
+        for amount, lump in itertools.product(amounts, initial):
+            value = lump * end / prices[:n_starts] + amount * end * units
+            multiples.append(value / (lump + amount * count))
+            rows.append(
+                {"策略": "定投", "间隔": interval, "每期金额": amount, "初始金额": lump}
+            )
+    return SweepResult(
+        freq, horizon, starts, pandas.DataFrame(rows), np.array(multiples)
+    )
+
+
+def rebalance(
+    close: pandas.DataFrame,
+    freq: str,
+    horizon: int,
+    weights,
+    thresholds=(0.05,),
+) -> SweepResult:
+    """
+    多个指数按目标权重配置，任一资产权重偏离目标超过阈值时整体再平衡
+
+    再平衡依赖路径，无法用前缀和求出；所有参数组合与起始期作为一个数组同时推进，
+    只对持有期内的 horizon 期循环。
+
+    Args:
+        close: 对齐后的收盘价，每列一个指数（见 cross_market.aligned_close）
+        weights: 目标权重列表，每项的长度与 close 的列数相同
+        thresholds: 触发再平衡的权重偏离；0 表示每期再平衡，inf 表示从不再平衡
+    """
+    prices = close.to_numpy()
+    starts = _starts(close.index.to_numpy(), horizon)
+    growth = prices[1:] / prices[:-1]  # 第 t 项为第 t 期到 t + 1 期的价格变化
+    combos = list(itertools.product(range(len(weights)), thresholds))
+    target = np.array([weights[w] for w, _ in combos], dtype=np.float64)
+    target /= target.sum(axis=1, keepdims=True)
+    band = np.array([t for _, t in combos], dtype=np.float64)
+
+    # holdings[a, c, s]：资产 a 在参数组合 c、起始期 s 下的市值，初始总额为 1。
+    # 资产放在第 0 维，求和与取最大值都是整块数组之间的逐元素运算
+    weights_t = target.T[:, :, None]
+    holdings = np.repeat(weights_t, len(starts), axis=2)
+    rebalances = np.zeros(holdings.shape[1:], dtype=np.int32)
+    growth_t = growth.T
+    s = np.arange(len(starts))
+    # 循环内的中间结果写入预先分配的数组，避免每期重新分配
+    total = np.empty(holdings.shape[1:])
+    drift = np.empty_like(total)
+    trigger = np.empty(total.shape, dtype=bool)
+    buffer = np.empty_like(holdings)
+    for step in range(horizon):
+        holdings *= growth_t[:, None, s + step]
+        holdings.sum(axis=0, out=total)
+        np.divide(holdings, total, out=buffer)
+        buffer -= weights_t
+        np.abs(buffer, out=buffer)
+        buffer.max(axis=0, out=drift)
+        np.greater(drift, band[:, None], out=trigger)
+        if trigger.any():
+            np.multiply(total, weights_t, out=buffer)
+            np.copyto(holdings, buffer, where=trigger)
+            rebalances += trigger
+
+    params = pandas.DataFrame(
+        {
+            "策略": "再平衡",
+            "权重": [
+                "/".join(f"{w:.0%}" for w in target[c]) for c in range(len(combos))
+            ],
+            "阈值": band,
+            "平均再平衡次数": rebalances.mean(axis=1),
+        }
+    )
+    return SweepResult(freq, horizon, starts, params, holdings.sum(axis=0))
+
+
+def weight_grid(assets: int, step: float = 0.1) -> list[tuple]:
+    """步长为 step、总和为 1 的全部权重组合"""
+    units = round(1 / step)
+    return [
+        tuple(c / units for c in combo)
+        for combo in itertools.product(range(units + 1), repeat=assets)
+        if sum(combo) == units
+    ]
+
+
+def main(
+    freq: str = "monthly",
+    years: int = 10,
+    indexes: list[IndexSpec] = market_change.INDEXES,
+):
+    horizon = years * PERIODS_PER_YEAR[freq]
+    label = market_change.FREQ_LABELS[freq][0]
+    with pandas.option_context(
+        "display.float_format", "{:.2f}".format, "display.width", 160
+    ):
+        for index in indexes:
+            close = load_close(index.prefix, freq)
+            lump = lump_sum(close, freq, horizon)
+            plans = dca(close, freq, horizon, intervals=(1, 3, 12))
+            print(
+                f"\n{index.name}：持有 {years} 年，{label}数据，"
+                f"{len(lump.starts)} 个起始期"
+            )
+            print(pandas.concat([lump.summary(), plans.summary()]).to_string())
+
+        close = storage.closed_periods(
+            cross_market.aligned_close(freq, indexes).reset_index()
+        ).set_index("Date")
+        result = rebalance(
+            close,
+            freq,
+            horizon,
+            weight_grid(close.shape[1], 0.1),
+            thresholds=(0.0, 0.05, 0.1, 0.2, np.inf),
+        )
+        print(
+            f"\n{'/'.join(close.columns)} 再平衡：{len(result.params)} 组参数 × "
+            f"{len(result.starts)} 个起始期，按中位数倍数排序的前 10 组"
+        )
+        print(result.best().to_string())
+
+
+if __name__ == "__main__":
+    main()
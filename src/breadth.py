@@ -0,0 +1,122 @@
+import os
+
+import pandas
+
+import constituent_prices
+import storage
+from constituent_prices import PriceMatrix
+
+# 市场宽度指标，每个交易日一行，保存到 data/csv/<指数>_breadth.csv
+# 均线窗口（交易日）
+MA_WINDOWS = (50, 200)
+# 新高 / 新低的回看窗口（交易日），约一年
+HIGH_LOW_WINDOW = 252
+# 计算某一天的指标最多需要之前多少行数据
+LOOKBACK = max(*MA_WINDOWS, HIGH_LOW_WINDOW)
+
+
+def series_name(index: str) -> str:
+    return f"{index}_breadth"
+
+
+def compute(close: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    由 日期 × 股票 的收盘价计算宽度指标
+
+    窗口未满的股票不计入对应指标；涨跌线为 上涨家数 - 下跌家数 的累计值。
+    """
+    change = close.pct_change(fill_method=None)
+    advances = (change > 0).sum(axis=1)
+    declines = (change < 0).sum(axis=1)
+    result = pandas.DataFrame(
+        {
+            "上涨家数": advances,
+            "下跌家数": declines,
+            "涨跌线": (advances - declines).cumsum(),
+        }
+    )
+    for window in MA_WINDOWS:
+        ma = close.rolling(window).mean()
+        valid = ma.notna().sum(axis=1)
+        above = (close > ma).sum(axis=1)
+        result[f"高于{window}日均线比例"] = (
+            above / valid.where(valid > 0) * 100
+        ).round(2)
+    high = close.rolling(HIGH_LOW_WINDOW).max()
+    low = close.rolling(HIGH_LOW_WINDOW).min()
+    result["创新高家数"] = (close >= high).sum(axis=1)
+    result["创新低家数"] = (close <= low).sum(axis=1)
+    result.index.name = "Date"
+    return result.reset_index()
+
+
+def refresh(
+    index: str, matrix: PriceMatrix, first_changed: int, tickers: list[str]
+) -> pandas.DataFrame:
+    """
+    重新计算从第 first_changed 行开始的宽度指标，与已保存的结果合并
+
+    只读取 first_changed 之前 LOOKBACK 行及之后的数据，每日更新时读取量与历史长度无关。
+
+    Args:
+        tickers: 参与统计的股票（当前成分股）；矩阵中已移出成分股的列不计入
+    """
+    path = storage.csv_path(series_name(index))
+    stored = None
+    if os.path.exists(path) and first_changed > 0:
+        stored = pandas.read_csv(path, parse_dates=["Date"])
+    if stored is None or stored.empty:
+        first_changed = 0
+    first_changed = min(first_changed, len(matrix.dates) - 1)
+
+    columns = [matrix.tickers.index(t) for t in tickers if t in matrix.tickers]
+    start = max(first_changed - LOOKBACK, 0)
+    frame = matrix.frame(start).iloc[:, columns]
+    boundary = pandas.Timestamp(matrix.dates[first_changed])
+    fresh = compute(frame)
+    fresh = fresh[fresh["Date"] >= boundary].reset_index(drop=True)
+    if first_changed > 0:
+        # 涨跌线接续边界之前最后一个已保存的值
+        stored = stored[stored["Date"] < boundary]
+        ad_start = float(stored["涨跌线"].iloc[-1]) if not stored.empty else 0.0
+        net = fresh["上涨家数"] - fresh["下跌家数"]
+        fresh["涨跌线"] = ad_start + net.cumsum()
+        result = pandas.concat([stored, fresh], ignore_index=True)
+    else:
+        result = fresh
+
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    result.to_csv(tmp_path, index=False, date_format="%Y-%m-%d")
+    os.replace(tmp_path, path)
+    return result
+
+
+def format_latest(result: pandas.DataFrame) -> list[str]:
+    row = result.iloc[-1]
+    lines = [
+        f"日期: {row['Date']:%Y-%m-%d}",
+        f"上涨 / 下跌: {row['上涨家数']:.0f} / {row['下跌家数']:.0f}，"
+        f"涨跌线 {row['涨跌线']:,.0f}",
+    ]
+    for window in MA_WINDOWS:
+        lines.append(f"高于 {window} 日均线: {row[f'高于{window}日均线比例']:.1f}%")
+    lines.append(
+        f"{HIGH_LOW_WINDOW} 日新高 / 新低: "
+        f"{row['创新高家数']:.0f} / {row['创新低家数']:.0f}"
+    )
+    return lines
+
+
+def update(index: str, tickers: list[str]) -> pandas.DataFrame:
+    """增量下载成分股价格并刷新宽度指标"""
+    matrix, first_changed = constituent_prices.update(index, tickers)
+    path = storage.csv_path(series_name(index))
+    if first_changed >= len(matrix.dates) and os.path.exists(path):
+        print(f"{index}: 成分股价格没有新的数据")
+        return pandas.read_csv(path, parse_dates=["Date"])
+    result = refresh(index, matrix, first_changed, tickers)
+    print(f"\n{index} 市场宽度（{len(tickers)} 支成分股）:")
+    for line in format_latest(result):
+        print(f"  {line}")
+    return result
@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 缓存文件位置（已在 .gitignore 中忽略）
+CACHE_PATH = ".cache/cache.sqlite3"
+# 最多保留的条目数，超出后按最近访问时间淘汰
+MAX_ENTRIES = 20000
+
+# 各类数据的默认有效期（秒）
+INFO_TTL = 6 * 60 * 60  # 股票基本面
+TICKERS_TTL = 24 * 60 * 60  # 成分股列表
+
+
+class DiskCache:
+    """
+    基于 SQLite 的持久化缓存，每个条目有独立的过期时间，超出容量时按 LRU 淘汰
+
+    Args:
+        path: 缓存文件路径
+        max_entries: 最多保留的条目数
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+        )
+
+    def get(self, key: str, default=None):
+        """读取未过期的条目，不存在或已过期时返回 default"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                return default
+            self.conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        """写入条目，ttl 秒后过期"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if count > self.max_entries:
+                self._evict(count - self.max_entries, now)
+
+    def _evict(self, excess: int, now: float):
+        """先清理过期条目，仍然超出容量时删除最久未访问的条目"""
+        excess -= self.conn.execute(
+            "DELETE FROM cache WHERE expires < ?", (now,)
+        ).rowcount
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+
+    def delete(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache")
+
+
+_default_cache = None
+
+
+def get_cache() -> DiskCache:
+    """返回进程内共享的默认缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DiskCache()
+    return _default_cache
@@ -0,0 +1,234 @@
+import datetime
+import json
+import os
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import metrics
+import providers
+
+# 成分股日线收盘价：data/prices/<指数>/ 下一个 日期 × 股票 的 float32 稠密矩阵（按行存储的原始二进制文件），
+# 可直接用 numpy.memmap 打开；meta.json 记录数据文件名、日期与股票代码。
+# 新的交易日追加在文件末尾，只有成分股增加新股票时才重写整个文件。
+PRICES_DIR = "data/prices"
+# 首次下载的起始日期
+HISTORY_START = "2000-01-01"
+# 每次 yf.download 请求的股票数；分块依次下载，yfinance 内部已按股票多线程下载，
+# 且 providers.download 会串行化所有 yf.download 调用
+CHUNK_SIZE = 100
+# 增量更新时重新下载最近若干天，修正最后一个交易日盘中或未复权的数据
+OVERLAP_DAYS = 7
+DTYPE = np.float32
+
+
+@dataclass
+class PriceMatrix:
+    """close[i, j] 为 dates[i] 当天 tickers[j] 的复权收盘价，缺失为 NaN"""
+
+    dates: np.ndarray  # datetime64[D]
+    tickers: list[str]
+    close: np.ndarray  # numpy.memmap，形状 (日期, 股票)
+
+    def frame(self, start: int = 0) -> pandas.DataFrame:
+        """从第 start 行开始的数据，只读取这些行"""
+        return pandas.DataFrame(
+            np.asarray(self.close[start:]),
+            index=pandas.DatetimeIndex(self.dates[start:], name="Date"),
+            columns=self.tickers,
+        )
+
+
+def _dir(index: str) -> str:
+    return os.path.join(PRICES_DIR, index)
+
+
+def _meta_path(index: str) -> str:
+    return os.path.join(_dir(index), "meta.json")
+
+
+def _read_meta(index: str) -> dict | None:
+    path = _meta_path(index)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(index: str, file: str, dates: np.ndarray, tickers: list[str]):
+    path = _meta_path(index)
+    tmp_path = f"{path}.tmp"
+    meta = {
+        "file": file,
+        "dates": np.datetime_as_string(dates, unit="D").tolist(),
+        "tickers": tickers,
+    }
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+
+def load(index: str, mode: str = "r") -> PriceMatrix | None:
+    """以内存映射方式打开已保存的矩阵，不读取数据本身；尚未下载时返回 None"""
+    meta = _read_meta(index)
+    if meta is None:
+        return None
+    dates = np.array(meta["dates"], dtype="datetime64[D]")
+    close = np.memmap(
+        os.path.join(_dir(index), meta["file"]),
+        dtype=DTYPE,
+        mode=mode,
+        shape=(len(dates), len(meta["tickers"])),
+    )
+    return PriceMatrix(dates, meta["tickers"], close)
+
+
+def _download_chunk(tickers: list[str], start: str) -> pandas.DataFrame:
+    # 已退市或改名的股票没有数据属于正常情况，只有整块都没有数据时才算失败
+    data = providers.download(tickers, start=start, require_all=False)
+    if data.empty:
+        return pandas.DataFrame(columns=tickers, dtype=DTYPE)
+    close = data["Close"]
+    if isinstance(close, pandas.Series):
+        close = close.to_frame(tickers[0])
+    close.index = pandas.DatetimeIndex(close.index).tz_localize(None).normalize()
+    return close.astype(DTYPE)
+
+
+def download(
+    tickers: list[str], start: str, chunk_size: int = CHUNK_SIZE
+) -> pandas.DataFrame:
+    """分块批量下载多只股票的日线收盘价，返回 日期 × 股票 的 DataFrame，列顺序与 tickers 相同"""
+    with metrics.span("prices.download"):
+        frames = [
+            _download_chunk(tickers[i : i + chunk_size], start)
+            for i in range(0, len(tickers), chunk_size)
+        ]
+    close = pandas.concat(frames, axis=1).sort_index()
+    # 没有返回数据的股票（已退市、代码错误）保留为全 NaN 列
+    return close.reindex(columns=tickers)
+
+
+def _write_full(index: str, close: pandas.DataFrame) -> PriceMatrix:
+    """写入新的数据文件并切换 meta.json，最后删除旧文件"""
+    os.makedirs(_dir(index), exist_ok=True)
+    old = _read_meta(index)
+    file = f"close-{uuid.uuid4().hex[:8]}.f32"
+    close.to_numpy(dtype=DTYPE).tofile(os.path.join(_dir(index), file))
+    dates = close.index.to_numpy(dtype="datetime64[D]")
+    _write_meta(index, file, dates, list(close.columns))
+    if old is not None:
+        os.remove(os.path.join(_dir(index), old["file"]))
+    return load(index)
+
+
+def _add_tickers(
+    index: str, stored: PriceMatrix, new: list[str], missing: list[str]
+) -> PriceMatrix | None:
+    """
+    下载新增股票与缺少历史的股票的完整历史，与已有数据合并后重写文件
+
+    缺少历史的股票这次仍然没有取到数据时保留原列；没有需要写入的列时返回 None
+    """
+    try:
+        fresh = download(new + missing, HISTORY_START)
+    except providers.IncompleteDownloadError:
+        if new:
+            raise
+        print(f"{index}: 仍未取到 {', '.join(missing)} 的历史数据")
+        return None
+    recovered = [t for t in missing if fresh[t].notna().any()]
+    if not new and not recovered:
+        print(f"{index}: 仍未取到 {', '.join(missing)} 的历史数据")
+        return None
+    # 已有日期之后的行由随后的增量下载统一写入，否则其他股票在这些日期上会缺少数据
+    fresh = fresh[fresh.index <= pandas.Timestamp(stored.dates[-1])]
+    close = stored.frame().drop(columns=recovered)
+    close = close.join(fresh[new + recovered], how="outer")
+    return _write_full(index, close)
+
+
+def _missing_history(stored: PriceMatrix, tickers: list[str], start: str) -> list[str]:
+    """
+    在 start 之前没有任何数据的已有股票
+
+    首次下载时整块被限流的股票整列为 NaN，之后的增量更新只下载最近几天，
+    不补回历史就会一直缺失
+    """
+    rows = int(np.searchsorted(stored.dates, np.datetime64(start, "D")))
+    position = {ticker: j for j, ticker in enumerate(stored.tickers)}
+    columns = [position[t] for t in tickers if t in position]
+    if rows == 0 or not columns:
+        return []
+    empty = np.isnan(stored.close[:rows, columns]).all(axis=0)
+    return [stored.tickers[j] for j, e in zip(columns, empty) if e]
+
+
+def _overlap_start(stored: PriceMatrix) -> str:
+    last = stored.dates[-1].astype(datetime.date)
+    return (last - datetime.timedelta(days=OVERLAP_DAYS)).strftime("%Y-%m-%d")
+
+
+def update(index: str, tickers: list[str]) -> tuple[PriceMatrix, int]:
+    """
+    下载并保存成分股收盘价：首次运行下载完整历史，之后只下载最近几天
+
+    已有日期的行在原文件中就地覆盖，新的交易日追加到文件末尾。新增成分股，
+    以及之前下载失败、没有历史数据的股票，下载完整历史后重写整个文件。
+
+    Returns:
+        更新后的矩阵，以及第一个被写入的行号（之前的行未变化，可用于增量计算）
+    """
+    stored = load(index)
+    if stored is None:
+        print(f"{index}: 下载 {len(tickers)} 支成分股自 {HISTORY_START} 起的日线")
+        return _write_full(index, download(tickers, HISTORY_START)), 0
+
+    stored_tickers = set(stored.tickers)
+    new = [t for t in tickers if t not in stored_tickers]
+    missing = _missing_history(stored, tickers, _overlap_start(stored))
+    first_changed = len(stored.dates)
+    if new or missing:
+        if new:
+            print(f"{index}: 新增成分股 {', '.join(new)}，重写价格矩阵")
+        if missing:
+            print(f"{index}: 补全没有历史数据的 {', '.join(missing)}")
+        rewritten = _add_tickers(index, stored, new, missing)
+        if rewritten is not None:
+            stored = rewritten
+            first_changed = 0
+
+    start = _overlap_start(stored)
+    fresh = download(stored.tickers, start)
+    fresh = fresh[fresh.index >= pandas.Timestamp(start)]
+    if fresh.empty:
+        return stored, first_changed
+    fresh_dates = fresh.index.to_numpy(dtype="datetime64[D]")
+    values = fresh.to_numpy(dtype=DTYPE)
+
+    # 与已有日期重叠的行就地覆盖；本次没有取到的值（NaN）保留原值
+    overlap = fresh_dates <= stored.dates[-1]
+    rows = np.searchsorted(stored.dates, fresh_dates[overlap])
+    known = (
+        stored.dates[np.minimum(rows, len(stored.dates) - 1)] == fresh_dates[overlap]
+    )
+    if known.any():
+        writable = load(index, mode="r+")
+        previous = writable.close[rows[known]]
+        latest = values[overlap][known]
+        writable.close[rows[known]] = np.where(np.isnan(latest), previous, latest)
+        writable.close.flush()
+        first_changed = min(first_changed, int(rows[known].min()))
+
+    # 新的交易日追加到文件末尾，再更新 meta.json 中的日期
+    appended = ~overlap
+    if appended.any():
+        meta = _read_meta(index)
+        with open(os.path.join(_dir(index), meta["file"]), "ab") as f:
+            values[appended].tofile(f)
+        dates = np.concatenate([stored.dates, fresh_dates[appended]])
+        _write_meta(index, meta["file"], dates, stored.tickers)
+        first_changed = min(first_changed, len(stored.dates))
+    return load(index), first_changed
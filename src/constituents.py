@@ -0,0 +1,222 @@
+import csv
+import datetime
+import html
+import json
+import os
+import re
+from dataclasses import dataclass
+
+import providers
+
+# 成分股快照目录：每个列表一个子目录，内含按日期命名的快照、变动记录和 HTTP 缓存状态
+SNAPSHOT_DIR = "data/constituents"
+# 解析出的成分股数量低于最新快照的该比例时视为页面结构变化导致的解析错误，不保存
+MIN_COUNT_RATIO = 0.9
+
+
+@dataclass(frozen=True)
+class ConstituentSource:
+    """成分股列表定义"""
+
+    key: str  # 快照子目录名，如 'sp500'
+    url: str  # 维基百科页面
+    column: int  # 成分股表格中股票代码所在列
+    name: str  # 展示用名称
+    table_id: str = "constituents"
+
+
+SOURCES = {
+    "sp500": ConstituentSource(
+        "sp500",
+        "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies",
+        0,
+        "标普 500",
+    ),
+    "nasdaq100": ConstituentSource(
+        "nasdaq100", "https://en.wikipedia.org/wiki/Nasdaq-100", 1, "纳斯达克 100"
+    ),
+}
+
+_TABLE_TAG = re.compile(r"<(/?)table\b[^>]*>", re.IGNORECASE)
+_ROW = re.compile(r"<tr\b[^>]*>(.*?)(?=<tr\b|</table>)", re.IGNORECASE | re.DOTALL)
+_CELL = re.compile(r"<(t[dh])\b([^>]*)>(.*?)</\1>", re.IGNORECASE | re.DOTALL)
+_COLSPAN = re.compile(r"\bcolspan\b", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+
+
+def extract_table(page: str, table_id: str = "constituents") -> str | None:
+    """只截取页面中 id 为 table_id 的表格（包含嵌套表格），找不到时返回 None"""
+    opening = re.search(
+        rf"<table\b[^>]*\bid\s*=\s*[\"']?{re.escape(table_id)}[\"'\s>]",
+        page,
+        re.IGNORECASE,
+    )
+    if opening is None:
+        return None
+    depth = 0
+    for tag in _TABLE_TAG.finditer(page, opening.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return page[opening.start() : tag.end()]
+    return page[opening.start() :]
+
+
+def _normalize(ticker: str) -> str:
+    # yfinance 有时需要将 . 替换为 - (例如 BRK.B -> BRK-B)
+    return ticker.replace(".", "-")
+
+
+def parse_tickers(page: str, column: int, table_id: str = "constituents") -> list[str]:
+    """
+    从页面中解析成分股代码
+
+    先用正则只扫描成分股表格；表格结构不符合预期时，再用 BeautifulSoup 解析该表格片段。
+    """
+    table = extract_table(page, table_id)
+    if table is None:
+        raise ValueError(f"页面中没有 id 为 {table_id} 的表格")
+
+    tickers = []
+    for row in _ROW.findall(table):
+        cells = _CELL.findall(row)
+        if not any(tag.lower() == "td" for tag, _, _ in cells):
+            continue  # 跳过表头
+        if len(cells) <= column or _COLSPAN.search(cells[column][1]):
+            continue  # 跨列的说明行等，不是成分股；不能因此停止，否则会截断列表
+        text = html.unescape(_TAG.sub("", cells[column][2])).strip()
+        tickers.append(_normalize(text))
+    if tickers and all(tickers):
+        return tickers
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(table, "html.parser")
+    rows = [row.find_all("td") for row in soup.find_all("tr")]
+    return [
+        _normalize(cells[column].text.strip())
+        for cells in rows
+        if len(cells) > column and not cells[column].has_attr("colspan")
+    ]
+
+
+def _source_dir(source: ConstituentSource) -> str:
+    return os.path.join(SNAPSHOT_DIR, source.key)
+
+
+def _load_state(source: ConstituentSource) -> dict:
+    path = os.path.join(_source_dir(source), "state.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(source: ConstituentSource, state: dict):
+    with open(
+        os.path.join(_source_dir(source), "state.json"), "w", encoding="utf-8"
+    ) as f:
+        json.dump(state, f, indent=2)
+
+
+def snapshot_dates(source: ConstituentSource) -> list[str]:
+    """已保存快照的日期（YYYY-MM-DD），按时间排序"""
+    directory = _source_dir(source)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name[:-4]
+        for name in os.listdir(directory)
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}\.csv", name)
+    )
+
+
+def load_snapshot(
+    source: ConstituentSource, date: str | None = None
+) -> list[str] | None:
+    """读取指定日期当天或之前最近的一份快照；date 为 None 时读取最新快照"""
+    dates = [d for d in snapshot_dates(source) if date is None or d <= date]
+    if not dates:
+        return None
+    with open(
+        os.path.join(_source_dir(source), f"{dates[-1]}.csv"), encoding="utf-8"
+    ) as f:
+        return [row["Ticker"] for row in csv.DictReader(f)]
+
+
+def save_snapshot(
+    source: ConstituentSource, tickers: list[str], date: str | None = None
+):
+    """
+    与最新快照比较：有变动时保存新的快照，并把新增/移除的代码追加到 changes.csv
+
+    Returns:
+        (新增的代码, 移除的代码)
+    """
+    date = date or datetime.date.today().strftime("%Y-%m-%d")
+    previous = load_snapshot(source)
+    added = sorted(set(tickers) - set(previous or []))
+    removed = sorted(set(previous or []) - set(tickers))
+    if previous is not None and not added and not removed:
+        return added, removed
+
+    directory = _source_dir(source)
+    os.makedirs(directory, exist_ok=True)
+    with open(
+        os.path.join(directory, f"{date}.csv"), "w", encoding="utf-8", newline=""
+    ) as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["Ticker"])
+        writer.writerows([ticker] for ticker in tickers)
+
+    if previous is not None:
+        changes_path = os.path.join(directory, "changes.csv")
+        new_file = not os.path.exists(changes_path)
+        with open(changes_path, "a", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            if new_file:
+                writer.writerow(["Date", "Change", "Ticker"])
+            writer.writerows([date, "added", ticker] for ticker in added)
+            writer.writerows([date, "removed", ticker] for ticker in removed)
+        print(f"{source.name} 成分股变动：新增 {added}，移除 {removed}")
+    return added, removed
+
+
+def get_tickers(source: ConstituentSource, get=None) -> list[str]:
+    """
+    获取成分股列表：带 ETag/Last-Modified 条件请求，页面未变化（304）时直接使用最新快照
+
+    Args:
+        source: 成分股列表定义
+        get: 发起 HTTP GET 的函数，签名与 requests.get 相同，默认使用 providers.http_get
+    """
+    get = get or providers.http_get
+    state = _load_state(source)
+    latest = load_snapshot(source)
+    headers = {}
+    if latest is not None:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
+
+    response = get(source.url, headers=headers)
+    if response.status_code == 304 and latest is not None:
+        print(f"{source.name} 成分股页面未变化，使用最新快照，共 {len(latest)} 个。")
+        return latest
+    response.raise_for_status()
+
+    tickers = parse_tickers(response.text, source.column, source.table_id)
+    if latest is not None and len(tickers) < len(latest) * MIN_COUNT_RATIO:
+        raise ValueError(
+            f"{source.name} 只解析出 {len(tickers)} 个成分股，"
+            f"最新快照有 {len(latest)} 个，页面结构可能已变化"
+        )
+    save_snapshot(source, tickers)
+    _save_state(
+        source,
+        {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        },
+    )
+    return tickers
@@ -0,0 +1,196 @@
+import os
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import market_change
+import storage
+from market_change import IndexSpec
+from risk_stats import ROLLING_WINDOWS
+
+# 预先计算的跨市场矩阵：data/cross_market/<频率>.npz，可由 CSV 重建，不提交到仓库
+CROSS_MARKET_DIR = "data/cross_market"
+# 立方体第二维的指标：相关系数、beta（行指数相对列指数）、相对强弱（行指数 / 列指数，首日为 1）
+METRICS = ("correlation", "beta", "relative_strength")
+
+
+@dataclass
+class CrossMarketCube:
+    """
+    按日期索引的跨市场指标立方体
+
+    values[t, m, i, j] 为第 t 期、指标 METRICS[m] 中指数 i 相对指数 j 的值，窗口未满时为 NaN
+    """
+
+    freq: str
+    window: int
+    dates: np.ndarray  # datetime64[ns]
+    symbols: list[str]
+    values: np.ndarray  # float32，形状 (日期, 指标, 指数, 指数)
+
+    def matrix(self, metric: str = "correlation", date=None) -> pandas.DataFrame:
+        """某一天（默认最新一期）的指标矩阵；date 不是序列中的日期时取之前最近的一期"""
+        t = len(self.dates) - 1
+        if date is not None:
+            t = int(np.searchsorted(self.dates, np.datetime64(date, "ns"), "right")) - 1
+        return pandas.DataFrame(
+            self.values[t, METRICS.index(metric)],
+            index=self.symbols,
+            columns=self.symbols,
+        )
+
+    def series(self, metric: str, symbol: str, other: str) -> pandas.Series:
+        """两个指数之间某个指标的时间序列"""
+        i, j = self.symbols.index(symbol), self.symbols.index(other)
+        return pandas.Series(
+            self.values[:, METRICS.index(metric), i, j],
+            index=pandas.DatetimeIndex(self.dates, name="Date"),
+            name=f"{symbol}/{other}",
+        )
+
+
+def aligned_close(
+    freq: str, indexes: list[IndexSpec] = market_change.INDEXES
+) -> pandas.DataFrame:
+    """把各指数同一频率的收盘价对齐到共同的日期：只保留所有指数都有数据的期"""
+    columns = {}
+    for index in indexes:
+        df = storage.load_series(market_change.series_name(index.prefix, freq))
+        columns[index.symbol] = df.set_index("Date")[index.symbol].astype(np.float64)
+    return pandas.DataFrame(columns).dropna()
+
+
+def _rolling_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """沿第 0 维的滑动窗口和，第 t 项为 values[t - window + 1 : t + 1] 之和，窗口未满时为 NaN"""
+    cumsum = np.cumsum(values, axis=0)
+    sums = np.full_like(cumsum, np.nan)
+    sums[window - 1] = cumsum[window - 1]
+    sums[window:] = cumsum[window:] - cumsum[:-window]
+    return sums
+
+
+def compute_cube(close: pandas.DataFrame, freq: str, window: int) -> CrossMarketCube:
+    """
+    一次性计算所有指数两两之间的滚动相关系数、beta 和相对强弱
+
+    收益率矩阵 R（期数 × 指数）的滚动协方差由 ΣR 与 Σ(Rᵢ·Rⱼ) 的前缀和得到，不需要逐个窗口循环。
+    """
+    prices = close.to_numpy()
+    n_dates, n = prices.shape
+    returns = np.zeros_like(prices)
+    returns[1:] = prices[1:] / prices[:-1] - 1
+
+    values = np.full((n_dates, len(METRICS), n, n), np.nan, dtype=np.float32)
+    # 收益率从第 1 期开始，因此窗口至少要覆盖 window 个收益率
+    if n_dates > window:
+        r = returns[1:]
+        s = _rolling_sums(r, window)  # (期数 - 1, 指数)
+        sxy = _rolling_sums(r[:, :, None] * r[:, None, :], window)
+        cov = (sxy - s[:, :, None] * s[:, None, :] / window) / (window - 1)
+        var = np.diagonal(cov, axis1=1, axis2=2)  # (期数 - 1, 指数)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.sqrt(var)
+            values[1:, 0] = cov / (std[:, :, None] * std[:, None, :])
+            values[1:, 1] = cov / var[:, None, :]
+
+    normalized = prices / prices[0]
+    values[:, 2] = normalized[:, :, None] / normalized[:, None, :]
+    return CrossMarketCube(
+        freq,
+        window,
+        close.index.to_numpy(dtype="datetime64[ns]"),
+        list(close.columns),
+        values,
+    )
+
+
+def cube_path(freq: str) -> str:
+    return os.path.join(CROSS_MARKET_DIR, f"{freq}.npz")
+
+
+def _source_key(freq: str, indexes: list[IndexSpec]) -> str:
+    """各指数该频率 CSV 的内容摘要，与立方体一起保存，用于判断是否需要重新计算"""
+    return storage.source_key(
+        *(
+            storage.csv_path(market_change.series_name(index.prefix, freq))
+            for index in indexes
+        )
+    )
+
+
+def save_cube(cube: CrossMarketCube, source: str = ""):
+    os.makedirs(CROSS_MARKET_DIR, exist_ok=True)
+    path = cube_path(cube.freq)
+    # np.savez 会自动补上 .npz 扩展名，临时文件名需要以 .npz 结尾；
+    # 每次写入使用不同的临时文件，并发重建时不会写到同一个文件
+    tmp_path = f"{path[: -len('.npz')]}.{uuid.uuid4().hex}.tmp.npz"
+    np.savez(
+        tmp_path,
+        window=cube.window,
+        dates=cube.dates,
+        symbols=np.array(cube.symbols),
+        values=cube.values,
+        source=source,
+    )
+    os.replace(tmp_path, path)
+
+
+def build(
+    freq: str, indexes: list[IndexSpec] = market_change.INDEXES
+) -> CrossMarketCube:
+    """从已保存的指数序列计算并保存某个频率的立方体"""
+    source = _source_key(freq, indexes)
+    cube = compute_cube(aligned_close(freq, indexes), freq, ROLLING_WINDOWS[freq])
+    save_cube(cube, source)
+    return cube
+
+
+def build_all(indexes: list[IndexSpec] = market_change.INDEXES) -> dict:
+    return {freq: build(freq, indexes) for freq in market_change.FREQ_RULES}
+
+
+def load_cube(
+    freq: str, indexes: list[IndexSpec] = market_change.INDEXES
+) -> CrossMarketCube:
+    """
+    加载预先计算的立方体；文件不存在、指数集合不同或任一指数的 CSV 内容变化时重新计算
+    """
+    path = cube_path(freq)
+    symbols = [index.symbol for index in indexes]
+    if os.path.exists(path):
+        with np.load(path) as data:
+            if (
+                data["symbols"].tolist() == symbols
+                and "source" in data
+                and str(data["source"]) == _source_key(freq, indexes)
+            ):
+                return CrossMarketCube(
+                    freq,
+                    int(data["window"]),
+                    data["dates"],
+                    symbols,
+                    data["values"],
+                )
+    return build(freq, indexes)
+
+
+def print_latest(cube: CrossMarketCube):
+    """打印最新一期的相关系数与 beta 矩阵"""
+    date = pandas.Timestamp(cube.dates[-1])
+    label = market_change.FREQ_LABELS[cube.freq][0]
+    with pandas.option_context("display.float_format", "{:.2f}".format):
+        print(f"\n{label}收益率滚动 {cube.window} 期相关系数（截至 {date:%Y-%m-%d}）:")
+        print(cube.matrix("correlation"))
+        print("beta（行指数相对列指数）:")
+        print(cube.matrix("beta"))
+
+
+def main(indexes: list[IndexSpec] = market_change.INDEXES):
+    for cube in build_all(indexes).values():
+        print_latest(cube)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# 基于 data/csv 的 Streamlit 看板：在仓库根目录运行 streamlit run src/dashboard.py
+#
+# 所有读取都以文件修改时间作为缓存键：文件未变化时各个会话共享同一份缓存结果，
+# 定时任务更新某个 CSV 后只有该序列会被重新读取。
+import os
+
+import numpy as np
+import pandas
+import streamlit as st
+
+import market_change
+import pe_history
+import pyramid
+import risk_stats
+import storage
+
+# 折线图最多绘制的点数：从多分辨率金字塔中选取区间内不超过该点数的最细级别
+MAX_POINTS = 1500
+# 变化率分布的直方图分箱数
+HISTOGRAM_BINS = 60
+# 加权市盈率历史：展示名称 -> 序列名称
+PE_HISTORY = {
+    "标普 500": "sp500_weighted_pe_history",
+    "纳斯达克 100": "nasdaq100_weighted_pe_history",
+}
+
+
+def _mtime(path: str) -> float:
+    return os.path.getmtime(path) if os.path.exists(path) else 0.0
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _load_series(name: str, mtime: float) -> pandas.DataFrame:
+    return storage.load_series(name)
+
+
+def load_series(name: str) -> pandas.DataFrame:
+    """加载指数序列，文件修改时间作为缓存键的一部分"""
+    return _load_series(name, _mtime(storage.csv_path(name)))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _chart_window(
+    prefix: str, mtime: float, start, end
+) -> tuple[str, pandas.DataFrame]:
+    level, df = pyramid.load(prefix).query(start, end, MAX_POINTS)
+    df = df[(df["Date"] >= start) & (df["Date"] <= end)]
+    return level, df.rename(columns={"last": "收盘", "min": "最低", "max": "最高"})
+
+
+def chart_window(prefix: str, start, end) -> tuple[str, pandas.DataFrame]:
+    """日期区间内按点数选取级别的收盘价及每个周期的最低 / 最高收盘价，用于折线图"""
+    name = market_change.series_name(prefix, pyramid.BASE_FREQ)
+    return _chart_window(prefix, _mtime(storage.csv_path(name)), start, end)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _histogram(name: str, mtime: float, start, end) -> pandas.DataFrame:
+    df = _load_series(name, mtime)
+    rate = df.loc[(df["Date"] >= start) & (df["Date"] <= end), "Rate"].dropna()
+    counts, edges = np.histogram(rate, bins=HISTOGRAM_BINS)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return pandas.DataFrame({"变化率 (%)": centers.round(2), "期数": counts})
+
+
+def histogram(name: str, start, end) -> pandas.DataFrame:
+    """变化率分布"""
+    return _histogram(name, _mtime(storage.csv_path(name)), start, end)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _risk_summary(name: str, mtime: float, freq: str) -> list[str]:
+    return risk_stats.format_summary(
+        risk_stats.get_stats(name, freq, _load_series(name, mtime))
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _load_pe_history(name: str, mtime: float) -> pandas.DataFrame:
+    return pe_history.load(name)
+
+
+def load_pe_history(name: str) -> pandas.DataFrame | None:
+    """加权市盈率历史；尚未压缩的写入也包含在内，日志目录的修改时间一并作为缓存键"""
+    path = pe_history.history_path(name)
+    if not os.path.exists(path):
+        return None
+    return _load_pe_history(name, max(_mtime(path), _mtime(pe_history.log_dir(name))))
+
+
+def index_page():
+    indexes = {index.name: index for index in market_change.INDEXES}
+    freqs = {label: freq for freq, (label, _) in market_change.FREQ_LABELS.items()}
+    with st.sidebar:
+        index = indexes[st.selectbox("指数", list(indexes))]
+        freq = freqs[st.radio("频率", list(freqs), horizontal=True)]
+
+    name = market_change.series_name(index.prefix, freq)
+    if not os.path.exists(storage.csv_path(name)):
+        st.warning(f"没有 {index.name} 的数据，请先运行 python src/main.py prices")
+        return
+    df = load_series(name)
+    first, last = df["Date"].iloc[0].date(), df["Date"].iloc[-1].date()
+    with st.sidebar:
+        start, end = st.slider("日期区间", first, last, (first, last))
+    start, end = pandas.Timestamp(start), pandas.Timestamp(end)
+
+    st.subheader(f"{index.name}走势")
+    level, chart = chart_window(index.prefix, start, end)
+    st.line_chart(chart, x="Date", y=["最高", "收盘", "最低"])
+    st.caption(
+        f"区间内按{pyramid.LEVEL_LABELS[level]}绘制 {len(chart)} 个点"
+        f"（{market_change.FREQ_LABELS[freq][0]}数据共 {len(df)} 期）"
+    )
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader("变化率分布")
+        st.bar_chart(histogram(name, start, end), x="变化率 (%)", y="期数")
+    with right:
+        st.subheader("风险指标（全部历史）")
+        for line in _risk_summary(name, _mtime(storage.csv_path(name)), freq):
+            st.markdown(f"- {line}")
+
+
+def pe_page():
+    st.subheader("市值加权市盈率历史")
+    histories = {
+        label: history
+        for label, name in PE_HISTORY.items()
+        if (history := load_pe_history(name)) is not None
+    }
+    if not histories:
+        st.info("还没有加权市盈率历史，请先运行 python src/main.py pe")
+        return
+    combined = pandas.concat(
+        {label: h.set_index("日期")["当年市盈率"] for label, h in histories.items()},
+        axis=1,
+    )
+    st.line_chart(combined)
+    st.dataframe(combined.sort_index(ascending=False))
+
+
+def main():
+    st.set_page_config(page_title="市场数据看板", layout="wide")
+    pages = {"指数行情": index_page, "加权市盈率": pe_page}
+    with st.sidebar:
+        page = st.radio("页面", list(pages))
+        if st.button("重新读取数据"):
+            st.cache_data.clear()
+    pages[page]()
+
+
+if __name__ == "__main__":
+    main()
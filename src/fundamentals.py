@@ -0,0 +1,319 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, Protocol
+
+import pandas as pd
+
+import cache
+import metrics
+import providers
+from weighted_pe import WeightedPEAccumulator
+
+# 并发线程数
+MAX_WORKERS = 16
+# 令牌桶：每秒补充的请求数与桶容量（允许的瞬时突发）
+REQUESTS_PER_SECOND = 20
+BURST = 20
+# 单支股票失败后的重试次数与退避基数（秒）
+RETRIES = 3
+BACKOFF = 1.0
+# 每处理多少支股票打印一次进度
+PROGRESS_EVERY = 50
+# 缓存中为每支股票保留的 info 字段
+INFO_FIELDS = ("marketCap", "trailingPE", "sector")
+
+
+class InfoProvider(Protocol):
+    """股票基本面数据源接口"""
+
+    def get_info(self, ticker: str) -> dict:
+        """返回单支股票的 info 字典，网络或限流错误时抛出异常"""
+        ...
+
+
+class YFinanceProvider:
+    """通过 yfinance 的 Ticker.info 获取数据"""
+
+    def get_info(self, ticker: str) -> dict:
+        return providers.ticker_info(ticker)
+
+
+class DictProvider:
+    """
+    本地假数据源，用于测试
+
+    Args:
+        infos: {股票代码: info 字典}，不存在的代码抛出 KeyError
+        latency: 每次请求模拟的延迟（秒）
+    """
+
+    def __init__(self, infos: dict[str, dict], latency: float = 0.0):
+        self.infos = infos
+        self.latency = latency
+
+    def get_info(self, ticker: str) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.infos[ticker]
+
+
+class CachedInfoProvider:
+    """
+    为其他数据源加上持久化缓存：命中未过期的缓存时直接返回，只有过期或失败的股票才重新请求
+
+    Args:
+        provider: 实际的数据源
+        disk_cache: 缓存实例，默认使用 cache.get_cache()
+        fields: 缓存的 info 字段，同时作为缓存键的一部分
+        ttl: 缓存有效期（秒）
+        refresh: 为 True 时忽略已有缓存，全部重新请求并写回
+    """
+
+    def __init__(
+        self,
+        provider: InfoProvider,
+        disk_cache: cache.DiskCache | None = None,
+        fields: tuple[str, ...] = INFO_FIELDS,
+        ttl: float = cache.INFO_TTL,
+        refresh: bool = False,
+    ):
+        self.provider = provider
+        self.cache = disk_cache or cache.get_cache()
+        self.fields = fields
+        self.ttl = ttl
+        self.refresh = refresh
+
+    def _key(self, ticker: str) -> str:
+        return f"info:{ticker}:{','.join(self.fields)}"
+
+    def cached(self, ticker: str) -> dict | None:
+        """只查缓存，不访问数据源；未命中、已过期或 refresh 时返回 None"""
+        if self.refresh:
+            return None
+        info = self.cache.get(self._key(ticker))
+        if info is not None:
+            metrics.incr("info.cache_hits")
+        return info
+
+    def get_info(self, ticker: str) -> dict:
+        cached = self.cached(ticker)
+        if cached is not None:
+            return cached
+        metrics.incr("info.cache_misses")
+
+        info = self.provider.get_info(ticker)
+        subset = {field: info.get(field) for field in self.fields}
+        # 字段全部缺失通常意味着被限流或临时错误，不写入缓存，下次重新请求
+        if any(value is not None for value in subset.values()):
+            self.cache.set(self._key(ticker), subset, self.ttl)
+        return subset
+
+
+def default_provider(refresh: bool = False) -> InfoProvider:
+    """默认数据源：带持久化缓存的 yfinance"""
+    return CachedInfoProvider(YFinanceProvider(), refresh=refresh)
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取走一个令牌，桶空时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            metrics.incr("ratelimit.throttled")
+            metrics.incr("ratelimit.wait_seconds", wait)
+            time.sleep(wait)
+
+
+_shared_bucket = None
+_shared_bucket_lock = threading.Lock()
+
+
+def shared_bucket() -> TokenBucket:
+    """进程内共享的令牌桶：并发运行的多个市盈率管线合计不超过 REQUESTS_PER_SECOND"""
+    global _shared_bucket
+    with _shared_bucket_lock:
+        if _shared_bucket is None:
+            _shared_bucket = TokenBucket(REQUESTS_PER_SECOND, BURST)
+        return _shared_bucket
+
+
+def fetch_info(
+    provider: InfoProvider,
+    ticker: str,
+    bucket: TokenBucket,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF,
+) -> dict | None:
+    """
+    获取单支股票的 info，失败时按指数退避重试，最终失败返回 None
+
+    命中缓存的股票不访问网络，也不占用限流令牌
+    """
+    if isinstance(provider, CachedInfoProvider):
+        cached = provider.cached(ticker)
+        if cached is not None:
+            return cached
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            with metrics.span("info.fetch"):
+                return provider.get_info(ticker)
+        except Exception:
+            if attempt == retries:
+                metrics.incr("info.failures")
+                return None
+            metrics.incr("info.retries")
+            # 指数退避并加入随机抖动，避免所有线程同时重试
+            time.sleep(backoff * 2**attempt * (1 + random.random()))
+
+
+def fetch_infos(
+    tickers: list[str],
+    provider: InfoProvider | None = None,
+    max_workers: int = MAX_WORKERS,
+    bucket: TokenBucket | None = None,
+    retries: int = RETRIES,
+    backoff: float = BACKOFF,
+) -> Iterator[tuple[str, dict | None]]:
+    """
+    并发获取多支股票的 info，按完成顺序逐个返回
+
+    Args:
+        bucket: 限流令牌桶，默认为进程内共享的 shared_bucket()
+
+    Yields:
+        (股票代码, info 字典；失败时为 None)
+    """
+    provider = provider or default_provider()
+    bucket = bucket or shared_bucket()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for ticker in tickers:
+            future = executor.submit(
+                fetch_info, provider, ticker, bucket, retries, backoff
+            )
+            futures[future] = ticker
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # 调用方提前停止迭代时，取消尚未开始的请求
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_stock_data(
+    tickers,
+    provider: InfoProvider | None = None,
+    accumulator: WeightedPEAccumulator | None = None,
+    min_coverage: float | None = None,
+    **kwargs,
+):
+    """
+    使用 yfinance 获取股票的市值、市盈率和所属行业
+
+    返回全部市值有效的股票，市盈率缺失时为 NaN；用 valid_pe 取出参与加权的部分。
+    每返回一支股票就更新一次加权市盈率，进度信息中会显示当前的部分结果。
+    因 min_coverage 提前停止时结果只包含部分成分股，is_partial 返回 True。
+
+    Args:
+        tickers: 股票代码列表
+        provider: 数据源，默认为带缓存的 yfinance
+        accumulator: 流式累计器，传入后调用方可以读取最终的累加结果
+        min_coverage: 有效数据覆盖率达到该比例（0~1）后提前停止，其余请求被取消
+        **kwargs: 传给 fetch_infos 的并发与限流参数
+    """
+    print(f"正在获取 {len(tickers)} 支股票的市值和市盈率数据...")
+    if accumulator is None:
+        accumulator = WeightedPEAccumulator()
+    accumulator.expected = len(tickers)
+    data = []
+    failed_symbol = []  # 记录失败的股票数
+    stopped = False
+    for ticker_symbol, info in fetch_infos(tickers, provider, **kwargs):
+        info = info or {}
+        market_cap = info.get("marketCap")
+        pe_ratio = info.get("trailingPE")  # 使用追踪市盈率
+
+        # 市值有效的股票都保留（亏损公司没有市盈率），只有市盈率为正的参与加权
+        if market_cap is not None and market_cap > 0:
+            data.append(
+                {
+                    "Ticker": ticker_symbol,
+                    "MarketCap": market_cap,
+                    "PE": pe_ratio,
+                    "Sector": info.get("sector"),
+                }
+            )
+        if (
+            market_cap is not None
+            and market_cap > 0
+            and pe_ratio is not None
+            and pe_ratio > 0
+        ):
+            accumulator.add(market_cap, pe_ratio)
+            metrics.incr("pe.valid_tickers")
+        else:
+            failed_symbol.append(ticker_symbol)
+            accumulator.skip()
+            metrics.incr("pe.invalid_tickers")
+
+        processed_count = accumulator.processed
+        reached = accumulator.reached(min_coverage)
+        if (
+            processed_count % PROGRESS_EVERY == 0
+            or processed_count == len(tickers)
+            or reached
+        ):
+            print(
+                f"已处理 {processed_count}/{len(tickers)}... 当前有效数据 {len(data)} 条，"
+                f"{accumulator.summary()}"
+            )
+        if reached:
+            print(f"覆盖率已达到 {min_coverage:.0%}，停止获取剩余股票。")
+            stopped = True
+            break
+
+    # 按完成顺序收集的结果恢复为成分股列表的顺序
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    data.sort(key=lambda row: order[row["Ticker"]])
+    failed_symbol.sort(key=order.get)
+
+    print(
+        f"成功获取 {len(data)} 支股票的数据，其中市盈率有效 {accumulator.count} 支。"
+        f"访问失败或市盈率无效：{json.dumps(failed_symbol)}"
+    )
+    df = pd.DataFrame(data, columns=["Ticker", "MarketCap", "PE", "Sector"])
+    df["PE"] = df["PE"].astype(float)
+    df.attrs["partial"] = stopped
+    return df
+
+
+def is_partial(df: pd.DataFrame) -> bool:
+    """get_stock_data 是否因 min_coverage 提前停止，只获取了部分成分股"""
+    return bool(df.attrs.get("partial", False))
+
+
+def valid_pe(df: pd.DataFrame) -> pd.DataFrame:
+    """市值与市盈率均为正数的股票，即参与加权市盈率计算的部分"""
+    return df[(df["MarketCap"] > 0) & (df["PE"] > 0)]
@@ -0,0 +1,170 @@
+import datetime
+import os
+import re
+
+import numpy as np
+import pandas
+
+import fundamentals
+import storage
+from weighted_pe import WeightedPEAccumulator
+
+# 按日期分区的逐股基本面快照：data/fundamentals/<指数>/<YYYY-MM-DD>.parquet
+FUNDAMENTALS_DIR = "data/fundamentals"
+COLUMNS = ["Ticker", "MarketCap", "PE", "Sector"]
+
+
+# 分区文件的扩展名：有 pyarrow 时写 Parquet，否则退回 CSV；读取时两种都识别，
+# 切换环境后已有的分区仍然可用
+EXTENSIONS = (".parquet", ".csv")
+
+
+def _extension() -> str:
+    return ".parquet" if storage.HAS_PARQUET else ".csv"
+
+
+def partition_path(index: str, date: str) -> str:
+    """某一天的分区文件：已存在时返回实际文件，否则返回当前环境下写入的路径"""
+    for extension in EXTENSIONS:
+        path = os.path.join(FUNDAMENTALS_DIR, index, f"{date}{extension}")
+        if os.path.exists(path):
+            return path
+    return os.path.join(FUNDAMENTALS_DIR, index, f"{date}{_extension()}")
+
+
+def available_dates(index: str) -> list[str]:
+    """已保存快照的日期（YYYY-MM-DD），按时间排序"""
+    directory = os.path.join(FUNDAMENTALS_DIR, index)
+    if not os.path.isdir(directory):
+        return []
+    pattern = r"\d{4}-\d{2}-\d{2}\.(parquet|csv)"
+    return sorted(
+        {
+            name.split(".")[0]
+            for name in os.listdir(directory)
+            if re.fullmatch(pattern, name)
+        }
+    )
+
+
+def save_snapshot(index: str, df: pandas.DataFrame, date: str | None = None) -> str:
+    """
+    保存某一天的逐股市值、市盈率与行业，同一天重复运行时覆盖当天的分区
+
+    保存全部市值有效的成分股，包括市盈率缺失或为负的股票（亏损公司）；
+    计算加权市盈率时再按 fundamentals.valid_pe 筛选，市值占比与排名仍以全部成分股为准。
+
+    Args:
+        index: 指数名称，如 'sp500'、'nasdaq100'
+        df: get_stock_data 返回的 DataFrame，包含 Ticker、MarketCap、PE 列，
+            以及可选的 Sector 列（较早的快照没有行业信息）
+        date: 快照日期，默认为今天
+
+    Returns:
+        分区文件路径
+    """
+    date = date or datetime.date.today().strftime("%Y-%m-%d")
+    snapshot = pandas.DataFrame(
+        {
+            "Ticker": df["Ticker"].astype(str),
+            "MarketCap": df["MarketCap"].astype(np.float64),
+            "PE": df["PE"].astype(np.float64),
+            "Sector": df["Sector"] if "Sector" in df else None,
+        }
+    )
+    snapshot = snapshot[snapshot["MarketCap"] > 0]
+    previous = partition_path(index, date)
+    path = os.path.join(FUNDAMENTALS_DIR, index, f"{date}{_extension()}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if storage.HAS_PARQUET:
+        snapshot.to_parquet(tmp_path, index=False)
+    else:
+        snapshot.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    if previous != path and os.path.exists(previous):
+        os.remove(previous)  # 同一天另一种格式的旧分区
+    return path
+
+
+def _read(path: str) -> pandas.DataFrame:
+    if path.endswith(".parquet"):
+        return pandas.read_parquet(path)
+    return pandas.read_csv(path, dtype={"Ticker": str})
+
+
+def load_snapshot(index: str, date: str | None = None) -> pandas.DataFrame | None:
+    """
+    读取某一天的时点快照：没有当天数据时使用当天之前最近的一份；date 为 None 时读取最新快照
+    """
+    dates = [d for d in available_dates(index) if date is None or d <= date]
+    if not dates:
+        return None
+    return _read(partition_path(index, dates[-1]))
+
+
+def load_history(
+    index: str, start: str | None = None, end: str | None = None
+) -> pandas.DataFrame:
+    """读取日期区间内（含两端）的全部快照，返回带 Date 列的长表"""
+    frames = {
+        date: _read(partition_path(index, date))
+        for date in available_dates(index)
+        if (start is None or date >= start) and (end is None or date <= end)
+    }
+    if not frames:
+        return pandas.DataFrame(columns=["Date", *COLUMNS])
+    history = pandas.concat(frames, names=["Date", None]).reset_index(level=0)
+    history["Date"] = pandas.to_datetime(history["Date"])
+    return history.reset_index(drop=True)
+
+
+def _cap_weighted(df: pandas.DataFrame) -> float | None:
+    accumulator = WeightedPEAccumulator()
+    accumulator.add_many(df["MarketCap"], df["PE"])
+    return accumulator.pe
+
+
+def _earnings_weighted(df: pandas.DataFrame) -> float | None:
+    accumulator = WeightedPEAccumulator()
+    accumulator.add_many(df["MarketCap"], df["PE"])
+    return accumulator.earnings_yield_pe
+
+
+# 加权方式：名称 -> 由单日快照计算指数市盈率的函数
+WEIGHTINGS = {
+    "cap": _cap_weighted,  # 市值加权，与 calculate_weighted_pe 一致
+    "earnings": _earnings_weighted,  # 总市值 / 总盈利
+    "equal": lambda df: float(df["PE"].mean()) if len(df) else None,  # 等权平均
+    "median": lambda df: float(df["PE"].median()) if len(df) else None,  # 中位数
+}
+
+
+def recompute(
+    index: str,
+    weighting: str = "cap",
+    start: str | None = None,
+    end: str | None = None,
+    max_pe: float | None = None,
+) -> pandas.DataFrame:
+    """
+    用本地快照重新计算每一天的指数市盈率，不访问网络
+
+    Args:
+        index: 指数名称
+        weighting: WEIGHTINGS 中的加权方式
+        start, end: 日期区间（YYYY-MM-DD，含两端）
+        max_pe: 剔除市盈率高于该值的股票，用于比较不同的异常值处理口径
+
+    Returns:
+        包含 Date、PE、Count 列的 DataFrame；Count 为参与计算（市盈率为正）的股票数
+    """
+    scheme = WEIGHTINGS[weighting]
+    history = fundamentals.valid_pe(load_history(index, start, end))
+    if max_pe is not None:
+        history = history[history["PE"] <= max_pe]
+    rows = [
+        {"Date": date, "PE": scheme(day), "Count": len(day)}
+        for date, day in history.groupby("Date", sort=True)
+    ]
+    return pandas.DataFrame(rows, columns=["Date", "PE", "Count"])
@@ -1,21 +1,262 @@
-import hsi.monthly_change
-import nasdaq.calculate_pe
-import nasdaq.monthly_change
-import sp500.calculate_pe
-import sp500.monthly_change
+import argparse
+import importlib
+import sys
+import time
 
+import metrics
 
-def get_market_data():
-    sp500.monthly_change.main()
-    nasdaq.monthly_change.main()
-    hsi.monthly_change.main()
+_START = time.perf_counter()
 
+# 各子命令只在执行时导入自己需要的模块：只算市盈率时不会导入 matplotlib，
+# 命中缓存时也不会导入 yfinance
 
-def get_market_pe_data():
-    sp500.calculate_pe.main()
-    nasdaq.calculate_pe.main()
+# 市盈率管线：名称 -> calculate_pe 模块
+PE_MODULES = {
+    "sp500": "sp500.calculate_pe",
+    "nasdaq100": "nasdaq.calculate_pe",
+}
+
+
+# 子命令的加载函数：导入所需模块并返回要执行的函数，便于分别统计启动和执行耗时
+def load_prices(args):
+    import market_change
+
+    return lambda: market_change.main(headless=args.headless)
+
+
+def load_pe(args):
+    modules = [importlib.import_module(PE_MODULES[m]) for m in args.markets]
+
+    def run():
+        for module in modules:
+            module.main(refresh=args.refresh, min_coverage=args.min_coverage)
+
+    return run
+
+
+def load_breadth(args):
+    import breadth
+
+    modules = [importlib.import_module(PE_MODULES[m]) for m in args.markets]
+
+    def run():
+        for market, module in zip(args.markets, modules):
+            tickers = getattr(module, f"get_{market}_tickers")()
+            if not tickers:
+                print(f"{market}: 无法获取成分股列表")
+                return False
+            breadth.update(market, tickers)
+
+    return run
+
+
+def load_what_if(args):
+    import pe_scenarios
+
+    def run():
+        for market in args.markets:
+            try:
+                pe_scenarios.main(market, args.date)
+            except FileNotFoundError as e:
+                # 新克隆的仓库没有逐股快照，需要先运行 pe 子命令
+                print(f"{market}: {e}")
+                return False
+
+    return run
+
+
+def load_daily(args):
+    import orchestrator
+
+    def run():
+        # 单个市场失败不影响其他市场，全部结束后以非零退出码报告失败
+        return orchestrator.main(include_pe=not args.skip_pe)
+
+    return run
+
+
+def load_charts(args):
+    import market_change
+
+    return lambda: market_change.render_all()
+
+
+def load_cross_market(args):
+    import cross_market
+
+    return cross_market.main
+
+
+def load_simulate(args):
+    import market_change
+    import simulation
+
+    # 指数在 market_change.INDEXES 中定义，新增指数时不需要修改命令行参数
+    try:
+        market_change.find_index(args.index)
+    except KeyError:
+        prefixes = ", ".join(index.prefix for index in market_change.INDEXES)
+        print(f"未定义的指数: {args.index}，可选 {prefixes}")
+        return lambda: False
+
+    return lambda: simulation.main(
+        args.index,
+        args.freq,
+        args.horizon,
+        args.paths,
+        args.block,
+        args.seed,
+        args.workers,
+    )
+
+
+def load_backtest(args):
+    import backtest
+
+    return lambda: backtest.main(args.freq, args.years)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="不弹出窗口，并发运行行情与市盈率管线，图表渲染到 charts/ 目录（等同于 daily 子命令）",
+    )
+    parser.add_argument(
+        "--skip-pe", action="store_true", help="无界面模式下不运行市盈率管线"
+    )
+    # 可选值即 providers.MODES，这里不导入 providers
+    parser.add_argument(
+        "--provider-mode",
+        choices=("live", "record", "replay"),
+        help="网络访问模式：live 直接访问，record 访问并录制响应，replay 只回放录制（离线）",
+    )
+    parser.add_argument(
+        "--timing", action="store_true", help="结束时打印启动耗时与执行耗时"
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="把各阶段的耗时与计数指标作为一行 JSON 追加到该文件",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="用 cProfile 采样子命令的执行过程（包括任务图中的各个线程），结果保存为 pstats 文件",
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    prices = commands.add_parser("prices", help="下载指数行情并显示统计与图表")
+    # 子命令中的同名参数使用 SUPPRESS，避免覆盖写在子命令之前的全局参数
+    prices.add_argument(
+        "--headless",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="图表渲染为文件",
+    )
+    prices.set_defaults(load=load_prices)
+
+    pe = commands.add_parser("pe", help="只计算成分股加权市盈率")
+    pe.add_argument(
+        "--markets", nargs="+", choices=list(PE_MODULES), default=list(PE_MODULES)
+    )
+    pe.add_argument("--refresh", action="store_true", help="忽略缓存重新获取")
+    pe.add_argument(
+        "--min-coverage", type=float, help="有效数据覆盖率达到该比例后提前结束"
+    )
+    pe.set_defaults(load=load_pe)
+
+    breadth = commands.add_parser(
+        "breadth", help="增量下载成分股日线并计算市场宽度指标"
+    )
+    breadth.add_argument(
+        "--markets", nargs="+", choices=list(PE_MODULES), default=list(PE_MODULES)
+    )
+    breadth.set_defaults(load=load_breadth)
+
+    what_if = commands.add_parser(
+        "what-if", help="在已保存的逐股快照上计算加权市盈率的假设情景"
+    )
+    what_if.add_argument(
+        "--markets", nargs="+", choices=list(PE_MODULES), default=list(PE_MODULES)
+    )
+    what_if.add_argument("--date", help="快照日期（YYYY-MM-DD），默认为最新快照")
+    what_if.set_defaults(load=load_what_if)
+
+    daily = commands.add_parser("daily", help="无界面地并发运行每日全部任务")
+    daily.add_argument(
+        "--skip-pe",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="不运行市盈率管线",
+    )
+    daily.set_defaults(load=load_daily)
+
+    charts = commands.add_parser("charts", help="把已有数据的图表渲染为文件")
+    charts.set_defaults(load=load_charts)
+
+    cross = commands.add_parser("cross-market", help="计算跨市场相关系数与 beta")
+    cross.set_defaults(load=load_cross_market)
+
+    # 频率的可选值即 market_change.FREQ_RULES，这里不导入 market_change；
+    # 指数前缀在执行时校验
+    simulate = commands.add_parser("simulate", help="用自助法模拟指数收益路径")
+    simulate.add_argument(
+        "--index", default="sp500", help="指数前缀（见 market_change.INDEXES）"
+    )
+    simulate.add_argument(
+        "--freq", choices=("weekly", "monthly", "annual"), default="annual"
+    )
+    simulate.add_argument("--horizon", type=int, default=10, help="模拟的期数")
+    simulate.add_argument("--paths", type=int, default=1_000_000, help="路径数")
+    simulate.add_argument(
+        "--block", type=int, default=1, help="块长度，大于 1 时按连续多期整体抽样"
+    )
+    simulate.add_argument("--seed", type=int, help="随机种子")
+    simulate.add_argument("--workers", type=int, help="并行的进程数")
+    simulate.set_defaults(load=load_simulate)
+
+    backtest = commands.add_parser(
+        "backtest", help="回测一次性投入、定投与多指数再平衡策略"
+    )
+    backtest.add_argument("--freq", choices=("weekly", "monthly"), default="monthly")
+    backtest.add_argument("--years", type=int, default=10, help="持有年数")
+    backtest.set_defaults(load=load_backtest)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.provider_mode:
+        import providers
+
+        providers.set_mode(args.provider_mode)
+
+    if args.command is None:
+        # 兼容不带子命令的旧用法
+        load = load_daily if args.headless else load_prices
+    else:
+        load = args.load
+
+    with metrics.span("startup"):
+        run = load(args)
+    ready = time.perf_counter()
+    with metrics.profile(args.profile):
+        with metrics.span(f"command.{args.command or 'default'}"):
+            result = run()
+    if args.timing:
+        print(
+            f"\n启动耗时 {ready - _START:.2f}s，"
+            f"执行耗时 {time.perf_counter() - ready:.2f}s"
+        )
+    if args.metrics:
+        metrics.print_summary()
+        metrics.export(args.metrics)
+    if args.profile:
+        print(f"cProfile 结果已保存到 {args.profile}")
+    return 1 if result is False else 0
 
 
 if __name__ == "__main__":
-    get_market_data()
-    # get_market_pe_data()
+    sys.exit(main())
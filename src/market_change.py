@@ -0,0 +1,356 @@
+import datetime
+import io
+import os
+from dataclasses import dataclass
+
+import pandas
+
+import metrics
+import providers
+import risk_stats
+import storage
+
+# 频率名称 -> pandas 重采样规则
+FREQ_RULES = {
+    "weekly": "W",
+    "monthly": "ME",
+    "annual": "Y",
+}
+
+# 频率名称 -> (统计标题, matplotlib_show 的 freq 参数)
+FREQ_LABELS = {
+    "weekly": ("周度", "weekly"),
+    "monthly": ("月度", "monthly"),
+    "annual": ("年度", "yearly"),
+}
+
+# 无界面模式下图表的输出目录（已在 .gitignore 中忽略）
+CHART_DIR = "charts"
+
+# 增量模式下从文件末尾读取的字节数，足够覆盖最后几行
+TAIL_BYTES = 4096
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """指数定义"""
+
+    symbol: str  # Yahoo Finance 指数代码，如 '^GSPC'
+    prefix: str  # CSV 文件名前缀，如 'sp500'
+    name: str  # 展示用名称
+
+
+# 新增指数只需在这里加一项
+INDEXES = [
+    IndexSpec("^GSPC", "sp500", "标普500指数"),
+    IndexSpec("^IXIC", "nasdaq", "纳斯达克指数"),
+    IndexSpec("^HSI", "hsi", "恒生指数"),
+]
+
+
+def find_index(prefix: str) -> IndexSpec:
+    """按 CSV 文件名前缀查找指数定义"""
+    for index in INDEXES:
+        if index.prefix == prefix:
+            return index
+    raise KeyError(f"未定义的指数: {prefix}")
+
+
+def series_name(prefix: str, freq: str) -> str:
+    """返回指定指数与频率对应的序列名称，即不带扩展名的文件名"""
+    return f"{prefix}_{freq}_change"
+
+
+def csv_path(prefix: str, freq: str) -> str:
+    """返回指定指数与频率对应的 CSV 文件路径"""
+    return storage.csv_path(series_name(prefix, freq))
+
+
+def resample_changes(close: pandas.DataFrame) -> dict[str, pandas.DataFrame]:
+    """
+    对共享的日线收盘价表一次性计算所有指数在所有频率下的收盘价与变化率
+
+    Args:
+        close: 以日期为索引、每列一个指数代码的收盘价表，不同交易日历的空缺为 NaN
+
+    Returns:
+        {频率名称: 列为 (指数代码, 'Rate') 的 MultiIndex DataFrame}
+    """
+    result = {}
+    with metrics.span("resample"):
+        for freq, rule in FREQ_RULES.items():
+            resampled = close.resample(rule).last().round(2)
+            rate = (resampled.pct_change(fill_method=None) * 100).round(2)
+            result[freq] = pandas.concat({"Close": resampled, "Rate": rate}, axis=1)
+    return result
+
+
+def select_index(changes: pandas.DataFrame, symbol: str) -> pandas.DataFrame:
+    """从 resample_changes 的结果中取出单个指数，并去掉其交易区间之外的周期"""
+    frame = pandas.DataFrame(
+        {symbol: changes["Close"][symbol], "Rate": changes["Rate"][symbol]}
+    )
+    first, last = frame[symbol].first_valid_index(), frame[symbol].last_valid_index()
+    if first is None:
+        return frame.iloc[0:0]
+    return frame.loc[first:last]
+
+
+def read_tail(path: str) -> tuple[pandas.DataFrame, list[int]]:
+    """
+    只读取 CSV 文件末尾的若干行
+
+    Returns:
+        (末尾几行组成的 DataFrame, 每一行在文件中的起始字节偏移量)
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        header_end = f.tell()
+        size = f.seek(0, os.SEEK_END)
+        start = max(header_end, size - TAIL_BYTES)
+        f.seek(start)
+        block = f.read()
+
+    lines = block.splitlines(keepends=True)
+    offset = start
+    if start > header_end:
+        # 第一行可能只读到一半，丢弃
+        offset += len(lines[0])
+        lines = lines[1:]
+
+    offsets = []
+    for line in lines:
+        offsets.append(offset)
+        offset += len(line)
+
+    tail = pandas.read_csv(
+        io.BytesIO(header + b"".join(lines)), index_col=0, parse_dates=True
+    )
+    return tail, offsets
+
+
+def read_tails(index: IndexSpec) -> dict | None:
+    """读取某个指数各频率 CSV 的末尾；文件缺失或行数不足时返回 None"""
+    tails = {}
+    for freq in FREQ_RULES:
+        path = csv_path(index.prefix, freq)
+        if not os.path.exists(path):
+            return None
+        tail, offsets = read_tail(path)
+        if len(tail) < 2:
+            return None
+        tails[freq] = (tail, offsets)
+    return tails
+
+
+def tails_start(tails: dict) -> datetime.datetime:
+    """增量下载的起始日期：最后一行对应的周期可能尚未结束，需要从该周期的起点开始重新下载"""
+    return min(
+        tail.index[-2] + datetime.timedelta(days=1) for tail, _ in tails.values()
+    )
+
+
+def download_close(symbols: list[str], start=None) -> pandas.DataFrame:
+    """批量下载多个指数的日线收盘价，返回每列一个指数代码的 DataFrame"""
+    if start is not None:
+        start = start.strftime("%Y-%m-%d")
+    data = providers.download(symbols, start=start)
+    if data.empty:
+        return pandas.DataFrame(columns=symbols)
+    return data["Close"]
+
+
+def write_full(index: IndexSpec, changes: dict[str, pandas.DataFrame]):
+    """重写某个指数全部频率的 CSV 文件"""
+    for freq in FREQ_RULES:
+        frame = select_index(changes[freq], index.symbol)
+        if frame.empty:
+            print(f"未能下载 {index.symbol} 的数据，跳过")
+            return
+        path = csv_path(index.prefix, freq)
+        with metrics.span("csv.write"):
+            frame.to_csv(path)
+        metrics.incr("csv.bytes_written", os.path.getsize(path))
+        with metrics.span("parquet.write"):
+            storage.write_series(series_name(index.prefix, freq), frame)
+
+
+def append_incremental(
+    index: IndexSpec, changes: dict[str, pandas.DataFrame], tails: dict
+):
+    """用新下载的尾部数据覆盖未结束的周期，并追加新的周期"""
+    symbol = index.symbol
+    for freq in FREQ_RULES:
+        tail, offsets = tails[freq]
+        fresh = select_index(changes[freq], symbol)[[symbol]]
+        fresh = fresh[fresh.index >= tail.index[-1]].copy()
+        if fresh.empty:
+            continue
+
+        # 已存储且不会被覆盖的行保持不变，用其中最后一个收盘价衔接变化率
+        kept = len(tail[tail.index < fresh.index[0]])
+        close = pandas.concat([tail[symbol].iloc[kept - 1 : kept], fresh[symbol]])
+        fresh["Rate"] = (close.pct_change(fill_method=None) * 100).round(2).iloc[1:]
+
+        path = csv_path(index.prefix, freq)
+        with metrics.span("csv.write"):
+            if kept < len(tail):
+                with open(path, "r+b") as f:
+                    f.truncate(offsets[kept])
+            size = os.path.getsize(path)
+            fresh.to_csv(path, mode="a", header=False)
+        metrics.incr("csv.bytes_written", os.path.getsize(path) - size)
+        with metrics.span("parquet.write"):
+            storage.update_series(series_name(index.prefix, freq), fresh)
+        print(f"{path} 更新了 {len(fresh)} 行")
+
+
+def download_indexes(
+    indexes: list[IndexSpec] = INDEXES, incremental: bool = True
+) -> dict[str, tuple[pandas.DataFrame, dict | None]]:
+    """
+    批量下载多个指数：没有可用历史的指数合并为一次全量下载，其余合并为一次增量下载
+
+    Returns:
+        {指数代码: (该指数的日线收盘价, 已存储 CSV 的末尾；为 None 时表示需要全量写入)}
+    """
+    tails = {}
+    if incremental:
+        for index in indexes:
+            index_tails = read_tails(index)
+            if index_tails is None:
+                print(f"{index.prefix} 已存储数据不足，改为全量下载")
+            else:
+                tails[index.symbol] = index_tails
+
+    groups = [
+        ([index for index in indexes if index.symbol not in tails], None),
+        (
+            [index for index in indexes if index.symbol in tails],
+            min((tails_start(t) for t in tails.values()), default=None),
+        ),
+    ]
+    result = {}
+    for group, start in groups:
+        if not group:
+            continue
+        close = download_close([index.symbol for index in group], start=start)
+        for index in group:
+            if index.symbol in close.columns:
+                frame = close[[index.symbol]].dropna(how="all")
+            else:
+                frame = pandas.DataFrame(columns=[index.symbol])
+            result[index.symbol] = (frame, tails.get(index.symbol))
+    return result
+
+
+def persist(index: IndexSpec, changes: dict[str, pandas.DataFrame], tails: dict | None):
+    """把 resample_changes 的结果写入 CSV 与 Parquet"""
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    if tails is None:
+        write_full(index, changes)
+    else:
+        append_incremental(index, changes, tails)
+
+
+def download_to_csv(indexes: list[IndexSpec] = INDEXES, incremental: bool = True):
+    """
+    批量下载指数数据并按周、月、年统计变化率
+
+    Args:
+        indexes: 要更新的指数定义列表
+        incremental: 是否在已有 CSV 的基础上增量更新
+    """
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    downloaded = download_indexes(indexes, incremental)
+    for index in indexes:
+        close, tails = downloaded[index.symbol]
+        if close.empty:
+            print(f"{index.symbol} 没有新的数据")
+            continue
+        persist(index, resample_changes(close), tails)
+
+
+def print_stats(index: IndexSpec, freq: str, df: pandas.DataFrame):
+    label = FREQ_LABELS[freq][0]
+    print(f"\n{index.name}{label}统计:")
+    print(f"平均变化率: {df['Rate'].mean():.2f}%")
+    print(f"最大涨幅: {df['Rate'].max():.2f}%")
+    print(f"最大跌幅: {df['Rate'].min():.2f}%")
+    stats = risk_stats.get_stats(series_name(index.prefix, freq), freq, df)
+    for line in risk_stats.format_summary(stats):
+        print(line)
+
+
+def show(index: IndexSpec):
+    """打印某个指数各频率的统计信息并绘图"""
+    # 绘图模块会导入 matplotlib，只在需要出图时导入
+    import pyramid
+    from utils import matplotlib_show
+
+    # 交互窗口中的指数曲线从多分辨率金字塔取数，缩放时切换到对应的级别
+    levels = pyramid.load(index.prefix)
+    for freq, (_, chart_freq) in FREQ_LABELS.items():
+        df = storage.load_series(series_name(index.prefix, freq))
+        print_stats(index, freq, df)
+        matplotlib_show(df, index.name, freq=chart_freq, pyramid=levels)
+
+
+def report(index: IndexSpec, out_dir: str = CHART_DIR, executor=None) -> list[str]:
+    """无界面地打印某个指数的统计信息，并把它的图表渲染为图片文件"""
+    from utils import render_charts
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for freq, (_, chart_freq) in FREQ_LABELS.items():
+        name = series_name(index.prefix, freq)
+        print_stats(index, freq, storage.load_series(name))
+        jobs.append(
+            (name, index.name, chart_freq, os.path.join(out_dir, f"{name}.png"))
+        )
+    return render_charts(jobs, executor=executor)
+
+
+def render_all(
+    indexes: list[IndexSpec] = INDEXES,
+    out_dir: str = CHART_DIR,
+    fmt: str = "png",
+    max_workers: int | None = None,
+) -> list[str]:
+    """把所有指数、所有频率的图表并行渲染为图片文件，不弹出窗口"""
+    from utils import render_charts
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for index in indexes:
+        for freq, (_, chart_freq) in FREQ_LABELS.items():
+            name = series_name(index.prefix, freq)
+            output = os.path.join(out_dir, f"{name}.{fmt}")
+            jobs.append((name, index.name, chart_freq, output))
+    outputs = render_charts(jobs, max_workers)
+    print(f"已生成 {len(outputs)} 张图表到 {out_dir}")
+    return outputs
+
+
+def main(indexes: list[IndexSpec] = INDEXES, headless: bool = False):
+    """
+    Args:
+        indexes: 要处理的指数
+        headless: 为 True 时只打印统计并把图表渲染为文件，适合定时任务
+    """
+    download_to_csv(indexes)
+    if not headless:
+        for index in indexes:
+            show(index)
+        return
+
+    for index in indexes:
+        for freq in FREQ_LABELS:
+            print_stats(
+                index, freq, storage.load_series(series_name(index.prefix, freq))
+            )
+    render_all(indexes)
+
+
+if __name__ == "__main__":
+    main()
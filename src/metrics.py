@@ -0,0 +1,144 @@
+import contextlib
+import cProfile
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+# 进程内的耗时与计数指标，线程安全
+#
+#   with metrics.span("resample"): ...     记录一段代码的耗时
+#   metrics.incr("http.bytes", len(body))  累加计数
+#   metrics.export("data/metrics/daily.jsonl")  把本次运行的汇总追加为一行 JSON
+
+_lock = threading.Lock()
+_durations: dict[str, list[float]] = {}
+_counters: dict[str, float] = {}
+_started = time.time()
+
+
+def record(name: str, seconds: float):
+    """记录一次耗时"""
+    with _lock:
+        _durations.setdefault(name, []).append(seconds)
+
+
+def incr(name: str, value: float = 1):
+    """累加计数器"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """记录代码块的耗时；代码块抛出异常时同时累加 <name>.errors"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        incr(f"{name}.errors")
+        raise
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """装饰器形式的 span"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def reset():
+    global _started
+    with _lock:
+        _durations.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    # 最近秩法，避免为了统计而导入 NumPy
+    return ordered[round((len(ordered) - 1) * q)]
+
+
+def snapshot() -> dict:
+    """当前指标的汇总：每个耗时给出次数、总和、平均、P50、P95 和最大值（秒）"""
+    with _lock:
+        durations = {name: sorted(values) for name, values in _durations.items()}
+        counters = dict(_counters)
+    spans = {}
+    for name, values in sorted(durations.items()):
+        total = sum(values)
+        spans[name] = {
+            "count": len(values),
+            "total": round(total, 6),
+            "mean": round(total / len(values), 6),
+            "p50": round(_percentile(values, 0.5), 6),
+            "p95": round(_percentile(values, 0.95), 6),
+            "max": round(values[-1], 6),
+        }
+    return {
+        "started": datetime.datetime.fromtimestamp(_started).isoformat(
+            timespec="seconds"
+        ),
+        "wall": round(time.time() - _started, 3),
+        "spans": spans,
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def export(path: str) -> dict:
+    """把本次运行的汇总作为一行 JSON 追加到 path，便于逐次比较"""
+    result = snapshot()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return result
+
+
+def print_summary(top: int = 15):
+    """按总耗时打印最慢的若干个 span 以及全部计数器"""
+    result = snapshot()
+    print("\n--- 性能指标 ---")
+    spans = sorted(result["spans"].items(), key=lambda item: -item[1]["total"])
+    for name, stats in spans[:top]:
+        print(
+            f"{name:<28} {stats['count']:>6} 次  总计 {stats['total']:8.2f}s  "
+            f"P50 {stats['p50'] * 1000:8.1f}ms  P95 {stats['p95'] * 1000:8.1f}ms"
+        )
+    for name, value in result["counters"].items():
+        print(f"{name:<28} {value:,.0f}")
+
+
+@contextlib.contextmanager
+def profile(path: str | None):
+    """
+    在代码块运行期间开启 cProfile，结束后保存为 pstats 文件（可用 snakeviz 等工具查看）
+
+    Python 3.12 起 cProfile 基于 sys.monitoring，一个采样器即可覆盖所有线程；path 为 None 时不采样。
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(path)
@@ -0,0 +1,270 @@
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import breadth
+import cross_market
+import fundamentals
+import market_change
+import metrics
+import nasdaq.calculate_pe
+import pyramid
+import sp500.calculate_pe
+from market_change import IndexSpec
+
+# 同时运行的任务数：任务以网络等待为主，线程即可
+MAX_WORKERS = 8
+
+# 市盈率管线：名称 -> (calculate_pe 模块, 获取成分股列表的函数)
+PE_MARKETS = {
+    "sp500_pe": (sp500.calculate_pe, sp500.calculate_pe.get_sp500_tickers),
+    "nasdaq100_pe": (nasdaq.calculate_pe, nasdaq.calculate_pe.get_nasdaq100_tickers),
+}
+
+
+@dataclass
+class Task:
+    """
+    任务图中的一个节点，func 按 deps 的顺序接收依赖任务的返回值
+
+    after 只约束先后顺序：这些任务结束（无论成败）后才开始，不接收其返回值；
+    任务图中不存在的名称忽略
+    """
+
+    name: str
+    func: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    after: tuple[str, ...] = ()
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: str  # 'ok' / 'failed' / 'skipped'
+    seconds: float = 0.0
+    error: str | None = None
+    value: Any = field(default=None, repr=False)
+
+
+def _run_task(task: Task, args: list) -> TaskResult:
+    """执行单个任务并计时，异常只影响该任务本身"""
+    start = time.perf_counter()
+    try:
+        with metrics.span(f"task.{task.name}"):
+            value = task.func(*args)
+    except Exception as e:
+        traceback.print_exc()
+        return TaskResult(
+            task.name, "failed", time.perf_counter() - start, error=repr(e)
+        )
+    return TaskResult(task.name, "ok", time.perf_counter() - start, value=value)
+
+
+def run_graph(
+    tasks: list[Task], max_workers: int = MAX_WORKERS
+) -> dict[str, TaskResult]:
+    """
+    按依赖关系并发执行任务图
+
+    依赖全部成功、after 中的任务全部结束的任务立即提交到线程池；某个任务失败时，
+    所有直接或间接依赖它的任务被跳过，互不依赖的任务（例如不同市场）照常运行。
+
+    Returns:
+        {任务名称: TaskResult}，顺序与任务完成顺序一致
+    """
+    pending = {task.name: task for task in tasks}
+    names = set(pending)
+    results: dict[str, TaskResult] = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            changed = True
+            while changed:
+                changed = False
+                for name, task in list(pending.items()):
+                    deps = [results.get(dep) for dep in task.deps]
+                    if any(dep is not None and dep.status != "ok" for dep in deps):
+                        results[name] = TaskResult(
+                            name, "skipped", error="依赖任务未成功"
+                        )
+                        del pending[name]
+                        changed = True
+                    elif all(dep is not None for dep in deps) and all(
+                        other in results or other not in names for other in task.after
+                    ):
+                        args = [dep.value for dep in deps]
+                        running[executor.submit(_run_task, task, args)] = name
+                        del pending[name]
+
+            if not running:
+                # 剩余任务的依赖不存在或形成环
+                for name in pending:
+                    results[name] = TaskResult(name, "skipped", error="依赖任务不存在")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[running.pop(future)] = result
+    return results
+
+
+# 所有指数共用的批量下载任务
+DOWNLOAD_TASK = "indexes.download"
+
+
+def download_task(indexes: list[IndexSpec]) -> Task:
+    """
+    所有指数合并为一次 yf.download（yfinance 内部按代码并发下载），各指数的重采样任务依赖它
+
+    yf.download 的调用由 providers 串行化，按指数拆成多个下载任务并不会更快
+    """
+    return Task(DOWNLOAD_TASK, lambda: market_change.download_indexes(indexes))
+
+
+def price_tasks(index: IndexSpec, render_executor=None) -> list[Task]:
+    """指数行情管线：（批量下载）→ 重采样 → 持久化（并重建多分辨率金字塔） → 统计与出图"""
+    prefix = index.prefix
+
+    def resample(downloaded):
+        close, tails = downloaded[index.symbol]
+        if tails is None and close.empty:
+            raise RuntimeError(f"未能下载 {index.symbol} 的数据")
+        changes = None if close.empty else market_change.resample_changes(close)
+        return changes, tails
+
+    def persist(resampled):
+        changes, tails = resampled
+        if changes is None:
+            print(f"{index.symbol} 没有新的数据")
+            return
+        market_change.persist(index, changes, tails)
+        pyramid.build(prefix)
+
+    def report(_):
+        return market_change.report(index, executor=render_executor)
+
+    return [
+        Task(f"{prefix}.resample", resample, (DOWNLOAD_TASK,)),
+        Task(f"{prefix}.persist", persist, (f"{prefix}.resample",)),
+        Task(f"{prefix}.report", report, (f"{prefix}.persist",)),
+    ]
+
+
+def cross_market_task(indexes: list[IndexSpec]) -> Task:
+    """所有指数持久化完成后，重新计算跨市场相关系数、beta 与相对强弱立方体"""
+
+    def build(*_):
+        for cube in cross_market.build_all(indexes).values():
+            cross_market.print_latest(cube)
+
+    return Task(
+        "cross_market", build, tuple(f"{index.prefix}.persist" for index in indexes)
+    )
+
+
+def pe_tasks(name: str, module, get_tickers) -> list[Task]:
+    """
+    市盈率管线：成分股列表 → 获取基本面 → 保存逐股快照 / 计算加权市盈率 → 保存历史
+
+    成分股列表同时用于增量更新成分股日线与市场宽度指标
+    """
+
+    def tickers():
+        result = get_tickers()
+        if not result:
+            raise RuntimeError("无法获取成分股列表")
+        return result
+
+    def fetch(tickers):
+        df = module.get_stock_data(tickers)
+        if df.empty:
+            raise RuntimeError("未能获取任何有效的股票数据")
+        return df
+
+    def compute(df):
+        weighted_pe, total_market_cap = module.calculate_weighted_pe(df)
+        if weighted_pe is None:
+            raise RuntimeError("未能计算出有效的市值加权平均市盈率")
+        print(
+            f"{name}: 市盈率有效的成分股 {len(fundamentals.valid_pe(df))} 支，"
+            f"总市值 ${total_market_cap:,.0f}，"
+            f"市值加权平均市盈率 {weighted_pe:.2f}"
+        )
+        return weighted_pe
+
+    def snapshot(df):
+        module.save_fundamentals(df)
+
+    def persist(weighted_pe):
+        module.save_weighted_pe(weighted_pe)
+
+    def market_breadth(tickers):
+        breadth.update(name.removesuffix("_pe"), tickers)
+
+    # 成分股日线分块下载与指数下载共用 providers 中的串行锁，排在指数下载之后，
+    # 避免几十个分块请求挡在指数行情前面；指数下载失败不影响市场宽度
+
+    return [
+        Task(f"{name}.tickers", tickers),
+        Task(f"{name}.fetch", fetch, (f"{name}.tickers",)),
+        Task(f"{name}.snapshot", snapshot, (f"{name}.fetch",)),
+        Task(f"{name}.compute", compute, (f"{name}.fetch",)),
+        Task(f"{name}.persist", persist, (f"{name}.compute",)),
+        Task(
+            f"{name}.breadth",
+            market_breadth,
+            (f"{name}.tickers",),
+            after=(DOWNLOAD_TASK,),
+        ),
+    ]
+
+
+def print_report(
+    tasks: list[Task], results: dict[str, TaskResult], wall_seconds: float
+):
+    """按任务定义的顺序打印每个任务的状态与耗时"""
+    print("\n--- 任务报告 ---")
+    labels = {"ok": "成功", "failed": "失败", "skipped": "跳过"}
+    for result in (results[task.name] for task in tasks):
+        line = f"{result.name:<24} {labels[result.status]:<4} {result.seconds:8.2f}s"
+        if result.error:
+            line += f"  {result.error}"
+        print(line)
+    failed = [r.name for r in results.values() if r.status == "failed"]
+    print(f"总耗时 {wall_seconds:.2f}s，失败任务 {len(failed)} 个")
+
+
+def main(
+    indexes: list[IndexSpec] = market_change.INDEXES,
+    include_pe: bool = True,
+    max_workers: int = MAX_WORKERS,
+) -> bool:
+    """
+    无界面地运行每日任务：所有指数的行情管线与市盈率管线并发执行
+
+    Returns:
+        是否所有任务都成功
+    """
+    from utils import render_pool
+
+    start = time.perf_counter()
+    with render_pool() as render_executor:
+        tasks = [download_task(indexes)] if indexes else []
+        for index in indexes:
+            tasks += price_tasks(index, render_executor)
+        if len(indexes) > 1:
+            tasks.append(cross_market_task(indexes))
+        if include_pe:
+            for name, (module, get_tickers) in PE_MARKETS.items():
+                tasks += pe_tasks(name, module, get_tickers)
+        results = run_graph(tasks, max_workers)
+
+    print_report(tasks, results, time.perf_counter() - start)
+    return all(result.status == "ok" for result in results.values())
+
+
+if __name__ == "__main__":
+    main()
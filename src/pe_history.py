@@ -0,0 +1,153 @@
+import csv
+import datetime
+import os
+import time
+import uuid
+
+import pandas
+
+import storage
+
+# 加权市盈率历史：data/csv/<名称>.csv 是按日期排序、每天一行的基础文件；
+# 每次写入先作为一个独立的小文件放进 data/pe_log/<名称>/，再由压缩步骤合并进基础文件。
+# 同一天的多次写入以最后一次为准，重复运行或并发运行都不会产生重复行。
+# 日志目录（包括压缩锁）不提交到仓库，只有基础文件会被定时任务提交。
+LOG_DIR = "data/pe_log"
+COLUMNS = ["日期", "当年市盈率"]
+# 压缩锁超过该时间（秒）未释放时视为进程已异常退出
+LOCK_TIMEOUT = 60
+# 与原来的 to_csv(encoding="utf-8-sig") 保持一致：带 BOM，便于 Excel 打开
+ENCODING = "utf-8-sig"
+
+
+def history_path(name: str) -> str:
+    return storage.csv_path(name)
+
+
+def log_dir(name: str) -> str:
+    return os.path.join(LOG_DIR, name)
+
+
+def _write_atomic(path: str, rows: list[tuple[str, str]]):
+    """先写同目录下的临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding=ENCODING, newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def _read_rows(path: str) -> list[tuple[str, str]]:
+    with open(path, encoding=ENCODING, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 表头
+        return [(row[0], row[1]) for row in reader if len(row) >= 2]
+
+
+def _log_files(name: str) -> list[str]:
+    """待合并的日志文件，文件名以纳秒时间戳开头，排序即写入顺序"""
+    directory = log_dir(name)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".csv")
+    )
+
+
+def _merge(name: str, logs: list[str]) -> dict[str, str]:
+    """基础文件加上日志，同一天以后写入的为准"""
+    merged = {}
+    path = history_path(name)
+    if os.path.exists(path):
+        merged.update(_read_rows(path))
+    for log in logs:
+        merged.update(_read_rows(log))
+    return merged
+
+
+def load_rows(name: str) -> list[tuple[str, str]]:
+    """按日期排序、每天一行的全部记录（包含尚未压缩的写入）"""
+    return sorted(_merge(name, _log_files(name)).items())
+
+
+def load(name: str) -> pandas.DataFrame:
+    """读取历史为 DataFrame：日期为 datetime64，市盈率为浮点数"""
+    df = pandas.DataFrame(load_rows(name), columns=COLUMNS)
+    df["日期"] = pandas.to_datetime(df["日期"])
+    df["当年市盈率"] = df["当年市盈率"].astype(float)
+    return df
+
+
+def _acquire(lock: str) -> bool:
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        pass
+    try:
+        if time.time() - os.path.getmtime(lock) < LOCK_TIMEOUT:
+            return False
+        os.remove(lock)  # 上一次压缩的进程已异常退出
+    except FileNotFoundError:
+        pass
+    return _acquire(lock)
+
+
+def compact(name: str) -> bool:
+    """
+    把日志合并进基础文件：排序、按日期去重后原子替换，再删除已合并的日志
+
+    用锁文件保证同一时间只有一个进程在压缩；拿不到锁时直接返回 False，
+    日志会在下一次压缩时合并，读取方通过 load 仍能看到这些写入。
+    """
+    os.makedirs(log_dir(name), exist_ok=True)
+    os.makedirs(os.path.dirname(history_path(name)), exist_ok=True)
+    lock = os.path.join(log_dir(name), ".lock")
+    if not _acquire(lock):
+        return False
+    try:
+        # 压缩期间其他进程写入的日志也一并合并
+        while logs := _log_files(name):
+            _write_atomic(history_path(name), sorted(_merge(name, logs).items()))
+            for log in logs:
+                os.remove(log)
+    finally:
+        os.remove(lock)
+    return True
+
+
+def upsert(name: str, date: str, value: float):
+    """
+    写入某一天的加权市盈率：同一天已有记录时覆盖
+
+    只追加一个日志文件，不修改基础文件；由调用方决定何时 compact。
+
+    Args:
+        name: 历史序列名称，如 'sp500_weighted_pe_history'
+        date: YYYY-MM-DD
+        value: 市盈率，保存时保留两位小数
+    """
+    os.makedirs(log_dir(name), exist_ok=True)
+    entry = os.path.join(
+        log_dir(name), f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.csv"
+    )
+    _write_atomic(entry, [(date, f"{value:.2f}")])
+
+
+def save_today(index: str, value: float) -> str:
+    """
+    把当天的加权市盈率写入 <指数>_weighted_pe_history，同一天重复运行时覆盖当天的记录
+
+    每日任务写入后立即压缩，基础文件随数据一起提交；其他进程正在压缩时，
+    这次写入由那个进程或下一次压缩合并
+
+    Returns:
+        历史文件路径
+    """
+    name = f"{index}_weighted_pe_history"
+    upsert(name, datetime.date.today().strftime("%Y-%m-%d"), value)
+    compact(name)
+    path = history_path(name)
+    print(f"\n结果已保存到 {path}")
+    return path
@@ -0,0 +1,351 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import fundamentals_store
+
+# 加权市盈率情景分析：在一份逐股快照（Ticker、MarketCap、PE、Sector）上回答
+# 「剔除市值前 10 后是多少」「不含科技股呢」「PE 上限 100 呢」这类问题，不需要重新获取数据。
+#
+# 每支股票累计五个量：[有效 PE 的股票数, 其市值, 市值 × PE, 市值 / PE, 市值]，
+# 两种加权市盈率由前四个和得到，市值占比由最后一个得到。市值排名与市值占比以全部成分股为准，
+# 没有有效 PE（亏损或缺失）的股票只计入市值。
+# 按市值排名建前缀和，并以 PE 排名建小波矩阵：「排名区间 × PE 上限」的查询只需 O(log n) 步，
+# 多个情景作为数组一起查询。每个行业再建一份。
+
+# 没有行业信息的股票归入该分组
+UNKNOWN_GROUP = "未知"
+# 情景结果的列
+RESULT_COLUMNS = ["Scenario", "PE", "EarningsPE", "Count", "CapShare"]
+# PE 上限的处理方式
+PE_MODES = ("clip", "exclude")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    一个假设情景，各条件同时生效
+
+    Args:
+        name: 情景名称，用于输出
+        exclude_top: 剔除市值最大的 N 支股票
+        top: 只保留市值排名前 N 的股票，None 表示不限；与 exclude_top 同时使用时
+            保留排名 exclude_top + 1 到 top 的股票
+        exclude_groups: 剔除的行业
+        only_groups: 只保留的行业，为空时不限
+        max_pe: 市盈率上限
+        pe_mode: 'clip' 把高于上限的 PE 截断为上限，'exclude' 剔除这些股票
+        exclude_tickers: 额外剔除的股票
+    """
+
+    name: str = ""
+    exclude_top: int = 0
+    top: int | None = None
+    exclude_groups: tuple[str, ...] = ()
+    only_groups: tuple[str, ...] = ()
+    max_pe: float | None = None
+    pe_mode: str = "clip"
+    exclude_tickers: tuple[str, ...] = ()
+
+    def __post_init__(self):
+        _check_mode(self.pe_mode)
+
+
+def _check_mode(pe_mode: str):
+    if pe_mode not in PE_MODES:
+        raise ValueError(f"未知的 pe_mode: {pe_mode}，可选 {PE_MODES}")
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """按行的前缀和，第 0 行为 0，形状 (n + 1, 列数)"""
+    out = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def _clip(sums: np.ndarray, max_pe) -> np.ndarray:
+    """PE 高于上限的那部分股票把 PE 截断为上限后的累计量"""
+    count, pe_cap, cap = sums[..., 0], sums[..., 1], sums[..., 4]
+    return np.stack([count, pe_cap, pe_cap * max_pe, pe_cap / max_pe, cap], axis=-1)
+
+
+class _WaveletMatrix:
+    """
+    整数序列上的小波矩阵，附带每个元素的累计量
+
+    sum_less(lo, hi, k) 返回位置 [lo, hi) 内取值小于 k 的元素的累计量之和，
+    每一层只做常数次查表，共 log2(n) 层；lo、hi、k 可以是数组，一次回答多个查询。
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        self.bits = max(len(keys).bit_length(), 1)
+        self.zeros = []  # 每一层：前 i 个元素中该位为 0 的个数
+        self.zero_sums = []  # 每一层：前 i 个元素中该位为 0 的元素的累计量
+        for b in reversed(range(self.bits)):
+            bit = (keys >> b) & 1
+            self.zeros.append(np.concatenate([[0], np.cumsum(bit == 0)]))
+            self.zero_sums.append(_prefix(values * (bit == 0)[:, None]))
+            # 稳定地把该位为 0 的元素排在前面，作为下一层的顺序
+            order = np.argsort(bit, kind="stable")
+            keys, values = keys[order], values[order]
+
+    def sum_less(self, lo: np.ndarray, hi: np.ndarray, k: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(lo), self.zero_sums[0].shape[1]))
+        for level, b in enumerate(reversed(range(self.bits))):
+            zeros, sums = self.zeros[level], self.zero_sums[level]
+            lo0, hi0 = zeros[lo], zeros[hi]
+            one = ((k >> b) & 1).astype(bool)
+            # k 的该位为 1：该位为 0 的元素都小于 k，计入结果后继续在该位为 1 的元素中查找
+            out[one] += sums[hi[one]] - sums[lo[one]]
+            total = zeros[-1]
+            lo = np.where(one, total + lo - lo0, lo0)
+            hi = np.where(one, total + hi - hi0, hi0)
+        return out
+
+
+class _Index:
+    """一组股票按市值排名的前缀和，以及按 PE 排名的小波矩阵"""
+
+    def __init__(self, ranks: np.ndarray, values: np.ndarray, pe: np.ndarray):
+        self.ranks = ranks  # 每支股票在全部成分股中的市值排名（升序）
+        self.by_rank = _prefix(values)
+        order = np.argsort(pe, kind="stable")
+        self.pe = pe[order]
+        pe_rank = np.empty(len(pe), dtype=np.int64)
+        pe_rank[order] = np.arange(len(pe))
+        self.tree = _WaveletMatrix(pe_rank, values)
+
+    def query(
+        self, lo: np.ndarray, hi: np.ndarray, max_pe: np.ndarray, clip: np.ndarray
+    ) -> np.ndarray:
+        """
+        每个查询中市值排名在 [lo, hi) 内的股票在 PE 上限下的累计量
+
+        clip 为 True 的查询把高于上限的 PE 截断为上限，否则剔除这些股票
+        """
+        i = np.searchsorted(self.ranks, lo)
+        j = np.searchsorted(self.ranks, hi)
+        window = self.by_rank[j] - self.by_rank[i]
+        k = np.searchsorted(self.pe, max_pe, "right")
+        below = self.tree.sum_less(i, j, k)
+        # 没有上限时高于上限的部分为 0，不参与截断（避免 0 × inf）
+        clip = clip & np.isfinite(max_pe)
+        with np.errstate(invalid="ignore"):
+            above = _clip(window - below, max_pe)
+        return below + np.where(clip[:, None], above, 0)
+
+
+class ScenarioEngine:
+    """
+    基于一份逐股快照的情景计算
+
+    Args:
+        df: 包含 Ticker、MarketCap、PE 列的 DataFrame，可选 Sector 列；
+            使用市值为正数的全部股票，PE 缺失或不为正数的股票只计入市值排名与市值占比
+        group: 分组所用的列
+    """
+
+    def __init__(self, df: pandas.DataFrame, group: str = "Sector"):
+        df = df[df["MarketCap"] > 0]
+        df = df.sort_values("MarketCap", ascending=False, kind="stable")
+        self.tickers = df["Ticker"].astype(str).to_numpy()
+        cap = df["MarketCap"].to_numpy(dtype=np.float64)
+        pe = df["PE"].to_numpy(dtype=np.float64)
+        valid = pe > 0
+        # 没有有效 PE 的股票排在 PE 序列的最前面，任何上限都不会截断或剔除它们
+        self.pe = np.where(valid, pe, -np.inf)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 每支股票的 [有效 PE 计 1, 有效 PE 的市值, 市值 × PE, 市值 / PE, 市值]
+            self.values = np.column_stack(
+                [
+                    valid,
+                    np.where(valid, cap, 0),
+                    np.where(valid, cap * pe, 0),
+                    np.where(valid, cap / pe, 0),
+                    cap,
+                ]
+            ).astype(np.float64)
+        if group in df:
+            groups = df[group].fillna(UNKNOWN_GROUP).astype(str).to_numpy()
+        else:
+            groups = np.full(len(cap), UNKNOWN_GROUP)
+        self.groups = groups
+
+        ranks = np.arange(len(cap))
+        self.all = _Index(ranks, self.values, self.pe)
+        self.by_group = {
+            g: _Index(
+                ranks[groups == g], self.values[groups == g], self.pe[groups == g]
+            )
+            for g in np.unique(groups)
+        }
+        self.position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.total = self.all.by_rank[-1]
+
+    @classmethod
+    def from_snapshot(cls, index: str, date: str | None = None) -> "ScenarioEngine":
+        """从 fundamentals_store 中某一天（默认最新）的快照创建"""
+        df = fundamentals_store.load_snapshot(index, date)
+        if df is None:
+            raise FileNotFoundError(
+                f"没有 {index} 的逐股快照，请先运行 python src/main.py pe"
+            )
+        return cls(df)
+
+    def group_names(self) -> list[str]:
+        return list(self.by_group)
+
+    def _groups(self, scenario: Scenario) -> tuple[str, ...] | None:
+        """情景选中的分组；不按分组筛选时为 None"""
+        if not scenario.exclude_groups and not scenario.only_groups:
+            return None
+        selected = scenario.only_groups or self.by_group
+        return tuple(
+            g
+            for g in selected
+            if g in self.by_group and g not in scenario.exclude_groups
+        )
+
+    def _window(self, scenario: Scenario) -> tuple[int, int]:
+        """情景保留的市值排名区间 [lo, hi)"""
+        n = len(self.tickers)
+        lo = min(scenario.exclude_top, n)
+        hi = n if scenario.top is None else max(min(scenario.top, n), lo)
+        return lo, hi
+
+    def _row(self, i: int, scenario: Scenario) -> np.ndarray:
+        """单支股票在情景的 PE 上限下的累计量"""
+        if scenario.max_pe is None or self.pe[i] <= scenario.max_pe:
+            return self.values[i]
+        if scenario.pe_mode == "exclude":
+            return np.zeros_like(self.values[i])
+        return _clip(self.values[i], scenario.max_pe)
+
+    def _selected(self, i: int, scenario: Scenario, lo: int, hi: int) -> bool:
+        group = self.groups[i]
+        return (
+            lo <= i < hi
+            and group not in scenario.exclude_groups
+            and (not scenario.only_groups or group in scenario.only_groups)
+        )
+
+    def sums_many(self, scenarios: list[Scenario]) -> np.ndarray:
+        """
+        批量计算多个情景的累计量，形状 (情景数, 5)
+
+        选中同一组行业的情景一起查询，每个情景每个行业只需 O(log n) 步
+        """
+        windows = np.array([self._window(s) for s in scenarios], dtype=np.int64)
+        windows = windows.reshape(-1, 2)
+        max_pe = np.array(
+            [np.inf if s.max_pe is None else s.max_pe for s in scenarios],
+            dtype=np.float64,
+        )
+        clip = np.array([s.pe_mode == "clip" for s in scenarios], dtype=bool)
+        batches: dict[tuple[str, ...] | None, list[int]] = {}
+        for row, scenario in enumerate(scenarios):
+            batches.setdefault(self._groups(scenario), []).append(row)
+
+        sums = np.zeros((len(scenarios), self.values.shape[1]))
+        for groups, rows in batches.items():
+            rows = np.array(rows)
+            indexes = (
+                [self.all] if groups is None else [self.by_group[g] for g in groups]
+            )
+            for index in indexes:
+                sums[rows] += index.query(
+                    windows[rows, 0], windows[rows, 1], max_pe[rows], clip[rows]
+                )
+
+        for row, scenario in enumerate(scenarios):
+            lo, hi = windows[row]
+            for ticker in set(scenario.exclude_tickers):
+                i = self.position.get(ticker)
+                if i is not None and self._selected(i, scenario, lo, hi):
+                    sums[row] -= self._row(i, scenario)
+        return sums
+
+    def sums(self, scenario: Scenario) -> np.ndarray:
+        """情景下的 [有效 PE 的股票数, 其市值, 市值 × PE, 市值 / PE, 市值]"""
+        return self.sums_many([scenario])[0]
+
+    def evaluate(self, scenario: Scenario) -> dict:
+        """情景下的市值加权市盈率、盈利加权市盈率、股票数与市值占比"""
+        count, pe_cap, cap_pe, earnings, cap = self.sums(scenario)
+        return {
+            "Scenario": scenario.name,
+            "PE": float(cap_pe / pe_cap) if pe_cap > 0 else None,
+            "EarningsPE": float(pe_cap / earnings) if earnings > 0 else None,
+            "Count": int(round(count)),
+            "CapShare": float(cap / self.total[4]) if self.total[4] > 0 else None,
+        }
+
+    def evaluate_many(self, scenarios: list[Scenario]) -> pandas.DataFrame:
+        """批量计算多个情景，每个情景一行"""
+        return self._frame([s.name for s in scenarios], self.sums_many(scenarios))
+
+    def sweep_top(self, counts, exclude: bool = True) -> pandas.DataFrame:
+        """
+        向量化地计算剔除（exclude=True）或只保留市值前 N 支股票时的结果，counts 为 N 的数组
+        """
+        counts = np.clip(np.asarray(counts), 0, len(self.tickers))
+        prefix = self.all.by_rank[counts]
+        sums = self.total - prefix if exclude else prefix
+        label = "剔除前" if exclude else "只含前"
+        return self._frame([f"{label} {n}" for n in counts], sums)
+
+    def sweep_max_pe(self, limits, pe_mode: str = "clip") -> pandas.DataFrame:
+        """向量化地计算一组 PE 上限下的结果"""
+        _check_mode(pe_mode)
+        limits = np.asarray(limits, dtype=np.float64)
+        sums = self.all.query(
+            np.zeros(len(limits), dtype=np.int64),
+            np.full(len(limits), len(self.tickers)),
+            limits,
+            np.full(len(limits), pe_mode == "clip"),
+        )
+        label = "PE 截断于" if pe_mode == "clip" else "剔除 PE 高于"
+        return self._frame([f"{label} {x:g}" for x in limits], sums)
+
+    def _frame(self, names: list[str], sums: np.ndarray) -> pandas.DataFrame:
+        count, pe_cap, cap_pe, earnings, cap = sums.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return pandas.DataFrame(
+                {
+                    "Scenario": names,
+                    "PE": np.where(pe_cap > 0, cap_pe / pe_cap, np.nan),
+                    "EarningsPE": np.where(earnings > 0, pe_cap / earnings, np.nan),
+                    "Count": count.round().astype(int),
+                    "CapShare": cap / self.total[4],
+                },
+                columns=RESULT_COLUMNS,
+            )
+
+
+# 默认输出的情景
+DEFAULT_SCENARIOS = [
+    Scenario("全部"),
+    Scenario("剔除市值前 10", exclude_top=10),
+    Scenario("只含市值前 10", top=10),
+    Scenario("剔除科技行业", exclude_groups=("Technology",)),
+    Scenario(
+        "剔除市值前 10 与科技行业", exclude_top=10, exclude_groups=("Technology",)
+    ),
+    Scenario("PE 截断于 100", max_pe=100),
+    Scenario("剔除 PE 高于 100", max_pe=100, pe_mode="exclude"),
+]
+
+
+def main(index: str = "sp500", date: str | None = None):
+    engine = ScenarioEngine.from_snapshot(index, date)
+    result = engine.evaluate_many(DEFAULT_SCENARIOS)
+    print(f"\n{index} 加权市盈率情景分析（{len(engine.tickers)} 支股票）:")
+    with pandas.option_context(
+        "display.float_format", "{:.2f}".format, "display.width", 120
+    ):
+        print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import metrics
+
+# 统一的网络访问层：连接池、重试与退避、熔断，以及录制/回放
+#
+#   live    直接访问网络（默认）
+#   record  访问网络，并把响应保存到 cassette 目录
+#   replay  只从 cassette 目录读取，不访问网络，缺少录制时抛出 CassetteMissError
+#
+# 模式和目录可以通过环境变量 PROVIDER_MODE、PROVIDER_CASSETTES 设置，或调用 set_mode()
+MODES = ("live", "record", "replay")
+CASSETTE_DIR = "cassettes"
+
+USER_AGENT = "principles-of-economics/0.1 (market data research)"
+TIMEOUT = 10
+# 连接池大小：与 fundamentals.MAX_WORKERS 一致，避免并发请求时反复建立连接
+POOL_SIZE = 16
+# HTTP 重试：次数、退避基数（秒）与需要重试的状态码
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# yf.download 出现异常时的重试次数与退避基数（秒）
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 1.0
+# 熔断：连续失败次数达到阈值后，在冷却时间内直接拒绝请求
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 60.0
+
+_mode = os.environ.get("PROVIDER_MODE", "live")
+_cassette_dir = os.environ.get("PROVIDER_CASSETTES", CASSETTE_DIR)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，请求未发出"""
+
+
+class CassetteMissError(LookupError):
+    """回放模式下找不到对应的录制"""
+
+
+class IncompleteDownloadError(RuntimeError):
+    """yf.download 返回空结果或缺少请求的代码（yfinance 内部吞掉了限流、超时等错误）"""
+
+
+def set_mode(mode: str, cassette_dir: str | None = None):
+    """切换 live / record / replay 模式"""
+    global _mode, _cassette_dir
+    if mode not in MODES:
+        raise ValueError(f"未知的模式: {mode}，可选 {MODES}")
+    _mode = mode
+    if cassette_dir is not None:
+        _cassette_dir = cassette_dir
+
+
+def get_mode() -> str:
+    return _mode
+
+
+class CircuitBreaker:
+    """
+    线程安全的熔断器：连续失败 failure_threshold 次后打开，reset_after 秒后放行一次试探请求，
+    试探成功则关闭，失败则重新计时
+
+    Args:
+        name: 名称，用于错误信息
+        failure_threshold: 打开熔断所需的连续失败次数
+        reset_after: 打开后的冷却时间（秒）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_after: float = RESET_AFTER,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """请求前调用：熔断打开且仍在冷却时间内时抛出 CircuitOpenError"""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_after:
+                metrics.incr(f"breaker.{self.name}.rejected")
+                raise CircuitOpenError(f"{self.name} 连续失败，暂停请求")
+            # 冷却结束，放行这一次试探请求，同时推迟其他请求
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    metrics.incr(f"breaker.{self.name}.opened")
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """在熔断保护下调用 func"""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+# 传输层错误的类型名：requests、curl_cffi（yfinance 使用）与内置异常的命名一致，
+# 按名称匹配可以不导入 curl_cffi
+TRANSPORT_ERRORS = {
+    "ConnectionError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "Timeout",
+    "TimeoutError",
+    "YFRateLimitError",
+}
+
+
+def is_transport_error(error: Exception) -> bool:
+    """
+    是否为网络或服务端故障（连接失败、超时、限流、5xx），这类错误才计入熔断
+
+    某支股票已退市或改名时服务端会正常返回 404 等错误，说明服务可用，不应触发熔断
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return any(cls.__name__ in TRANSPORT_ERRORS for cls in type(error).__mro__)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    """按名称（主机名或数据源）共享的熔断器"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """进程内共享的 requests.Session：连接池复用，429/5xx 按指数退避自动重试"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_BACKOFF,
+                status_forcelist=RETRY_STATUS,
+                allowed_methods=("GET",),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry
+            )
+            _session = requests.Session()
+            _session.headers["User-Agent"] = USER_AGENT
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _cassette_path(kind: str, key) -> str:
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+    return os.path.join(_cassette_dir, kind, f"{digest}.pkl")
+
+
+def _replay(kind: str, key):
+    path = _cassette_path(kind, key)
+    if not os.path.exists(path):
+        raise CassetteMissError(f"没有 {kind} {key} 的录制: {path}")
+    metrics.incr(f"cassette.{kind}.replayed")
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _record(kind: str, key, value):
+    path = _cassette_path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+class RecordedResponse:
+    """录制下来的 HTTP 响应，提供与 requests.Response 相同的常用属性"""
+
+    def __init__(self, url: str, status_code: int, headers: dict, text: str):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.text = text
+        self.content = text.encode()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}: {self.url}")
+
+
+def http_get(url: str, headers: dict | None = None, timeout: float = TIMEOUT):
+    """
+    GET 请求，签名与 requests.get 的常用部分一致
+
+    录制按 URL 区分，不包含条件请求头；304 响应不录制，回放时总是得到完整页面。
+    """
+    if _mode == "replay":
+        return _replay("http", url)
+
+    host_breaker = breaker(urlparse(url).netloc)
+    host_breaker.before_call()
+    try:
+        with metrics.span("http.get"):
+            response = session().get(url, headers=headers, timeout=timeout)
+    except Exception:
+        host_breaker.record_failure()
+        raise
+    metrics.incr("http.bytes", len(response.content))
+    metrics.incr(f"http.status.{response.status_code}")
+    # 会话的重试用尽后仍为 5xx 时响应正常返回，同样计为一次失败
+    if response.status_code >= 500:
+        host_breaker.record_failure()
+    else:
+        host_breaker.record_success()
+    if _mode == "record" and response.status_code != 304:
+        _record(
+            "http",
+            url,
+            RecordedResponse(
+                url, response.status_code, dict(response.headers), response.text
+            ),
+        )
+    return response
+
+
+# yf.download 内部使用模块级共享状态，多个线程同时调用会互相覆盖结果
+_download_lock = threading.Lock()
+
+
+def missing_symbols(data: pandas.DataFrame, symbols: list[str]) -> list[str]:
+    """yf.download 的结果中没有返回或收盘价全为 NaN 的代码"""
+    if data.empty:
+        return list(symbols)
+    close = data["Close"]
+    if isinstance(close, pandas.Series):
+        return [] if close.notna().any() else list(symbols)
+    return [s for s in symbols if s not in close.columns or close[s].isna().all()]
+
+
+def _checked_download(symbols: list[str], start: str | None, require_all: bool):
+    # yfinance 导入较慢，只在真正访问网络时导入
+    import yfinance as yf
+
+    data = yf.download(symbols, start=start, auto_adjust=True)
+    missing = missing_symbols(data, symbols)
+    if len(missing) == len(symbols) or (require_all and missing):
+        raise IncompleteDownloadError(f"yf.download 没有返回 {', '.join(missing)}")
+    return data
+
+
+def download(
+    symbols: list[str], start: str | None = None, require_all: bool = True
+) -> pandas.DataFrame:
+    """
+    yf.download(symbols, start, auto_adjust=True)，失败时退避重试
+
+    yf.download 对单个代码的失败只记录日志、返回空列，因此结果为空，或 require_all 时
+    缺少任何一个代码，都视为一次失败（IncompleteDownloadError）计入熔断并重试。
+    批量下载成分股时可以传入 require_all=False，容许已退市的代码没有数据。
+    """
+    key = {"symbols": list(symbols), "start": start}
+    if _mode == "replay":
+        return _replay("download", key)
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        try:
+            with _download_lock, metrics.span("yfinance.download"):
+                data = breaker("yfinance.download").call(
+                    _checked_download, symbols, start, require_all
+                )
+            break
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            metrics.incr("yfinance.download.retries")
+            time.sleep(DOWNLOAD_BACKOFF * 2**attempt)
+    metrics.incr("yfinance.download.rows", len(data))
+    metrics.incr("yfinance.download.bytes", int(data.memory_usage().sum()))
+    if _mode == "record":
+        _record("download", key, data)
+    return data
+
+
+def ticker_info(ticker: str) -> dict:
+    """
+    yf.Ticker(ticker).info；重试由调用方（fundamentals.fetch_info）负责
+
+    只有传输层错误会抛出并计入熔断；其他错误（代码不存在、已退市）视为该股票没有数据，返回空字典
+    """
+    if _mode == "replay":
+        return _replay("info", ticker)
+    import yfinance as yf
+
+    info_breaker = breaker("yfinance.info")
+    info_breaker.before_call()
+    try:
+        with metrics.span("yfinance.info"):
+            info = yf.Ticker(ticker).info
+    except Exception as e:
+        if is_transport_error(e):
+            info_breaker.record_failure()
+            raise
+        metrics.incr("yfinance.info.empty")
+        info = {}
+    info_breaker.record_success()
+    if _mode == "record":
+        _record("info", ticker, info)
+    return info
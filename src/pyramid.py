@@ -0,0 +1,173 @@
+import os
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import market_change
+import storage
+
+# 多分辨率序列金字塔：data/pyramid/<指数>/<级别>.npy，可由 CSV 重建，不提交到仓库
+#
+# 每一级是一个结构化数组，每行对应一个周期：最后一个交易日、首个/最后一个收盘价、最低/最高收盘价。
+# 第一级直接取已保存的周度收盘价（仓库不保存日线），之后每一级由上一级合并得到。
+# 文件以内存映射方式打开，图表只读取可见区间内不超过像素数的若干行。
+# source.txt 记录生成时周度 CSV 的内容摘要，最后写入，与当前 CSV 不一致时重新计算。
+PYRAMID_DIR = "data/pyramid"
+BASE_FREQ = "weekly"
+LEVELS = ("weekly", "monthly", "quarterly", "yearly")
+# 级别 -> 每个周期包含的月数；周度为第一级，不按月分组
+LEVEL_MONTHS = {"monthly": 1, "quarterly": 3, "yearly": 12}
+LEVEL_LABELS = {"weekly": "周", "monthly": "月", "quarterly": "季", "yearly": "年"}
+DTYPE = np.dtype(
+    [
+        ("date", "datetime64[D]"),
+        ("first", np.float32),
+        ("last", np.float32),
+        ("min", np.float32),
+        ("max", np.float32),
+    ]
+)
+
+
+def _aggregate(level: np.ndarray, months: int) -> np.ndarray:
+    """把上一级合并为以 months 个月为一个周期的下一级"""
+    # 1970-01 是季度和年份的起点，自纪元起的月数整除即为周期编号
+    ids = level["date"].astype("datetime64[M]").astype(np.int64) // months
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    ends = np.r_[starts[1:], len(level)] - 1
+    merged = np.empty(len(starts), dtype=DTYPE)
+    merged["date"] = level["date"][ends]
+    merged["first"] = level["first"][starts]
+    merged["last"] = level["last"][ends]
+    merged["min"] = np.minimum.reduceat(level["min"], starts)
+    merged["max"] = np.maximum.reduceat(level["max"], starts)
+    return merged
+
+
+def build_levels(close: pandas.Series) -> dict[str, np.ndarray]:
+    """由收盘价序列（以日期为索引）计算全部级别"""
+    close = close.dropna()
+    base = np.empty(len(close), dtype=DTYPE)
+    base["date"] = close.index.to_numpy(dtype="datetime64[D]")
+    for field in ("first", "last", "min", "max"):
+        base[field] = close.to_numpy(dtype=np.float32)
+    levels = {LEVELS[0]: base}
+    for finer, level in zip(LEVELS, LEVELS[1:]):
+        levels[level] = _aggregate(levels[finer], LEVEL_MONTHS[level])
+    return levels
+
+
+@dataclass
+class Pyramid:
+    prefix: str
+    levels: dict[str, np.ndarray]  # 级别 -> 结构化数组（numpy.memmap）
+
+    def _bounds(self, level: str, start, end) -> tuple[int, int]:
+        dates = self.levels[level]["date"]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"))
+        hi = (
+            len(dates)
+            if end is None
+            else np.searchsorted(dates, np.datetime64(end, "D"), "right")
+        )
+        return int(lo), int(hi)
+
+    def choose(self, start=None, end=None, pixels: int = 1600) -> str:
+        """区间内点数不超过 pixels 的最细级别；每一级只做两次二分查找"""
+        for level in LEVELS:
+            lo, hi = self._bounds(level, start, end)
+            if hi - lo <= pixels:
+                return level
+        return LEVELS[-1]
+
+    def query(
+        self, start=None, end=None, pixels: int = 1600
+    ) -> tuple[str, pandas.DataFrame]:
+        """
+        按可见区间与像素宽度取数
+
+        Returns:
+            (级别, DataFrame[Date, first, last, min, max])；区间两侧各多取一个周期，
+            平移时折线能延伸到图表边缘
+        """
+        level = self.choose(start, end, pixels)
+        lo, hi = self._bounds(level, start, end)
+        rows = np.asarray(self.levels[level][max(lo - 1, 0) : hi + 1])
+        df = pandas.DataFrame({field: rows[field] for field in DTYPE.names})
+        df = df.rename(columns={"date": "Date"})
+        df["Date"] = df["Date"].astype("datetime64[ns]")
+        return level, df
+
+
+def _dir(prefix: str) -> str:
+    return os.path.join(PYRAMID_DIR, prefix)
+
+
+def level_path(prefix: str, level: str) -> str:
+    return os.path.join(_dir(prefix), f"{level}.npy")
+
+
+def _source(prefix: str) -> str:
+    return storage.csv_path(market_change.series_name(prefix, BASE_FREQ))
+
+
+def _key_path(prefix: str) -> str:
+    return os.path.join(_dir(prefix), "source.txt")
+
+
+def _stored_key(prefix: str) -> str | None:
+    try:
+        with open(_key_path(prefix), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def build(prefix: str) -> Pyramid:
+    """由已保存的周度序列重新计算并保存某个指数的金字塔"""
+    index = market_change.find_index(prefix)
+    key = storage.source_key(_source(prefix))
+    df = storage.load_series(market_change.series_name(prefix, BASE_FREQ))
+    levels = build_levels(df.set_index("Date")[index.symbol])
+    os.makedirs(_dir(prefix), exist_ok=True)
+    # 每次写入使用不同的临时文件，看板与每日任务同时重建时不会写到同一个文件
+    suffix = uuid.uuid4().hex
+    for level, values in levels.items():
+        path = level_path(prefix, level)
+        # np.save 会给不以 .npy 结尾的文件名补上扩展名，临时文件名需要以 .npy 结尾
+        tmp_path = f"{path[: -len('.npy')]}.{suffix}.tmp.npy"
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+    tmp_path = f"{_key_path(prefix)}.{suffix}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(key)
+    os.replace(tmp_path, _key_path(prefix))
+    return load(prefix, rebuild=False)
+
+
+def load(prefix: str, rebuild: bool = True) -> Pyramid:
+    """以内存映射方式打开金字塔；文件缺失或周度 CSV 的内容变化时重新计算"""
+    paths = [level_path(prefix, level) for level in LEVELS]
+    if rebuild:
+        if not all(os.path.exists(p) for p in paths):
+            return build(prefix)
+        if _stored_key(prefix) != storage.source_key(_source(prefix)):
+            return build(prefix)
+    return Pyramid(
+        prefix, {level: np.load(p, mmap_mode="r") for level, p in zip(LEVELS, paths)}
+    )
+
+
+def build_all(indexes=market_change.INDEXES) -> dict[str, Pyramid]:
+    return {index.prefix: build(index.prefix) for index in indexes}
+
+
+if __name__ == "__main__":
+    for prefix, pyramid in build_all().items():
+        sizes = ", ".join(
+            f"{LEVEL_LABELS[level]} {len(values)}"
+            for level, values in pyramid.levels.items()
+        )
+        print(f"{prefix}: {sizes}")
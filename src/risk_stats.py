@@ -0,0 +1,222 @@
+import threading
+
+import numpy as np
+import pandas
+
+import storage
+
+# 每年的期数，用于年化
+PERIODS_PER_YEAR = {"weekly": 52, "monthly": 12, "annual": 1}
+# 滚动窗口长度（期数）：周度 1 年、月度 3 年、年度 10 年
+ROLLING_WINDOWS = {"weekly": 52, "monthly": 36, "annual": 10}
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _extend_cumsum(cumsum: np.ndarray, values: np.ndarray, k: int) -> np.ndarray:
+    """保留 cumsum 的前 k 项，从第 k 项起用 values[k:] 继续累加"""
+    base = cumsum[k - 1] if k else 0.0
+    return np.concatenate([cumsum[:k], base + np.cumsum(values[k:])])
+
+
+def _rolling_sum(cumsum: np.ndarray, window: int) -> np.ndarray:
+    """由前缀和得到长度为 window 的滑动窗口和，结果第 i 项对应以第 i + window - 1 项结尾的窗口"""
+    padded = np.concatenate([[0.0], cumsum])
+    return padded[window:] - padded[:-window]
+
+
+class RiskStats:
+    """
+    单个指数序列（Date、收盘价）的风险统计，内部保存收益率及其前缀和
+
+    新数据追加到末尾或替换最后几行时，只重算发生变化的部分；所有滚动统计都由前缀和一次性得到。
+
+    Args:
+        freq: 'weekly' / 'monthly' / 'annual'
+        window: 滚动窗口期数，默认取 ROLLING_WINDOWS[freq]
+        risk_free: 年化无风险利率（小数），用于 Sharpe / Sortino
+    """
+
+    def __init__(self, freq: str, window: int | None = None, risk_free: float = 0.0):
+        self.freq = freq
+        self.periods = PERIODS_PER_YEAR[freq]
+        self.window = window or ROLLING_WINDOWS[freq]
+        self.risk_free = risk_free / self.periods  # 每期无风险收益
+        self.dates = np.array([], dtype="datetime64[ns]")
+        self.close = np.array([], dtype=np.float64)
+        self.returns = np.array([], dtype=np.float64)  # 第 0 项为 0
+        self.sum1 = np.array([], dtype=np.float64)  # Σr
+        self.sum2 = np.array([], dtype=np.float64)  # Σr²
+        self.downside = np.array([], dtype=np.float64)  # Σmin(r - rf, 0)²
+        self.peak = np.array([], dtype=np.float64)  # 历史最高收盘价
+        self._summary = None
+
+    def update(self, df: pandas.DataFrame) -> int:
+        """
+        用完整序列更新统计，与已有数据相同的前缀不再重算
+
+        尚未结束的最后一个周期不参与统计（见 storage.closed_periods），
+        否则年初时只有几周的“年度收益率”会被当作完整的一年
+
+        Returns:
+            重新计算的行数
+        """
+        # 收盘价列以指数代码命名（如 '^GSPC'），位于 Date 之后
+        column = df.columns[df.columns.get_loc("Date") + 1]
+        df = storage.closed_periods(df.dropna(subset=[column]))
+        dates = df["Date"].to_numpy(dtype="datetime64[ns]")
+        close = df[column].to_numpy(dtype=np.float64)
+
+        n = min(len(self.close), len(close))
+        changed = np.flatnonzero(
+            (self.dates[:n] != dates[:n]) | (self.close[:n] != close[:n])
+        )
+        k = changed[0] if len(changed) else n
+        if k == len(self.close) == len(close):
+            return 0
+
+        self.dates, self.close = dates, close
+        returns = np.zeros(len(close))
+        returns[1:] = close[1:] / close[:-1] - 1
+        self.returns = returns
+        self.sum1 = _extend_cumsum(self.sum1, returns, k)
+        self.sum2 = _extend_cumsum(self.sum2, returns**2, k)
+        excess = np.minimum(returns - self.risk_free, 0.0)
+        excess[0] = 0.0
+        self.downside = _extend_cumsum(self.downside, excess**2, k)
+        start = self.peak[k - 1] if k else -np.inf
+        self.peak = np.concatenate(
+            [self.peak[:k], np.maximum.accumulate(np.maximum(close[k:], start))]
+        )
+        self._summary = None
+        return len(close) - k
+
+    def rolling(self) -> pandas.DataFrame:
+        """滚动年化波动率、年化收益率（CAGR）和 Sharpe，Date 为窗口的最后一期"""
+        w = self.window
+        if len(self.close) <= w:
+            return pandas.DataFrame(columns=["Date", "Volatility", "CAGR", "Sharpe"])
+        # 只使用第 1 项之后的收益率：窗口 [i - w + 1, i] 的 w 个收益率对应收盘价 close[i - w] ~ close[i]
+        s1 = _rolling_sum(self.sum1[1:] - self.sum1[0], w)
+        s2 = _rolling_sum(self.sum2[1:] - self.sum2[0], w)
+        mean = s1 / w
+        var = np.maximum(s2 - s1 * mean, 0.0) / (w - 1)
+        std = np.sqrt(var)
+        cagr = (self.close[w:] / self.close[:-w]) ** (self.periods / w) - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = (mean - self.risk_free) / std * np.sqrt(self.periods)
+        return pandas.DataFrame(
+            {
+                "Date": self.dates[w:],
+                "Volatility": std * np.sqrt(self.periods),
+                "CAGR": cagr,
+                "Sharpe": sharpe,
+            }
+        )
+
+    def drawdown(self) -> dict:
+        """最大回撤及其开始、谷底、恢复日期；尚未恢复时恢复日期为 None"""
+        drawdowns = self.close / self.peak - 1
+        trough = int(np.argmin(drawdowns))
+        peak_value = self.peak[trough]
+        peak = int(np.flatnonzero(self.close[: trough + 1] == peak_value)[-1])
+        recovered = np.flatnonzero(self.close[trough:] >= peak_value)
+        recovery = trough + int(recovered[0]) if len(recovered) else None
+        return {
+            "max_drawdown": float(drawdowns[trough]),
+            "peak_date": pandas.Timestamp(self.dates[peak]),
+            "trough_date": pandas.Timestamp(self.dates[trough]),
+            "recovery_date": None
+            if recovery is None
+            else pandas.Timestamp(self.dates[recovery]),
+            # 从谷底回到前高所用的期数
+            "recovery_periods": None if recovery is None else recovery - trough,
+            "current_drawdown": float(drawdowns[-1]),
+        }
+
+    def summary(self) -> dict:
+        """全部统计结果，数据未变化时直接返回上次的结果"""
+        if self._summary is not None:
+            return self._summary
+        n = len(self.returns) - 1
+        if n < 2:
+            return {}
+        returns = self.returns[1:]
+        mean = (self.sum1[-1] - self.sum1[0]) / n
+        var = max(self.sum2[-1] - self.sum2[0] - n * mean**2, 0.0) / (n - 1)
+        downside = np.sqrt(self.downside[-1] / n)
+        scale = np.sqrt(self.periods)
+        excess = mean - self.risk_free
+        rolling = self.rolling()
+        latest = rolling.iloc[-1] if len(rolling) else None
+
+        self._summary = {
+            "periods": n,
+            "volatility": float(np.sqrt(var) * scale),
+            "cagr": float((self.close[-1] / self.close[0]) ** (self.periods / n) - 1),
+            "sharpe": float(excess / np.sqrt(var) * scale) if var else None,
+            "sortino": float(excess / downside * scale) if downside else None,
+            "window_years": self.window / self.periods,
+            "rolling_volatility": None
+            if latest is None
+            else float(latest["Volatility"]),
+            "rolling_cagr": None if latest is None else float(latest["CAGR"]),
+            "percentiles": dict(
+                zip(PERCENTILES, np.percentile(returns, PERCENTILES).tolist())
+            ),
+            **self.drawdown(),
+        }
+        return self._summary
+
+
+_engines: dict[str, RiskStats] = {}
+_engines_lock = threading.Lock()
+
+
+def get_stats(name: str, freq: str, df: pandas.DataFrame) -> dict:
+    """
+    按序列名称缓存统计引擎：同一序列再次计算时只处理新增或变化的行
+
+    Args:
+        name: 序列名称，如 'sp500_weekly_change'
+        freq: 'weekly' / 'monthly' / 'annual'
+        df: storage.load_series 返回的序列：Date、收盘价、Rate 列
+    """
+    # 看板的多个会话会在不同线程中同时调用，引擎的增量更新与缓存的结果都需要在锁内完成
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None or engine.freq != freq:
+            engine = _engines[name] = RiskStats(freq)
+        engine.update(df)
+        return engine.summary()
+
+
+def format_summary(stats: dict) -> list[str]:
+    """把 summary() 的结果格式化为若干行中文说明"""
+    if not stats:
+        return ["数据不足，无法计算风险指标"]
+
+    def ratio(value):
+        return "—" if value is None else f"{value:.2f}"
+
+    recovery = (
+        f"{stats['recovery_date']:%Y-%m-%d} 恢复，用时 {stats['recovery_periods']} 期"
+        if stats["recovery_date"] is not None
+        else "尚未恢复"
+    )
+    percentiles = "，".join(
+        f"P{p} {value * 100:.2f}%" for p, value in stats["percentiles"].items()
+    )
+    lines = [
+        f"年化波动率: {stats['volatility']:.2%}，年化收益率: {stats['cagr']:.2%}",
+        f"Sharpe: {ratio(stats['sharpe'])}，Sortino: {ratio(stats['sortino'])}",
+        f"最大回撤: {stats['max_drawdown']:.2%}（{stats['peak_date']:%Y-%m-%d} 至 "
+        f"{stats['trough_date']:%Y-%m-%d}，{recovery}），当前回撤: "
+        f"{stats['current_drawdown']:.2%}",
+    ]
+    if stats["rolling_volatility"] is not None:
+        lines.append(
+            f"最近 {stats['window_years']:g} 年滚动波动率: {stats['rolling_volatility']:.2%}，"
+            f"滚动年化收益率: {stats['rolling_cagr']:.2%}"
+        )
+    lines.append(f"收益率分位数: {percentiles}")
+    return lines
@@ -0,0 +1,205 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas
+
+import market_change
+import storage
+from risk_stats import PERCENTILES
+
+# 每个分块最多抽取的随机下标个数（路径数 × 每条路径的块数），限制单个分块的内存占用
+CHUNK_DRAWS = 1 << 23
+# 模拟的默认路径数
+DEFAULT_PATHS = 1_000_000
+
+
+@dataclass
+class SimulationResult:
+    """
+    收益路径模拟的结果
+
+    只保留每条路径的期末财富倍数（初始为 1），float32 存储，一千万条路径约 40MB
+    """
+
+    horizon: int
+    block: int
+    terminal: np.ndarray
+
+    @property
+    def paths(self) -> int:
+        return len(self.terminal)
+
+    def probability_of_loss(self) -> float:
+        """期末亏损（财富倍数小于 1）的概率"""
+        return float(np.count_nonzero(self.terminal < 1) / self.paths)
+
+    def percentiles(self, q=PERCENTILES) -> dict:
+        """期末财富倍数的分位数"""
+        return dict(zip(q, np.percentile(self.terminal, q).tolist()))
+
+    def summary(self) -> dict:
+        return {
+            "horizon": self.horizon,
+            "block": self.block,
+            "paths": self.paths,
+            "mean": float(self.terminal.mean(dtype=np.float64)),
+            "probability_of_loss": self.probability_of_loss(),
+            "percentiles": self.percentiles(),
+        }
+
+
+def load_returns(prefix: str, freq: str) -> np.ndarray:
+    """
+    已保存序列的各期收益率（小数，如 0.01 表示 1%），按时间顺序
+
+    尚未结束的最后一个周期不参与抽样，否则年初几周的涨跌会被当作完整一年的收益
+    """
+    df = storage.closed_periods(
+        storage.load_series(market_change.series_name(prefix, freq))
+    )
+    return df["Rate"].dropna().to_numpy(dtype=np.float64) / 100
+
+
+def _block_sums(log_returns: np.ndarray, length: int) -> np.ndarray:
+    """
+    以每一期为起点、长度为 length 的对数收益之和；超出序列末尾时回到开头（循环块自助法）
+
+    由前缀和一次算出，模拟时每个块只需查表一次，不用逐期累加。
+    """
+    n = len(log_returns)
+    wrapped = np.concatenate([log_returns, log_returns[: length - 1]])
+    cumsum = np.concatenate([[0.0], np.cumsum(wrapped)])
+    return cumsum[length : length + n] - cumsum[:n]
+
+
+def _simulate_chunk(
+    full: np.ndarray, partial: np.ndarray | None, blocks: int, paths: int, rng
+) -> np.ndarray:
+    """一个分块内所有路径的期末对数财富"""
+    n = len(full)
+    total = full[rng.integers(0, n, (paths, blocks), dtype=np.int32)].sum(axis=1)
+    if partial is not None:
+        total += partial[rng.integers(0, n, paths, dtype=np.int32)]
+    return total
+
+
+def _simulate_worker(
+    log_returns: np.ndarray, horizon: int, block: int, paths: int, seed
+) -> np.ndarray:
+    """在单个进程中按分块生成 paths 条路径，返回期末财富倍数"""
+    rng = np.random.default_rng(seed)
+    blocks, rest = divmod(horizon, block)
+    full = _block_sums(log_returns, block)
+    partial = _block_sums(log_returns, rest) if rest else None
+    # 每个分块抽取 (路径数 × 块数) 个下标，据此决定分块大小
+    chunk = max(1, CHUNK_DRAWS // (blocks + (rest > 0)))
+    terminal = np.empty(paths, dtype=np.float32)
+    for start in range(0, paths, chunk):
+        stop = min(start + chunk, paths)
+        log_wealth = _simulate_chunk(full, partial, blocks, stop - start, rng)
+        terminal[start:stop] = np.exp(log_wealth)
+    return terminal
+
+
+def simulate(
+    returns: np.ndarray,
+    horizon: int,
+    paths: int = DEFAULT_PATHS,
+    block: int = 1,
+    seed=None,
+    workers: int | None = None,
+) -> SimulationResult:
+    """
+    用自助法从历史收益率中抽样，模拟 horizon 期后的财富分布
+
+    Args:
+        returns: 各期收益率（小数）
+        horizon: 模拟的期数
+        paths: 路径数
+        block: 块长度；1 为逐期独立抽样，大于 1 时按连续 block 期整体抽样，保留序列相关性
+        seed: 随机种子，相同的种子与 workers 得到相同的结果
+        workers: 进程数；None 或 1 时在当前进程运行
+    """
+    if horizon < 1 or block < 1:
+        raise ValueError("horizon 与 block 必须为正整数")
+    if len(returns) == 0:
+        raise ValueError("没有可用于抽样的收益率")
+    log_returns = np.log1p(np.asarray(returns, dtype=np.float64))
+    block = min(block, horizon)
+    workers = max(1, min(workers or 1, paths))
+    # 每个进程使用独立的随机数流
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers == 1:
+        terminal = _simulate_worker(log_returns, horizon, block, paths, seeds[0])
+    else:
+        sizes = [paths // workers + (i < paths % workers) for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = executor.map(
+                _simulate_worker,
+                [log_returns] * workers,
+                [horizon] * workers,
+                [block] * workers,
+                sizes,
+                seeds,
+            )
+            terminal = np.concatenate(list(parts))
+    return SimulationResult(horizon, block, terminal)
+
+
+def horizon_table(
+    returns: np.ndarray,
+    horizons: list[int],
+    paths: int = DEFAULT_PATHS,
+    block: int = 1,
+    seed=None,
+    workers: int | None = None,
+) -> pandas.DataFrame:
+    """不同期限下的亏损概率与期末财富分位数，每个期限一行"""
+    rows = []
+    for horizon in horizons:
+        stats = simulate(returns, horizon, paths, block, seed, workers).summary()
+        rows.append(
+            {
+                "期数": horizon,
+                "亏损概率": stats["probability_of_loss"],
+                "平均": stats["mean"],
+                **{f"P{q}": v for q, v in stats["percentiles"].items()},
+            }
+        )
+    return pandas.DataFrame(rows).set_index("期数")
+
+
+def print_result(index, freq: str, result: SimulationResult):
+    label = market_change.FREQ_LABELS[freq][0]
+    stats = result.summary()
+    block = "逐期抽样" if result.block == 1 else f"块长度 {result.block}"
+    print(
+        f"\n{index.name}{label}收益率自助法模拟：{result.horizon} 期，"
+        f"{result.paths:,} 条路径（{block}）"
+    )
+    print(f"亏损概率: {stats['probability_of_loss']:.2%}")
+    print(f"期末财富倍数平均值: {stats['mean']:.2f}")
+    for q, value in stats["percentiles"].items():
+        print(f"  P{q}: {value:.2f}")
+
+
+def main(
+    prefix: str = "sp500",
+    freq: str = "annual",
+    horizon: int = 10,
+    paths: int = DEFAULT_PATHS,
+    block: int = 1,
+    seed=None,
+    workers: int | None = None,
+):
+    index = market_change.find_index(prefix)
+    returns = load_returns(prefix, freq)
+    result = simulate(returns, horizon, paths, block, seed, workers)
+    print_result(index, freq, result)
+    return result
+
+
+if __name__ == "__main__":
+    main(workers=os.cpu_count())
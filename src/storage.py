@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import importlib.util
+import os
+import uuid
+
+import numpy as np
+import pandas
+
+# 列式存储目录，与 data/csv 中的同名 CSV 一一对应；可由 CSV 重建，不提交到仓库
+PARQUET_DIR = "data/parquet"
+CSV_DIR = "data/csv"
+# Parquet 元数据中记录源 CSV 内容摘要的键
+SOURCE_KEY = b"source_csv"
+
+# pyarrow 随 streamlit 一起安装；缺失时只读写 CSV
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+
+def parquet_path(name: str) -> str:
+    return os.path.join(PARQUET_DIR, f"{name}.parquet")
+
+
+def csv_path(name: str) -> str:
+    return os.path.join(CSV_DIR, f"{name}.csv")
+
+
+def source_key(*paths: str) -> str:
+    """
+    源文件内容的摘要，用于判断派生文件是否过期
+
+    git checkout 会改变文件的修改时间，但不改变内容，因此不能用修改时间比较新旧。
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def to_compact(df: pandas.DataFrame) -> pandas.DataFrame:
+    """把以日期为索引或含 Date 列的序列转换为紧凑类型：Date 为 datetime64，数值为 float32"""
+    if "Date" not in df.columns:
+        df = df.reset_index()
+    df = df.rename(columns={df.columns[0]: "Date"})
+    df["Date"] = pandas.to_datetime(df["Date"])
+    for column in df.columns[1:]:
+        df[column] = df[column].astype(np.float32)
+    return df
+
+
+def write_series(name: str, df: pandas.DataFrame):
+    """
+    把完整序列写入 Parquet 文件（先写临时文件再替换，避免读到写了一半的文件）
+
+    文件元数据中记录同名 CSV 当前内容的摘要，调用前 CSV 应已写入相同的数据。
+    """
+    if not HAS_PARQUET:
+        return
+    import pyarrow
+    import pyarrow.parquet
+
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    path = parquet_path(name)
+    # 多个线程或看板会话可能同时重建同一个文件，每次写入使用不同的临时文件
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    table = pyarrow.Table.from_pandas(to_compact(df), preserve_index=False)
+    if os.path.exists(csv_path(name)):
+        metadata = dict(table.schema.metadata or {})
+        metadata[SOURCE_KEY] = source_key(csv_path(name)).encode()
+        table = table.replace_schema_metadata(metadata)
+    pyarrow.parquet.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def update_series(name: str, fresh: pandas.DataFrame):
+    """
+    用新的尾部数据更新 Parquet 文件：日期不早于 fresh 第一行的旧数据被替换
+
+    Parquet 文件不存在时从同名 CSV 重建。
+    """
+    if not HAS_PARQUET:
+        return
+    if not os.path.exists(parquet_path(name)):
+        write_series(name, pandas.read_csv(csv_path(name)))
+        return
+    stored = pandas.read_parquet(parquet_path(name))
+    fresh = to_compact(fresh)
+    stored = stored[stored["Date"] < fresh["Date"].iloc[0]]
+    write_series(name, pandas.concat([stored, fresh], ignore_index=True))
+
+
+def load_series(name: str) -> pandas.DataFrame:
+    """
+    加载序列，返回可直接使用的 DataFrame：Date 列为 datetime64，数值列为 float32
+
+    优先读取 Parquet；Parquet 不存在、不可用或与 CSV 内容不一致时解析 CSV，并顺便重建 Parquet。
+    """
+    path = parquet_path(name)
+    if HAS_PARQUET and os.path.exists(path):
+        import pyarrow.parquet
+
+        metadata = pyarrow.parquet.read_schema(path).metadata or {}
+        if metadata.get(SOURCE_KEY) == source_key(csv_path(name)).encode():
+            return pandas.read_parquet(path)
+    df = to_compact(pandas.read_csv(csv_path(name)))
+    write_series(name, df)
+    return df
+
+
+def closed_periods(df: pandas.DataFrame, today=None) -> pandas.DataFrame:
+    """
+    去掉尚未结束的最后一个周期
+
+    变化率序列的 Date 是周期的结束日（周日、月末或年末），不早于今天时该周期仍在进行，
+    最后一行只是截至今天的部分数据，不能当作完整的一周、一月或一年参与统计。
+    """
+    today = pandas.Timestamp(today or datetime.date.today())
+    if len(df) and df["Date"].iloc[-1] >= today:
+        return df.iloc[:-1]
+    return df
+
+
+def load_all(names: list[str]) -> dict[str, pandas.DataFrame]:
+    """批量加载多个序列"""
+    return {name: load_series(name) for name in names}
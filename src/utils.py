@@ -1,20 +1,29 @@
 import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import matplotlib
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas
 from matplotlib.ticker import FuncFormatter
 
+import metrics
+import storage
 
-def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"):
-    """
-    增强版金融数据可视化函数
 
-    Args:
-        df: 包含日期、指数值和变化率的DataFrame
-        index_name: 指数名称
-        freq: 频率，'monthly'或'weekly'
-    """
+# 图表样式与字体只需设置一次
+_style_ready = False
+
+
+def setup_style():
+    """设置图表样式与中文字体，重复调用不会重复设置"""
+    global _style_ready
+    if _style_ready:
+        return
+
     # 设置更现代的图表样式
     plt.style.use("seaborn-v0_8-darkgrid")  # 使用更现代的seaborn样式
 
@@ -24,14 +33,84 @@ def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"
         "Microsoft YaHei",
         "SimSun",
         "Arial Unicode MS",
+        "Noto Sans CJK SC",  # Linux 无界面环境（如 GitHub Actions）
     ]
     plt.rcParams["axes.unicode_minus"] = False  # 解决负号显示问题
     plt.rcParams["font.size"] = 11  # 默认字体大小
     plt.rcParams["axes.titlesize"] = 14  # 标题字体大小
     plt.rcParams["axes.labelsize"] = 12  # 轴标签字体大小
+    _style_ready = True
+
+
+def rate_colors(rate: np.ndarray) -> np.ndarray:
+    """按变化率分档，一次性计算整列柱状图颜色"""
+    return np.select(
+        [rate > 5, rate > 0, rate > -5],
+        [
+            "#1E8449",  # 大幅上涨：深绿色
+            "#58D68D",  # 小幅上涨：浅绿色
+            "#F1948A",  # 小幅下跌：浅红色
+        ],
+        default="#C0392B",  # 大幅下跌：深红色
+    )
+
+
+def lod_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    按 min/max 降采样：把序列等分为 max_points // 2 个桶，每个桶只保留最小值和最大值所在位置
+
+    Args:
+        values: 待绘制的数值序列，可以包含 NaN
+        max_points: 最多保留的点数，通常取图表的像素宽度
+
+    Returns:
+        递增的下标数组，首尾两点总会保留；数据量不超过 max_points 时返回全部下标
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)  # 向上取整
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+
+    # NaN 不参与比较：找最小值时视为 +inf，找最大值时视为 -inf
+    starts = np.arange(buckets) * size
+    low = starts + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    high = starts + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+
+    indices = np.unique(np.concatenate([[0, n - 1], low, high]))
+    indices = indices[indices < n]
+    # 整个桶都是 NaN 时 argmin / argmax 落在 NaN 上，这些点不保留（首尾两点除外）
+    keep = ~np.isnan(values[indices]) | (indices == 0) | (indices == n - 1)
+    return indices[keep]
+
+
+def matplotlib_show(
+    df: pandas.DataFrame,
+    index_name: str,
+    freq: str = "monthly",
+    output: str | None = None,
+    pyramid=None,
+):
+    """
+    增强版金融数据可视化函数
 
-    # 确保日期格式正确
-    df["Date"] = pandas.to_datetime(df["Date"])
+    Args:
+        df: 包含日期、指数值和变化率的DataFrame
+        index_name: 指数名称
+        freq: 频率，'monthly'或'weekly'
+        output: 图片保存路径（.png/.svg 等）；为 None 时弹出窗口显示
+        pyramid: 该指数的多分辨率金字塔（见 pyramid.load）；提供时指数曲线按可见区间
+            从金字塔取数，缩放和平移时自动切换级别
+    """
+    setup_style()
+
+    # 确保日期格式正确（storage.load_series 加载的数据已经是 datetime64，无需再解析）
+    if not pandas.api.types.is_datetime64_any_dtype(df["Date"]):
+        df["Date"] = pandas.to_datetime(df["Date"])
     df.index = df["Date"]
 
     # 显示数据点数量信息
@@ -78,11 +157,22 @@ def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"
     # 设置图表整体风格
     fig.patch.set_facecolor("#FAFAFA")  # 设置图表背景色
 
+    # 按图表像素宽度降采样，保留每个像素区间内的峰值和谷值；统计信息仍基于完整数据
+    max_points = int(fig.get_figwidth() * fig.dpi)
+    if pyramid is None:
+        line_df = df.iloc[lod_indices(df.iloc[:, 1].to_numpy(), max_points)]
+        line_df = pandas.DataFrame(
+            {"Date": line_df["Date"], "last": line_df.iloc[:, 1]}
+        )
+    else:
+        _, line_df = pyramid.query(df["Date"].iloc[0], df["Date"].iloc[-1], max_points)
+    bar_df = df.iloc[lod_indices(df["Rate"].to_numpy(), max_points)]
+
     # 绘制指数曲线 - 使用更现代的颜色和样式
     line_color = "#1A5276"  # 更深的蓝色
-    ax1.plot(
-        df["Date"],
-        df.iloc[:, 1],
+    (line,) = ax1.plot(
+        line_df["Date"],
+        line_df["last"],
         label=f"{index_name}指数",
         color=line_color,
         linewidth=2.5,
@@ -94,9 +184,7 @@ def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"
     # 添加指数值的范围区域
     min_val = df.iloc[:, 1].min()
     max_val = df.iloc[:, 1].max()
-    ax1.fill_between(
-        df["Date"], min_val, df.iloc[:, 1], color=line_color, alpha=0.1, zorder=1
-    )
+    fills = _fill_line(ax1, line_df, min_val, line_color)
 
     # 设置坐标轴标签
     ax1.set_xlabel("日期", fontsize=12, fontweight="bold")
@@ -149,22 +237,12 @@ def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"
     ax2 = ax1.twinx()
 
     # 使用更精细的颜色映射来表示变化率
-    def get_color(x):
-        if x > 5:  # 大幅上涨
-            return "#1E8449"  # 深绿色
-        elif x > 0:  # 小幅上涨
-            return "#58D68D"  # 浅绿色
-        elif x > -5:  # 小幅下跌
-            return "#F1948A"  # 浅红色
-        else:  # 大幅下跌
-            return "#C0392B"  # 深红色
-
-    colors = df["Rate"].apply(get_color)
+    colors = rate_colors(bar_df["Rate"].to_numpy())
 
     # 绘制变化率柱状图
     bars = ax2.bar(
-        df["Date"],
-        df["Rate"],
+        bar_df["Date"],
+        bar_df["Rate"],
         label=f"{title_suffix}变化率",
         color=colors,
         alpha=0.75,
@@ -341,5 +419,124 @@ def matplotlib_show(df: pandas.DataFrame, index_name: str, freq: str = "monthly"
 
     plt.subplots_adjust(top=0.88, bottom=0.12)
 
-    # 只调用一次plt.show()
-    plt.show()
+    if pyramid is not None:
+        _follow_zoom(ax1, line, fills, pyramid, min_val, line_color)
+
+    if output is None:
+        # 只调用一次plt.show()
+        plt.show()
+    else:
+        fig.savefig(output, facecolor=fig.get_facecolor())
+        plt.close(fig)
+
+
+def _fill_line(ax, line_df: pandas.DataFrame, baseline: float, color: str) -> list:
+    """指数曲线下方的填充区域；金字塔数据另外绘制每个周期的最低 / 最高收盘价区间"""
+    fills = [
+        ax.fill_between(
+            line_df["Date"], baseline, line_df["last"], color=color, alpha=0.1, zorder=1
+        )
+    ]
+    if "min" in line_df:
+        fills.append(
+            ax.fill_between(
+                line_df["Date"],
+                line_df["min"],
+                line_df["max"],
+                color=color,
+                alpha=0.25,
+                linewidth=0,
+                zorder=4,
+            )
+        )
+    return fills
+
+
+def _follow_zoom(ax, line, fills: list, pyramid, baseline: float, color: str):
+    """缩放或平移时按可见区间和坐标轴像素宽度重新从金字塔取数，只更新曲线与填充区域"""
+
+    updating = False
+
+    def on_xlim_changed(ax):
+        nonlocal updating
+        # 重新绘制填充区域可能再次触发坐标范围变化，避免重入
+        if updating:
+            return
+        updating = True
+        try:
+            _refresh(ax)
+        finally:
+            updating = False
+
+    def _refresh(ax):
+        # 坐标范围已由用户或首次绘制确定；新增的填充区域不应再触发自动缩放，
+        # 共享 x 轴的变化率子图也不应把范围缩放回完整区间
+        ax.set_autoscale_on(False)
+        for other in ax.get_shared_x_axes().get_siblings(ax):
+            other.set_autoscalex_on(False)
+        start, end = (mdates.num2date(x).replace(tzinfo=None) for x in ax.get_xlim())
+        _, line_df = pyramid.query(start, end, max(int(ax.bbox.width), 1))
+        line.set_data(line_df["Date"], line_df["last"])
+        for fill in fills:
+            fill.remove()
+        fills[:] = _fill_line(ax, line_df, baseline, color)
+
+    ax.callbacks.connect("xlim_changed", on_xlim_changed)
+
+
+def _init_render_worker():
+    """渲染进程初始化：使用无界面的 Agg 后端，并只设置一次样式"""
+    matplotlib.use("Agg")
+    setup_style()
+
+
+def _render_job(job: tuple[str, str, str, str]) -> tuple[str, float]:
+    """在渲染进程中执行，返回输出路径和耗时；耗时由主进程记录到 metrics"""
+    start = time.perf_counter()
+    name, index_name, freq, output = job
+    matplotlib_show(storage.load_series(name), index_name, freq=freq, output=output)
+    return output, time.perf_counter() - start
+
+
+def _collect(results) -> list[str]:
+    outputs = []
+    for output, seconds in results:
+        metrics.record("chart.render", seconds)
+        outputs.append(output)
+    return outputs
+
+
+def render_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """
+    创建已完成后端与样式初始化的渲染进程池
+
+    工作进程在任务图的线程中按需启动，此时其他线程可能持有锁或 SQLite 连接，
+    因此用 spawn 启动全新的解释器，而不是 fork 复制当前进程
+    """
+    return ProcessPoolExecutor(
+        max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_render_worker,
+    )
+
+
+def render_charts(
+    jobs: list[tuple[str, str, str, str]],
+    max_workers: int | None = None,
+    executor: ProcessPoolExecutor | None = None,
+) -> list[str]:
+    """
+    在进程池中并行把多个序列渲染为图片文件
+
+    Args:
+        jobs: (序列名称, 指数名称, 频率, 输出路径) 列表
+        max_workers: 进程数，默认为 CPU 核数
+        executor: 共享的渲染进程池（见 render_pool）；为 None 时临时创建
+
+    Returns:
+        生成的图片路径列表
+    """
+    if executor is not None:
+        return _collect(executor.map(_render_job, jobs))
+    with render_pool(max_workers) as executor:
+        return _collect(executor.map(_render_job, jobs))
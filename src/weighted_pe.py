@@ -0,0 +1,74 @@
+class WeightedPEAccumulator:
+    """
+    流式累计指数市盈率，只保存几个累加和，内存占用与股票数量无关
+
+    - 市值加权市盈率：Σ(市值 × PE) / Σ市值，与 calculate_weighted_pe 的结果一致
+    - 盈利收益率加权市盈率：Σ市值 / Σ(市值 / PE)，即总市值 / 总盈利，指数公司通常采用这种口径
+
+    Args:
+        expected: 预期的股票总数，用于计算覆盖率；为 0 时覆盖率为 None
+    """
+
+    def __init__(self, expected: int = 0):
+        self.expected = expected
+        self.count = 0  # 有效股票数
+        self.processed = 0  # 已处理股票数（含无效数据）
+        self.total_cap = 0.0  # Σ市值
+        self.cap_pe = 0.0  # Σ(市值 × PE)
+        self.cap_over_pe = 0.0  # Σ(市值 / PE)，即总盈利
+
+    def add(self, market_cap: float, pe: float):
+        """累计一支有效股票"""
+        self.processed += 1
+        self.count += 1
+        self.total_cap += market_cap
+        self.cap_pe += market_cap * pe
+        self.cap_over_pe += market_cap / pe
+
+    def skip(self):
+        """记录一支已处理但数据无效的股票"""
+        self.processed += 1
+
+    def add_many(self, market_caps, pes):
+        """一次性累计多支有效股票（可以是 pandas.Series 或 NumPy 数组）"""
+        self.processed += len(market_caps)
+        self.count += len(market_caps)
+        self.total_cap += float(market_caps.sum())
+        self.cap_pe += float((market_caps * pes).sum())
+        self.cap_over_pe += float((market_caps / pes).sum())
+
+    @property
+    def pe(self) -> float | None:
+        """市值加权市盈率"""
+        if self.total_cap == 0:
+            return None
+        return self.cap_pe / self.total_cap
+
+    @property
+    def earnings_yield_pe(self) -> float | None:
+        """盈利收益率加权市盈率（总市值 / 总盈利）"""
+        if self.cap_over_pe == 0:
+            return None
+        return self.total_cap / self.cap_over_pe
+
+    @property
+    def coverage(self) -> float | None:
+        """有效股票数占预期总数的比例（0~1）"""
+        if not self.expected:
+            return None
+        return self.count / self.expected
+
+    def summary(self) -> str:
+        """当前部分结果的单行摘要"""
+        if self.pe is None:
+            return "暂无有效数据"
+        text = f"加权市盈率 {self.pe:.2f} | 盈利加权市盈率 {self.earnings_yield_pe:.2f}"
+        if self.coverage is not None:
+            text += f" | 覆盖率 {self.coverage:.1%}"
+        return text
+
+    def reached(self, min_coverage: float | None) -> bool:
+        """是否已达到给定的覆盖率阈值"""
+        if min_coverage is None or self.coverage is None:
+            return False
+        return self.coverage >= min_coverage
@@ -1,20 +1,96 @@
-from typing import Callable
+from typing import Callable, Sequence
 
 import numpy as np
 from matplotlib import pyplot as plt
 
+需求函数 = Callable[[np.ndarray], np.ndarray]
 
-def 需求曲线(q: float) -> float:
+
+def 需求曲线(q):
     # return -0.5 * q + 5
-    return 1 / q
+    q = np.asarray(q, dtype=float)
+    # q = 0 处价格无定义，返回 NaN 而不是触发除零
+    return np.divide(1, q, out=np.full_like(q, np.nan), where=q != 0)
+
+
+def _安全比值(分子: np.ndarray, 分母: np.ndarray) -> np.ndarray:
+    """
+    逐元素计算 分子 / 分母，奇异点不报警告：
+    分母为 0 且分子非 0 时为 inf（完全弹性），分子分母都为 0 或含 NaN 时为 NaN
+    """
+    结果 = np.full(np.broadcast(分子, 分母).shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(分子, 分母, out=结果, where=分母 != 0)
+    结果[(分母 == 0) & (分子 != 0) & ~np.isnan(分子)] = np.inf
+    return 结果
+
 
+def _中点变化率(x1: np.ndarray, x2: np.ndarray) -> np.ndarray:
+    """中点法计算变化率：(x2 - x1) / ((x1 + x2) / 2)"""
+    return _安全比值(x2 - x1, (x1 + x2) / 2)
 
-def 需求弹性计算(q1: float, q2: float, f: Callable[[float], float]) -> float:
+
+def 需求弹性计算(q1, q2, f: 需求函数):
+    """
+    中点法计算弧弹性，q1、q2 可以是标量或任意可广播的数组
+
+    Returns:
+        弹性的绝对值，标量输入时返回标量；奇异点为 inf 或 NaN
+    """
+    q1 = np.asarray(q1, dtype=float)
+    q2 = np.asarray(q2, dtype=float)
     p1 = f(q1)
     p2 = f(q2)
-    quality_change_rate = (q2 - q1) / ((q1 + q2) / 2)
-    price_change_rate = (p2 - p1) / ((p1 + p2) / 2)
-    return abs(quality_change_rate / price_change_rate)
+    # [()] 把零维数组转换为标量，其他形状不变
+    return np.abs(_安全比值(_中点变化率(q1, q2), _中点变化率(p1, p2)))[()]
+
+
+def 批量弧弹性(q1, q2, 曲线列表: Sequence[需求函数]) -> np.ndarray:
+    """
+    对多条需求曲线、大量 (q1, q2) 组合一次性计算弧弹性
+
+    每条曲线只在所有不重复的数量点上求值一次，q1、q2 中重复出现的数量直接复用结果。
+
+    Args:
+        q1, q2: 可广播为同一形状的数量数组
+        曲线列表: 需求函数列表，每个函数都应接受并返回 NumPy 数组
+
+    Returns:
+        形状为 (曲线数, *q1 与 q2 广播后的形状) 的弹性绝对值数组
+    """
+    q1, q2 = np.broadcast_arrays(np.asarray(q1, float), np.asarray(q2, float))
+    形状 = q1.shape
+    唯一数量, 反向索引 = np.unique(
+        np.concatenate([q1.ravel(), q2.ravel()]), return_inverse=True
+    )
+    索引1, 索引2 = np.split(反向索引, 2)
+    数量变化率 = _中点变化率(q1.ravel(), q2.ravel())
+
+    结果 = np.empty((len(曲线列表), q1.size))
+    for i, f in enumerate(曲线列表):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            价格 = np.asarray(f(唯一数量), dtype=float)
+        价格变化率 = _中点变化率(价格[索引1], 价格[索引2])
+        结果[i] = np.abs(_安全比值(数量变化率, 价格变化率))
+    return 结果.reshape((len(曲线列表), *形状))
+
+
+def 批量点弹性(q, 曲线列表: Sequence[需求函数], 步长: float = 1e-6) -> np.ndarray:
+    """
+    对多条需求曲线在一组数量点上计算点弹性 |(dQ/dP) * (P/Q)|，导数用中心差分近似
+
+    Returns:
+        形状为 (曲线数, *q.shape) 的弹性绝对值数组；q = 0 或斜率为 0 的点为 inf 或 NaN
+    """
+    q = np.asarray(q, dtype=float)
+    结果 = np.empty((len(曲线列表), *q.shape))
+    for i, f in enumerate(曲线列表):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            价格 = np.asarray(f(q), dtype=float)
+            斜率 = (np.asarray(f(q + 步长)) - np.asarray(f(q - 步长))) / (2 * 步长)
+        # 点弹性 = (P / Q) / (dP/dQ)
+        结果[i] = np.abs(_安全比值(_安全比值(价格, q), 斜率))
+    return 结果
 
 
 if __name__ == "__main__":
@@ -27,7 +103,7 @@ if __name__ == "__main__":
     fig, ax = plt.subplots(figsize=(5, 5), layout="constrained")
     ax.plot(x, 需求曲线(x), label="需求曲线")  # Plot some data on the Axes.
     ax.plot(
-        x, 需求弹性计算(x - 0.1, x + 0.1, 需求曲线), label="quadratic"
+        x, 需求弹性计算(x - 0.1, x + 0.1, 需求曲线), label="弧弹性"
     )  # Plot more data on the Axes...
     ax.set_xlabel("需求")  # Add an x-label to the Axes.
     ax.set_ylabel("价格")  # Add a y-label to the Axes.
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在临时目录中运行：data/、.cache/ 等相对路径都写到这里，不影响仓库中的数据"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
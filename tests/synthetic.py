@@ -0,0 +1,161 @@
+# 合成市场数据与进程内假数据源（yfinance、维基百科），供 tests/ 下的测试与 benchmarks/ 使用
+import string
+
+import numpy as np
+import pandas
+import requests
+
+from fundamentals import DictProvider
+
+# 合成股票的行业分类
+SECTORS = ["Technology", "Financials", "Health Care", "Energy", "Industrials"]
+
+
+def daily_close(
+    symbols: list[str],
+    start: str = "1928-01-01",
+    end: str = "2025-07-01",
+    seed: int = 0,
+) -> pandas.DataFrame:
+    """
+    生成几何布朗运动的日线收盘价，每个指数代码一列
+
+    第 i 个指数每隔若干个交易日缺一天，用来模拟不同市场的交易日历差异。
+    """
+    rng = np.random.default_rng(seed)
+    dates = pandas.bdate_range(start, end, name="Date")
+    columns = {}
+    for i, symbol in enumerate(symbols):
+        returns = rng.normal(0.0003, 0.011, len(dates))
+        close = pandas.Series(100 * np.exp(np.cumsum(returns)), index=dates)
+        if i:
+            close[np.arange(len(dates)) % (7 + i) == 0] = np.nan
+        columns[symbol] = close
+    return pandas.DataFrame(columns)
+
+
+def daily_bars(symbols: list[str], **kwargs) -> pandas.DataFrame:
+    """生成与 yf.download(symbols, auto_adjust=True) 相同结构的 DataFrame"""
+    close = daily_close(symbols, **kwargs)
+    bars = pandas.concat(
+        {"Close": close, "Open": close, "High": close, "Low": close}, axis=1
+    )
+    bars.columns.names = ["Price", "Ticker"]
+    return bars
+
+
+def ticker_symbols(count: int) -> list[str]:
+    """生成 count 个不重复的股票代码，如 'AAA'、'AAB'"""
+    letters = string.ascii_uppercase
+    symbols = []
+    for i in range(count):
+        symbol = ""
+        for _ in range(4):
+            i, r = divmod(i, len(letters))
+            symbol = letters[r] + symbol
+        symbols.append(symbol)
+    return symbols
+
+
+def ticker_infos(
+    tickers: list[str], invalid_ratio: float = 0.02, seed: int = 0
+) -> dict[str, dict]:
+    """
+    生成股票的 info 字典：市值服从对数正态分布，少量股票的 PE 缺失（模拟亏损公司）
+    """
+    rng = np.random.default_rng(seed)
+    caps = np.exp(rng.normal(24, 1.5, len(tickers)))
+    pes = rng.lognormal(3.1, 0.5, len(tickers))
+    invalid = rng.random(len(tickers)) < invalid_ratio
+    sectors = rng.choice(SECTORS, len(tickers))
+    infos = {}
+    for ticker, cap, pe, bad, sector in zip(tickers, caps, pes, invalid, sectors):
+        infos[ticker] = {
+            "marketCap": int(cap),
+            "trailingPE": None if bad else float(pe),
+            "sector": str(sector),
+        }
+    return infos
+
+
+def constituents_html(
+    tickers: list[str], column: int = 0, table_id: str = "constituents"
+) -> str:
+    """生成维基百科成分股页面：股票代码位于 id 为 table_id 的表格的第 column 列"""
+    header = "".join(f"<th>列{i}</th>" for i in range(max(column + 1, 3)))
+    rows = []
+    for ticker in tickers:
+        cells = ["<td>公司名称</td>"] * max(column + 1, 3)
+        cells[column] = f'<td><a href="/quote/{ticker}">{ticker}</a></td>'
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    filler = "<p>" + "正文内容 " * 2000 + "</p>"
+    return (
+        f"<html><body>{filler}<table class='wikitable'><tr><td>其他表格</td></tr></table>"
+        f"<table id='{table_id}'><tr>{header}</tr>{''.join(rows)}</table>{filler}"
+        "</body></html>"
+    )
+
+
+class FakeYFinance:
+    """
+    yf.download 的假实现：从预先生成的日线数据中按代码和起始日期切片
+
+    Args:
+        bars: daily_bars 生成的数据
+    """
+
+    def __init__(self, bars: pandas.DataFrame):
+        self.bars = bars
+        self.calls = 0
+
+    def download(self, tickers, start=None, auto_adjust=True, **kwargs):
+        self.calls += 1
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        data = self.bars.loc[:, (slice(None), tickers)]
+        if start is not None:
+            data = data[data.index >= start]
+        return data.dropna(how="all")
+
+
+class FakeResponse:
+    def __init__(self, text: str, status_code: int = 200, headers=None):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class FakeWikipedia:
+    """
+    requests.get 的假实现：URL 中包含某个关键字时返回对应的 HTML
+
+    每个页面以内容的哈希作为 ETag，请求带有相同的 If-None-Match 时返回 304。
+
+    Args:
+        pages: {URL 关键字: HTML}
+    """
+
+    def __init__(self, pages: dict[str, str]):
+        self.pages = pages
+        self.calls = 0
+
+    def get(self, url, headers=None, **kwargs):
+        self.calls += 1
+        headers = headers or {}
+        for keyword, html in self.pages.items():
+            if keyword in url:
+                etag = f'"{hash(html):x}"'
+                if headers.get("If-None-Match") == etag:
+                    return FakeResponse("", status_code=304, headers={"ETag": etag})
+                return FakeResponse(html, headers={"ETag": etag})
+        return FakeResponse("", status_code=404)
+
+
+def fake_info_provider(infos: dict[str, dict], latency: float = 0.0):
+    """返回基于 infos 的本地假数据源，可模拟每次请求的网络延迟"""
+    return DictProvider(infos, latency=latency)
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pandas
+import pytest
+
+import backtest
+import market_change
+import storage
+import synthetic
+
+HORIZON = 24
+
+
+@pytest.fixture
+def close():
+    daily = synthetic.daily_close(["^AAA", "^BBB", "^CCC"], "2000-01-01", "2012-12-31")
+    return daily.resample("ME").last().dropna()
+
+
+def naive_dca(prices, horizon, interval, amount, lump):
+    multiples = []
+    for s in range(len(prices) - horizon):
+        units = lump / prices[s]
+        invested = lump
+        for t in range(s, s + horizon, interval):
+            units += amount / prices[t]
+            invested += amount
+        multiples.append(units * prices[s + horizon] / invested)
+    return multiples
+
+
+def naive_rebalance(prices, horizon, weights, threshold):
+    weights = np.asarray(weights) / sum(weights)
+    multiples, counts = [], []
+    for s in range(len(prices) - horizon):
+        holdings = weights.copy()
+        count = 0
+        for t in range(s, s + horizon):
+            holdings = holdings * prices[t + 1] / prices[t]
+            total = holdings.sum()
+            if np.abs(holdings / total - weights).max() > threshold:
+                holdings = total * weights
+                count += 1
+        multiples.append(holdings.sum())
+        counts.append(count)
+    return multiples, np.mean(counts)
+
+
+def test_lump_sum_matches_buy_and_hold(close):
+    series = close["^AAA"]
+    result = backtest.lump_sum(series, "monthly", HORIZON)
+    prices = series.to_numpy()
+    expected = [prices[s + HORIZON] / prices[s] for s in range(len(prices) - HORIZON)]
+    np.testing.assert_allclose(result.multiples[0], expected, rtol=1e-12)
+    assert result.starts[-1] == series.index[-HORIZON - 1]
+
+
+def test_dca_matches_period_by_period_purchases(close):
+    series = close["^AAA"]
+    intervals, amounts, initial = (1, 3, 5, 24), (1.0, 2.5), (0.0, 10.0)
+    result = backtest.dca(series, "monthly", HORIZON, intervals, amounts, initial)
+    assert len(result.params) == len(intervals) * len(amounts) * len(initial)
+    prices = series.to_numpy()
+    for row, params in result.params.iterrows():
+        expected = naive_dca(
+            prices, HORIZON, params["间隔"], params["每期金额"], params["初始金额"]
+        )
+        np.testing.assert_allclose(result.multiples[row], expected, rtol=1e-10)
+
+
+def test_rebalance_matches_path_simulation(close):
+    weights = [(1, 0, 0), (0.5, 0.3, 0.2), (1, 1, 1)]
+    thresholds = (0.0, 0.05, np.inf)
+    result = backtest.rebalance(close, "monthly", HORIZON, weights, thresholds)
+    prices = close.to_numpy()
+    for row, (w, threshold) in enumerate((w, t) for w in weights for t in thresholds):
+        expected, rebalances = naive_rebalance(prices, HORIZON, w, threshold)
+        np.testing.assert_allclose(result.multiples[row], expected, rtol=1e-10)
+        assert result.params["平均再平衡次数"].iloc[row] == pytest.approx(rebalances)
+    # 单一资产与从不再平衡的组合等于买入持有
+    np.testing.assert_allclose(
+        result.multiples[2],
+        backtest.lump_sum(close["^AAA"], "monthly", HORIZON).multiples[0],
+    )
+
+
+def test_weight_grid_sums_to_one():
+    grid = backtest.weight_grid(3, 0.25)
+    assert len(grid) == 15
+    assert all(sum(weights) == pytest.approx(1) for weights in grid)
+
+
+def test_horizon_longer_than_series_raises(close):
+    with pytest.raises(ValueError):
+        backtest.lump_sum(close["^AAA"].iloc[:HORIZON], "monthly", HORIZON)
+
+
+def test_load_close_drops_the_open_period(workdir):
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    month_end = pandas.Timestamp.today().normalize() + pandas.offsets.MonthEnd(0)
+    df = pandas.DataFrame(
+        {
+            "Date": ["2025-01-31", "2025-02-28", month_end.strftime("%Y-%m-%d")],
+            "^GSPC": [100.0, 101.0, 50.0],
+            "Rate": [None, 1.0, -50.5],
+        }
+    )
+    df.to_csv(
+        storage.csv_path(market_change.series_name("sp500", "monthly")), index=False
+    )
+    assert backtest.load_close("sp500", "monthly").tolist() == [100.0, 101.0]
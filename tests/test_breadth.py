@@ -0,0 +1,60 @@
+import numpy as np
+import pandas
+import pytest
+
+import breadth
+import constituent_prices
+import storage
+import synthetic
+
+TICKERS = synthetic.ticker_symbols(6)
+
+
+@pytest.fixture
+def matrix(workdir):
+    close = synthetic.daily_close(TICKERS, start="2022-01-03", end="2024-12-31")
+    return constituent_prices._write_full("demo", close.astype(np.float32))
+
+
+def read_result() -> pandas.DataFrame:
+    return pandas.read_csv(
+        storage.csv_path(breadth.series_name("demo")), parse_dates=["Date"]
+    )
+
+
+def assert_same(result: pandas.DataFrame, expected: pandas.DataFrame):
+    assert result["Date"].tolist() == expected["Date"].tolist()
+    for column in expected.columns[1:]:
+        np.testing.assert_allclose(
+            result[column], expected[column], atol=0.011, err_msg=column
+        )
+
+
+def test_compute_counts_and_ratios():
+    close = pandas.DataFrame(
+        {"A": [1.0, 2.0, 1.5, 1.5], "B": [1.0, 0.5, np.nan, 2.0]},
+        index=pandas.date_range("2025-01-01", periods=4, name="Date"),
+    )
+    result = breadth.compute(close)
+    assert result["上涨家数"].tolist() == [0, 1, 0, 0]
+    assert result["下跌家数"].tolist() == [0, 1, 1, 0]
+    assert result["涨跌线"].tolist() == [0, 0, -1, -1]
+
+
+def test_incremental_refresh_matches_full_computation(matrix):
+    full = breadth.compute(matrix.frame())
+    breadth.refresh("demo", matrix, 0, TICKERS)
+    assert_same(read_result(), full)
+
+    # 从中间某一行重新计算，前面的结果与涨跌线的累计值保持不变
+    first_changed = len(matrix.dates) - 30
+    result = breadth.refresh("demo", matrix, first_changed, TICKERS)
+    assert_same(result, full)
+    assert_same(read_result(), full)
+
+
+def test_refresh_counts_only_current_constituents(matrix):
+    result = breadth.refresh("demo", matrix, 0, TICKERS[:4])
+    expected = breadth.compute(matrix.frame()[TICKERS[:4]])
+    assert_same(result, expected)
+    assert result["上涨家数"].add(result["下跌家数"]).max() <= 4
@@ -0,0 +1,124 @@
+from unittest import mock
+
+import numpy as np
+import pandas
+import pytest
+import synthetic
+import yfinance
+
+import constituent_prices
+import providers
+
+TICKERS = synthetic.ticker_symbols(5)
+
+
+class FakeYahoo:
+    """yf.download 的假实现：可以截止到某一天、屏蔽部分代码或修改部分价格"""
+
+    def __init__(self):
+        self.bars = synthetic.daily_bars(TICKERS, start="2023-01-02", end="2024-12-31")
+        self.end = None
+        self.blocked = set()
+
+    def close(self, tickers=TICKERS) -> pandas.DataFrame:
+        close = self.bars["Close"].loc[: self.end, tickers]
+        return close.dropna(how="all").astype(np.float32)
+
+    def download(self, tickers, start=None, auto_adjust=True, **kwargs):
+        kept = [t for t in tickers if t not in self.blocked]
+        if not kept:
+            return pandas.DataFrame()
+        data = self.bars.loc[: self.end, (slice(None), kept)]
+        if start is not None:
+            data = data[data.index >= start]
+        return data.dropna(how="all")
+
+
+@pytest.fixture
+def yahoo(workdir, monkeypatch):
+    fake = FakeYahoo()
+    monkeypatch.setattr(providers, "DOWNLOAD_BACKOFF", 0)
+    providers._breakers.clear()
+    with mock.patch.object(yfinance, "download", fake.download):
+        yield fake
+    providers._breakers.clear()
+
+
+def assert_matrix(matrix, expected: pandas.DataFrame):
+    frame = matrix.frame()[list(expected.columns)]
+    np.testing.assert_array_equal(
+        frame.index.to_numpy(dtype="datetime64[D]"),
+        expected.index.to_numpy(dtype="datetime64[D]"),
+    )
+    np.testing.assert_array_equal(frame.to_numpy(), expected.to_numpy())
+
+
+def meta_file(index: str) -> str:
+    return constituent_prices._read_meta(index)["file"]
+
+
+def test_incremental_update_appends_rows(yahoo):
+    yahoo.end = "2024-06-28"
+    matrix, first_changed = constituent_prices.update("demo", TICKERS)
+    assert first_changed == 0
+    file = meta_file("demo")
+    rows = len(matrix.dates)
+
+    yahoo.end = None
+    matrix, first_changed = constituent_prices.update("demo", TICKERS)
+    # 新的交易日追加到同一个文件，重新下载的重叠行从 first_changed 开始
+    assert meta_file("demo") == file
+    assert rows - 7 <= first_changed < rows
+    assert_matrix(matrix, yahoo.close())
+
+
+def test_overlapping_rows_are_patched_in_place(yahoo):
+    matrix, _ = constituent_prices.update("demo", TICKERS)
+    file = meta_file("demo")
+    last = yahoo.bars.index[-3:]
+    original = yahoo.close().loc[last].copy()
+    yahoo.bars.loc[last, ("Close", "AAAA")] *= 1.1
+    yahoo.bars.loc[last[-1], ("Close", "AAAB")] = np.nan  # 这次没有取到
+
+    matrix, first_changed = constituent_prices.update("demo", TICKERS)
+    assert meta_file("demo") == file
+    assert first_changed <= len(matrix.dates) - 3
+    frame = matrix.frame()
+    np.testing.assert_allclose(
+        frame.loc[last, "AAAA"], original["AAAA"] * 1.1, rtol=1e-6
+    )
+    # 没有取到的值保留原值
+    assert frame.loc[last[-1], "AAAB"] == original.loc[last[-1], "AAAB"]
+
+
+def test_ticker_without_history_is_backfilled(yahoo):
+    yahoo.end = "2024-06-28"
+    yahoo.blocked = {"AAAC"}
+    matrix, _ = constituent_prices.update("demo", TICKERS)
+    assert matrix.frame()["AAAC"].isna().all()
+
+    yahoo.end = None
+    yahoo.blocked = set()
+    matrix, first_changed = constituent_prices.update("demo", TICKERS)
+    assert first_changed == 0
+    assert_matrix(matrix, yahoo.close())
+
+
+def test_backfill_that_still_fails_keeps_the_matrix(yahoo):
+    yahoo.blocked = {"AAAC"}
+    yahoo.end = "2024-06-28"
+    constituent_prices.update("demo", TICKERS)
+    file = meta_file("demo")
+    yahoo.end = None
+    matrix, _ = constituent_prices.update("demo", TICKERS)
+    # 仍然取不到时不重写文件，其他股票照常增量更新
+    assert meta_file("demo") == file
+    assert_matrix(matrix, yahoo.close([t for t in TICKERS if t != "AAAC"]))
+
+
+def test_new_constituent_gets_full_history(yahoo):
+    constituent_prices.update("demo", TICKERS[:3])
+    matrix, first_changed = constituent_prices.update("demo", TICKERS)
+    assert first_changed == 0
+    assert sorted(matrix.tickers) == sorted(TICKERS)
+    assert_matrix(matrix, yahoo.close())
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+import constituents
+import synthetic
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+SP500 = constituents.SOURCES["sp500"]
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_sp500_page_skips_note_rows():
+    tickers = constituents.parse_tickers(
+        fixture("sp500_constituents.html"), SP500.column
+    )
+    # 合并单元格的说明行位于表格中间，之后的成分股不能被截断
+    assert tickers == ["MMM", "AOS", "BRK-B", "AAPL"]
+
+
+def test_parse_nasdaq100_page_reads_ticker_column():
+    source = constituents.SOURCES["nasdaq100"]
+    tickers = constituents.parse_tickers(
+        fixture("nasdaq100_constituents.html"), source.column
+    )
+    assert tickers == ["ADBE", "GOOGL", "GOOG", "AMZN"]
+
+
+def test_parse_without_constituents_table_raises():
+    with pytest.raises(ValueError):
+        constituents.parse_tickers("<html><table><tr><td>x</td></tr></table>", 0)
+
+
+def test_save_snapshot_records_changes_with_lf_line_endings(workdir):
+    constituents.save_snapshot(SP500, ["AAA", "BBB"], date="2025-01-02")
+    assert constituents.save_snapshot(SP500, ["AAA", "BBB"], "2025-01-03") == ([], [])
+    added, removed = constituents.save_snapshot(SP500, ["AAA", "CCC"], "2025-01-06")
+    assert (added, removed) == (["CCC"], ["BBB"])
+
+    assert constituents.snapshot_dates(SP500) == ["2025-01-02", "2025-01-06"]
+    assert constituents.load_snapshot(SP500, "2025-01-05") == ["AAA", "BBB"]
+    directory = os.path.join(constituents.SNAPSHOT_DIR, SP500.key)
+    with open(os.path.join(directory, "changes.csv"), "rb") as f:
+        changes = f.read()
+    assert b"\r" not in changes
+    assert changes.decode().splitlines() == [
+        "Date,Change,Ticker",
+        "2025-01-06,added,CCC",
+        "2025-01-06,removed,BBB",
+    ]
+    with open(os.path.join(directory, "2025-01-06.csv"), "rb") as f:
+        assert f.read() == b"Ticker\nAAA\nCCC\n"
+
+
+def test_get_tickers_uses_snapshot_when_page_unchanged(workdir):
+    fake = synthetic.FakeWikipedia({"S%26P_500": fixture("sp500_constituents.html")})
+    assert constituents.get_tickers(SP500, fake.get) == ["MMM", "AOS", "BRK-B", "AAPL"]
+    # 第二次请求带上 ETag，页面未变化时返回 304，直接使用快照
+    assert constituents.get_tickers(SP500, fake.get) == ["MMM", "AOS", "BRK-B", "AAPL"]
+    assert fake.calls == 2
+    assert len(constituents.snapshot_dates(SP500)) == 1
+
+
+def test_get_tickers_rejects_a_much_shorter_list(workdir):
+    tickers = synthetic.ticker_symbols(100)
+    fake = synthetic.FakeWikipedia({"S%26P_500": synthetic.constituents_html(tickers)})
+    constituents.get_tickers(SP500, fake.get)
+
+    fake.pages["S%26P_500"] = synthetic.constituents_html(tickers[:50])
+    with pytest.raises(ValueError):
+        constituents.get_tickers(SP500, fake.get)
+    assert constituents.load_snapshot(SP500) == tickers
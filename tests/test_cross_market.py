@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas
+
+import cross_market
+import market_change
+import storage
+import synthetic
+
+INDEXES = [
+    market_change.IndexSpec("^AAA", "aaa", "指数A"),
+    market_change.IndexSpec("^BBB", "bbb", "指数B"),
+]
+
+
+def write_weekly(seed: int = 0):
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    close = synthetic.daily_close(
+        [index.symbol for index in INDEXES],
+        start="2015-01-01",
+        end="2020-12-31",
+        seed=seed,
+    )
+    for index in INDEXES:
+        weekly = close[index.symbol].resample("W").last()
+        df = pandas.DataFrame({"Date": weekly.index, index.symbol: weekly.to_numpy()})
+        df["Rate"] = (df[index.symbol].pct_change() * 100).round(2)
+        name = market_change.series_name(index.prefix, "weekly")
+        df.to_csv(storage.csv_path(name), index=False)
+
+
+def test_load_cube_rebuilds_when_csv_content_changes(workdir):
+    write_weekly()
+    cube = cross_market.load_cube("weekly", INDEXES)
+    assert cube.symbols == ["^AAA", "^BBB"]
+    # 未变化时直接读取已保存的立方体
+    assert np.array_equal(
+        cross_market.load_cube("weekly", INDEXES).values, cube.values, equal_nan=True
+    )
+
+    # 模拟 git checkout：CSV 内容变化，修改时间却早于立方体
+    write_weekly(seed=1)
+    for index in INDEXES:
+        name = market_change.series_name(index.prefix, "weekly")
+        os.utime(storage.csv_path(name), (0, 0))
+    rebuilt = cross_market.load_cube("weekly", INDEXES)
+    expected = cross_market.compute_cube(
+        cross_market.aligned_close("weekly", INDEXES),
+        "weekly",
+        cross_market.ROLLING_WINDOWS["weekly"],
+    )
+    np.testing.assert_array_equal(rebuilt.values, expected.values)
+    assert os.listdir(cross_market.CROSS_MARKET_DIR) == ["weekly.npz"]
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import cache
+import fundamentals
+import fundamentals_store
+import pe_history
+import sp500.calculate_pe
+import synthetic
+from fundamentals import DictProvider, TokenBucket
+
+
+class FlakyProvider(DictProvider):
+    """前 failures 次请求抛出异常，之后正常返回"""
+
+    def __init__(self, infos, failures: int):
+        super().__init__(infos)
+        self.failures = failures
+        self.calls = 0
+
+    def get_info(self, ticker):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("模拟网络错误")
+        return super().get_info(ticker)
+
+
+class CountingProvider(DictProvider):
+    def __init__(self, infos, latency=0.0):
+        super().__init__(infos, latency)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_info(self, ticker):
+        with self.lock:
+            self.calls += 1
+        return super().get_info(ticker)
+
+
+INFO = {"AAA": {"marketCap": 100, "trailingPE": 20.0, "sector": "Technology"}}
+
+
+def test_fetch_info_retries_until_success():
+    provider = FlakyProvider(INFO, failures=2)
+    bucket = TokenBucket(1e6, 1e6)
+    assert fundamentals.fetch_info(provider, "AAA", bucket, backoff=0) == INFO["AAA"]
+    assert provider.calls == 3
+
+
+def test_fetch_info_gives_up_after_retries():
+    provider = FlakyProvider(INFO, failures=10)
+    bucket = TokenBucket(1e6, 1e6)
+    assert (
+        fundamentals.fetch_info(provider, "AAA", bucket, retries=2, backoff=0) is None
+    )
+    assert provider.calls == 3
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+    # 前 5 个令牌来自初始容量，其余 20 个按每秒 100 个补充
+    assert time.monotonic() - start >= 0.19
+
+
+def test_get_stock_data_keeps_all_rows_in_ticker_order():
+    tickers = synthetic.ticker_symbols(200)
+    infos = synthetic.ticker_infos(tickers, invalid_ratio=0.1)
+    df = fundamentals.get_stock_data(
+        tickers, DictProvider(infos), bucket=TokenBucket(1e6, 1e6), backoff=0
+    )
+    # 市盈率缺失的股票也保留，只有 valid_pe 的结果参与加权
+    assert df["Ticker"].tolist() == tickers
+    assert df["Sector"].tolist() == [infos[t]["sector"] for t in tickers]
+    valid = [t for t in tickers if infos[t]["trailingPE"] is not None]
+    assert fundamentals.valid_pe(df)["Ticker"].tolist() == valid
+    assert not fundamentals.is_partial(df)
+
+
+def test_get_stock_data_cancels_pending_requests_on_early_stop():
+    tickers = synthetic.ticker_symbols(400)
+    provider = CountingProvider(synthetic.ticker_infos(tickers), latency=0.005)
+    df = fundamentals.get_stock_data(
+        tickers, provider, min_coverage=0.1, max_workers=4, bucket=TokenBucket(1e6, 1e6)
+    )
+    time.sleep(0.05)  # 等待已经开始的请求结束
+    assert len(df) >= 0.1 * len(tickers) * 0.9
+    assert provider.calls < len(tickers) / 2
+    assert fundamentals.is_partial(df)
+
+
+def test_get_stock_data_skips_failed_tickers():
+    df = fundamentals.get_stock_data(
+        ["AAA", "MISSING"], DictProvider(INFO), bucket=TokenBucket(1e6, 1e6), retries=0
+    )
+    assert df["Ticker"].tolist() == ["AAA"]
+
+
+def test_cached_tickers_do_not_wait_for_tokens(workdir):
+    tickers = synthetic.ticker_symbols(50)
+    source = CountingProvider(synthetic.ticker_infos(tickers))
+    disk_cache = cache.DiskCache(".cache/test.sqlite3")
+    provider = fundamentals.CachedInfoProvider(source, disk_cache)
+    fundamentals.get_stock_data(tickers, provider, bucket=TokenBucket(1e6, 1e6))
+    assert source.calls == len(tickers)
+
+    # 全部命中缓存：即使每秒只补充 1 个令牌，也不应等待
+    start = time.monotonic()
+    df = fundamentals.get_stock_data(tickers, provider, bucket=TokenBucket(1, 1))
+    assert time.monotonic() - start < 1
+    assert source.calls == len(tickers)
+    assert len(df) == len(tickers)
+
+
+def test_partial_run_is_not_persisted(workdir, monkeypatch):
+    tickers = synthetic.ticker_symbols(400)
+    provider = DictProvider(synthetic.ticker_infos(tickers))
+
+    def get_stock_data(tickers, refresh=False, min_coverage=None):
+        return fundamentals.get_stock_data(
+            tickers, provider, min_coverage=min_coverage, bucket=TokenBucket(1e6, 1e6)
+        )
+
+    monkeypatch.setattr(
+        sp500.calculate_pe, "get_sp500_tickers", lambda refresh: tickers
+    )
+    monkeypatch.setattr(sp500.calculate_pe, "get_stock_data", get_stock_data)
+    sp500.calculate_pe.main(min_coverage=0.1)
+    assert fundamentals_store.available_dates("sp500") == []
+    assert pe_history.load_rows("sp500_weighted_pe_history") == []
+
+    sp500.calculate_pe.main()
+    assert len(fundamentals_store.available_dates("sp500")) == 1
+    assert len(pe_history.load_rows("sp500_weighted_pe_history")) == 1
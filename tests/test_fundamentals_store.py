@@ -0,0 +1,46 @@
+import numpy as np
+import pandas
+
+import fundamentals_store
+import storage
+
+SNAPSHOT = pandas.DataFrame(
+    {
+        "Ticker": ["AAA", "BBB", "CCC", "DDD"],
+        "MarketCap": [300.0, 200.0, 100.0, 0.0],
+        "PE": [30.0, np.nan, 10.0, 15.0],  # BBB 亏损，没有市盈率；DDD 市值无效
+        "Sector": ["Technology", "Energy", None, "Energy"],
+    }
+)
+
+
+def test_snapshot_keeps_constituents_without_pe(workdir):
+    fundamentals_store.save_snapshot("sp500", SNAPSHOT, "2025-01-02")
+    df = fundamentals_store.load_snapshot("sp500")
+    assert df["Ticker"].tolist() == ["AAA", "BBB", "CCC"]
+    assert np.isnan(df["PE"].iloc[1])
+
+
+def test_recompute_uses_only_positive_pe(workdir):
+    fundamentals_store.save_snapshot("sp500", SNAPSHOT, "2025-01-02")
+    result = fundamentals_store.recompute("sp500")
+    assert result["Count"].tolist() == [2]
+    assert result["PE"].iloc[0] == (300 * 30 + 100 * 10) / 400
+
+
+def test_partitions_of_both_formats_stay_readable(workdir, monkeypatch):
+    fundamentals_store.save_snapshot("sp500", SNAPSHOT, "2025-01-02")
+    monkeypatch.setattr(storage, "HAS_PARQUET", False)
+    fundamentals_store.save_snapshot("sp500", SNAPSHOT.iloc[:2], "2025-01-03")
+
+    # 没有 pyarrow 时写入 CSV，之前的 Parquet 分区仍然列出并可读取
+    assert fundamentals_store.available_dates("sp500") == ["2025-01-02", "2025-01-03"]
+    assert len(fundamentals_store.load_snapshot("sp500", "2025-01-02")) == 3
+    assert len(fundamentals_store.load_snapshot("sp500")) == 2
+
+    # 同一天重新保存为另一种格式时替换旧分区
+    monkeypatch.setattr(storage, "HAS_PARQUET", True)
+    path = fundamentals_store.save_snapshot("sp500", SNAPSHOT, "2025-01-03")
+    assert path.endswith(".parquet")
+    assert fundamentals_store.available_dates("sp500") == ["2025-01-02", "2025-01-03"]
+    assert len(fundamentals_store.load_history("sp500")) == 6
@@ -0,0 +1,22 @@
+import main
+import market_change
+import simulation
+
+
+def test_simulate_accepts_any_defined_index(monkeypatch):
+    calls = []
+    monkeypatch.setattr(simulation, "main", lambda *args: calls.append(args))
+    for index in market_change.INDEXES:
+        assert main.main(["simulate", "--index", index.prefix, "--paths", "10"]) == 0
+    assert [args[0] for args in calls] == [i.prefix for i in market_change.INDEXES]
+
+
+def test_simulate_rejects_unknown_index(monkeypatch, capsys):
+    monkeypatch.setattr(simulation, "main", lambda *args: None)
+    assert main.main(["simulate", "--index", "nope"]) == 1
+    assert "未定义的指数: nope" in capsys.readouterr().out
+
+
+def test_what_if_without_snapshot_reports_and_fails(workdir, capsys):
+    assert main.main(["what-if", "--markets", "sp500"]) == 1
+    assert "没有 sp500 的逐股快照" in capsys.readouterr().out
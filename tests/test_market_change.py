@@ -0,0 +1,73 @@
+from unittest import mock
+
+import numpy as np
+import pandas
+import pytest
+import yfinance
+
+import market_change
+import storage
+import synthetic
+
+SYMBOLS = [index.symbol for index in market_change.INDEXES]
+
+
+@pytest.fixture
+def bars():
+    return synthetic.daily_bars(SYMBOLS, start="2015-01-01", end="2025-07-01")
+
+
+def download(fake, incremental):
+    with mock.patch.object(yfinance, "download", fake.download):
+        market_change.download_to_csv(incremental=incremental)
+
+
+def read_all() -> dict[str, str]:
+    result = {}
+    for index in market_change.INDEXES:
+        for freq in market_change.FREQ_RULES:
+            with open(
+                market_change.csv_path(index.prefix, freq), encoding="utf-8"
+            ) as f:
+                result[(index.prefix, freq)] = f.read()
+    return result
+
+
+def test_full_download_matches_resampled_close(workdir, bars):
+    download(synthetic.FakeYFinance(bars), incremental=False)
+
+    for index in market_change.INDEXES:
+        close = bars["Close"][index.symbol].dropna()
+        for freq, rule in market_change.FREQ_RULES.items():
+            df = pandas.read_csv(
+                market_change.csv_path(index.prefix, freq), parse_dates=["Date"]
+            )
+            expected = close.resample(rule).last().round(2)
+            np.testing.assert_allclose(df[index.symbol], expected.to_numpy())
+            rate = (expected.pct_change() * 100).round(2)
+            np.testing.assert_allclose(df["Rate"], rate.to_numpy(), atol=1e-9)
+
+
+@pytest.mark.parametrize("missing", [1, 3, 40])
+def test_incremental_update_equals_full_download(workdir, bars, missing):
+    # 先用缺少最后若干个交易日的数据全量写入，再增量补齐，结果应与一次全量下载完全相同
+    download(synthetic.FakeYFinance(bars), incremental=False)
+    expected = read_all()
+
+    fake = synthetic.FakeYFinance(bars.iloc[:-missing])
+    download(fake, incremental=False)
+    fake.bars = bars
+    download(fake, incremental=True)
+
+    assert read_all() == expected
+
+
+def test_incremental_update_keeps_parquet_in_sync(workdir, bars):
+    fake = synthetic.FakeYFinance(bars.iloc[:-10])
+    download(fake, incremental=False)
+    fake.bars = bars
+    download(fake, incremental=True)
+
+    name = market_change.series_name("sp500", "weekly")
+    from_csv = storage.to_compact(pandas.read_csv(storage.csv_path(name)))
+    pandas.testing.assert_frame_equal(storage.load_series(name), from_csv)
@@ -0,0 +1,77 @@
+import json
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_span_records_duration_and_counts_errors():
+    with metrics.span("work"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("work"):
+            raise ValueError("失败")
+    result = metrics.snapshot()
+    assert result["spans"]["work"]["count"] == 2
+    assert result["counters"] == {"work.errors": 1}
+
+
+def test_snapshot_percentiles_use_nearest_rank():
+    for i in range(1, 101):
+        metrics.record("step", i / 100)
+    stats = metrics.snapshot()["spans"]["step"]
+    assert stats == {
+        "count": 100,
+        "total": 50.5,
+        "mean": 0.505,
+        "p50": 0.51,
+        "p95": 0.95,
+        "max": 1.0,
+    }
+
+
+def test_incr_is_thread_safe():
+    def worker():
+        for _ in range(1000):
+            metrics.incr("hits")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.snapshot()["counters"]["hits"] == 8000
+
+
+def test_export_appends_one_json_line_per_run(tmp_path):
+    path = tmp_path / "metrics" / "daily.jsonl"
+    metrics.incr("http.bytes", 10)
+    with metrics.span("task.demo"):
+        pass
+    metrics.export(str(path))
+    metrics.reset()
+    metrics.incr("http.bytes", 20)
+    metrics.export(str(path))
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    first, second = map(json.loads, lines)
+    assert set(first) == {"started", "wall", "spans", "counters"}
+    assert set(first["spans"]["task.demo"]) == {
+        "count",
+        "total",
+        "mean",
+        "p50",
+        "p95",
+        "max",
+    }
+    assert first["counters"] == {"http.bytes": 10}
+    assert second == {**second, "spans": {}, "counters": {"http.bytes": 20}}
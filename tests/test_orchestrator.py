@@ -0,0 +1,76 @@
+import os
+from unittest import mock
+
+import pandas
+import yfinance
+
+import market_change
+import orchestrator
+import providers
+import synthetic
+from orchestrator import Task
+
+
+def test_run_graph_skips_dependents_of_failed_tasks():
+    def fail():
+        raise ValueError("失败")
+
+    tasks = [
+        Task("a", lambda: 1),
+        Task("b", fail),
+        Task("c", lambda a: a + 1, ("a",)),
+        Task("d", lambda b: b, ("b",)),
+        Task("e", lambda d: d, ("d",)),
+        Task("f", lambda: 0, ("missing",)),
+    ]
+    results = orchestrator.run_graph(tasks)
+    assert {name: r.status for name, r in results.items()} == {
+        "a": "ok",
+        "b": "failed",
+        "c": "ok",
+        "d": "skipped",
+        "e": "skipped",
+        "f": "skipped",
+    }
+    assert results["c"].value == 2
+
+
+def test_daily_run_downloads_all_indexes_in_one_call(workdir):
+    symbols = [index.symbol for index in market_change.INDEXES]
+    fake = synthetic.FakeYFinance(
+        synthetic.daily_bars(symbols, start="2018-01-01", end="2025-07-01")
+    )
+    with mock.patch.object(yfinance, "download", fake.download):
+        assert orchestrator.main(include_pe=False)
+    assert fake.calls == 1
+    charts = os.listdir(market_change.CHART_DIR)
+    assert len(charts) == len(symbols) * len(market_change.FREQ_RULES)
+
+
+def test_run_graph_orders_after_without_passing_values():
+    order = []
+
+    def step(name, fail=False):
+        def run(*args):
+            order.append(name)
+            if fail:
+                raise ValueError("失败")
+            return args
+
+        return run
+
+    tasks = [
+        Task("first", step("first", fail=True)),
+        Task("second", step("second"), after=("first", "missing")),
+    ]
+    results = orchestrator.run_graph(tasks, max_workers=2)
+    # first 失败也不跳过 second，second 不接收 first 的返回值
+    assert order == ["first", "second"]
+    assert results["second"].status == "ok"
+    assert results["second"].value == ()
+
+
+def test_daily_run_fails_when_download_returns_nothing(workdir, monkeypatch):
+    monkeypatch.setattr(providers, "DOWNLOAD_BACKOFF", 0)
+    with mock.patch.object(yfinance, "download", lambda *a, **k: pandas.DataFrame()):
+        assert not orchestrator.main(include_pe=False)
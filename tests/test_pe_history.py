@@ -0,0 +1,59 @@
+import os
+
+import pe_history
+import storage
+
+NAME = "demo_weighted_pe_history"
+
+
+def test_upsert_is_idempotent_per_day(workdir):
+    pe_history.upsert(NAME, "2025-01-03", 20.0)
+    pe_history.upsert(NAME, "2025-01-02", 19.0)
+    pe_history.upsert(NAME, "2025-01-03", 21.456)
+    # 未压缩时 load 也能看到全部写入，同一天以最后一次为准
+    assert pe_history.load_rows(NAME) == [
+        ("2025-01-02", "19.00"),
+        ("2025-01-03", "21.46"),
+    ]
+    assert not os.path.exists(pe_history.history_path(NAME))
+
+
+def test_compact_merges_logs_into_sorted_lf_file(workdir):
+    os.makedirs(storage.CSV_DIR)
+    pe_history._write_atomic(pe_history.history_path(NAME), [("2025-01-02", "19.00")])
+    pe_history.upsert(NAME, "2025-01-06", 22.0)
+    pe_history.upsert(NAME, "2025-01-02", 18.5)
+    assert pe_history.compact(NAME)
+
+    with open(pe_history.history_path(NAME), "rb") as f:
+        content = f.read()
+    assert content == "﻿日期,当年市盈率\n2025-01-02,18.50\n2025-01-06,22.00\n".encode()
+    assert os.listdir(pe_history.log_dir(NAME)) == []
+
+    # 再次压缩不改变文件
+    assert pe_history.compact(NAME)
+    with open(pe_history.history_path(NAME), "rb") as f:
+        assert f.read() == content
+
+
+def test_compact_skips_while_another_process_holds_the_lock(workdir):
+    pe_history.upsert(NAME, "2025-01-02", 19.0)
+    lock = os.path.join(pe_history.log_dir(NAME), ".lock")
+    open(lock, "w").close()
+    assert not pe_history.compact(NAME)
+    assert pe_history.load_rows(NAME) == [("2025-01-02", "19.00")]
+
+    # 锁超时后视为持有者已退出
+    os.utime(lock, (0, 0))
+    assert pe_history.compact(NAME)
+    assert not os.path.exists(lock)
+    assert pe_history._read_rows(pe_history.history_path(NAME)) == [
+        ("2025-01-02", "19.00")
+    ]
+
+
+def test_save_today_compacts(workdir):
+    path = pe_history.save_today("demo", 20.0)
+    assert path == pe_history.history_path(NAME)
+    assert len(pe_history._read_rows(path)) == 1
+    assert os.listdir(pe_history.log_dir(NAME)) == []
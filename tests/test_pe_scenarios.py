@@ -0,0 +1,146 @@
+import numpy as np
+import pandas
+import pytest
+
+import synthetic
+from pe_scenarios import Scenario, ScenarioEngine
+
+SECTORS = ["Technology", "Energy", "Utilities", None]
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    rng = np.random.default_rng(7)
+    n = 300
+    pe = rng.lognormal(3, 0.8, n)
+    pe[rng.random(n) < 0.1] = np.nan  # 缺失
+    pe[rng.random(n) < 0.05] *= -1  # 亏损
+    cap = rng.lognormal(10, 1.5, n).round(-1)  # 取整后会有相同市值
+    cap[:3] = 0.0  # 无效市值
+    return pandas.DataFrame(
+        {
+            "Ticker": synthetic.ticker_symbols(n),
+            "MarketCap": cap,
+            "PE": pe,
+            "Sector": rng.choice(np.array(SECTORS, dtype=object), n),
+        }
+    )
+
+
+def random_scenarios(tickers, count=400, seed=0):
+    rng = np.random.default_rng(seed)
+    sectors = ["Technology", "Energy", "Utilities", "未知", "Missing"]
+    scenarios = []
+    for i in range(count):
+        chosen = tuple(rng.choice(sectors, rng.integers(0, 3), replace=False))
+        scenarios.append(
+            Scenario(
+                name=str(i),
+                exclude_top=int(rng.integers(0, 40)),
+                top=None if rng.random() < 0.5 else int(rng.integers(0, 320)),
+                exclude_groups=chosen if rng.random() < 0.5 else (),
+                only_groups=chosen if rng.random() < 0.3 else (),
+                max_pe=None if rng.random() < 0.3 else float(rng.uniform(5, 80)),
+                pe_mode=str(rng.choice(["clip", "exclude"])),
+                exclude_tickers=tuple(rng.choice(tickers, rng.integers(0, 4))),
+            )
+        )
+    return scenarios
+
+
+def brute_force(df: pandas.DataFrame, scenario: Scenario) -> dict:
+    """按定义直接筛选：排名与市值占比以全部市值为正的成分股为准"""
+    df = df[df["MarketCap"] > 0].sort_values(
+        "MarketCap", ascending=False, kind="stable"
+    )
+    total = df["MarketCap"].sum()
+    df = df.assign(Sector=df["Sector"].fillna("未知"), Rank=np.arange(len(df)))
+    df = df[df["Rank"] >= scenario.exclude_top]
+    if scenario.top is not None:
+        df = df[df["Rank"] < scenario.top]
+    df = df[~df["Sector"].isin(scenario.exclude_groups)]
+    if scenario.only_groups:
+        df = df[df["Sector"].isin(scenario.only_groups)]
+    df = df[~df["Ticker"].isin(scenario.exclude_tickers)]
+    valid = df["PE"] > 0
+    if scenario.max_pe is not None:
+        over = valid & (df["PE"] > scenario.max_pe)
+        if scenario.pe_mode == "exclude":
+            df, valid = df[~over], valid[~over]
+        else:
+            df = df.assign(PE=df["PE"].where(~over, scenario.max_pe))
+    priced = df[valid]
+    cap = priced["MarketCap"].sum()
+    earnings = (priced["MarketCap"] / priced["PE"]).sum()
+    return {
+        "PE": (priced["MarketCap"] * priced["PE"]).sum() / cap if cap > 0 else np.nan,
+        "EarningsPE": cap / earnings if earnings > 0 else np.nan,
+        "Count": len(priced),
+        "CapShare": df["MarketCap"].sum() / total,
+    }
+
+
+def test_batch_matches_brute_force(snapshot):
+    engine = ScenarioEngine(snapshot)
+    scenarios = random_scenarios(snapshot["Ticker"].tolist())
+    result = engine.evaluate_many(scenarios)
+    expected = pandas.DataFrame([brute_force(snapshot, s) for s in scenarios])
+    assert result["Scenario"].tolist() == [s.name for s in scenarios]
+    assert result["Count"].tolist() == expected["Count"].tolist()
+    for column in ("PE", "EarningsPE", "CapShare"):
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-9)
+
+
+def test_single_evaluation_matches_batch(snapshot):
+    engine = ScenarioEngine(snapshot)
+    scenarios = random_scenarios(snapshot["Ticker"].tolist(), count=30, seed=1)
+    batch = engine.evaluate_many(scenarios)
+    for row, scenario in enumerate(scenarios):
+        single = engine.evaluate(scenario)
+        assert single["Count"] == batch["Count"].iloc[row]
+        for column in ("PE", "EarningsPE", "CapShare"):
+            value = batch[column].iloc[row]
+            if np.isnan(value):
+                assert single[column] is None
+            else:
+                assert single[column] == pytest.approx(value, rel=1e-12)
+
+
+def test_whole_index_uses_positive_pe_and_full_cap(snapshot):
+    engine = ScenarioEngine(snapshot)
+    result = engine.evaluate(Scenario("全部"))
+    valid = snapshot[(snapshot["MarketCap"] > 0) & (snapshot["PE"] > 0)]
+    assert result["Count"] == len(valid)
+    assert result["PE"] == pytest.approx(
+        (valid["MarketCap"] * valid["PE"]).sum() / valid["MarketCap"].sum()
+    )
+    assert result["CapShare"] == pytest.approx(1.0)
+    # 排名包括没有有效 PE 的股票
+    top = engine.evaluate(Scenario(top=1))
+    largest = snapshot.loc[snapshot["MarketCap"].idxmax()]
+    assert top["CapShare"] == pytest.approx(
+        largest["MarketCap"] / snapshot["MarketCap"].sum()
+    )
+
+
+def test_sweeps_match_scenarios(snapshot):
+    engine = ScenarioEngine(snapshot)
+    limits = [5.0, 20.0, 1000.0]
+    for mode in ("clip", "exclude"):
+        sweep = engine.sweep_max_pe(limits, mode)
+        expected = engine.evaluate_many(
+            [Scenario(max_pe=x, pe_mode=mode) for x in limits]
+        )
+        np.testing.assert_allclose(sweep["PE"], expected["PE"], rtol=1e-12)
+        np.testing.assert_allclose(sweep["CapShare"], expected["CapShare"])
+    sweep = engine.sweep_top([0, 10, 500])
+    expected = engine.evaluate_many([Scenario(exclude_top=n) for n in (0, 10, 500)])
+    np.testing.assert_allclose(sweep["CapShare"], expected["CapShare"])
+    assert sweep["Count"].tolist() == expected["Count"].tolist()
+
+
+def test_unknown_pe_mode_is_rejected(snapshot):
+    with pytest.raises(ValueError):
+        Scenario(max_pe=50, pe_mode="cap")
+    with pytest.raises(ValueError):
+        ScenarioEngine(snapshot).sweep_max_pe([50], "cap")
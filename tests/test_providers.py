@@ -0,0 +1,146 @@
+from unittest import mock
+
+import pandas
+import pytest
+import requests
+import yfinance
+
+import providers
+import synthetic
+
+
+class FakeTicker:
+    """yf.Ticker 的假实现：访问 info 时抛出 error"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    @property
+    def info(self):
+        raise self.error
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    providers._breakers.clear()
+    yield
+    providers._breakers.clear()
+
+
+def info_with_error(error: Exception):
+    with mock.patch.object(yfinance, "Ticker", lambda ticker: FakeTicker(error)):
+        return providers.ticker_info("GONE")
+
+
+def test_missing_ticker_is_an_empty_result_and_keeps_breaker_closed():
+    for _ in range(providers.FAILURE_THRESHOLD * 2):
+        assert info_with_error(http_error(404)) == {}
+    assert providers.breaker("yfinance.info").opened_at is None
+
+
+@pytest.mark.parametrize(
+    "error", [requests.ConnectionError("reset"), TimeoutError(), http_error(503)]
+)
+def test_transport_errors_open_the_breaker(error):
+    for _ in range(providers.FAILURE_THRESHOLD):
+        with pytest.raises(type(error)):
+            info_with_error(error)
+    with pytest.raises(providers.CircuitOpenError):
+        info_with_error(error)
+
+
+def test_is_transport_error():
+    assert providers.is_transport_error(http_error(429))
+    assert providers.is_transport_error(http_error(502))
+    assert not providers.is_transport_error(http_error(404))
+    assert not providers.is_transport_error(KeyError("trailingPE"))
+
+
+class FakeSession:
+    """session() 的假实现：每次请求都返回同一个状态码"""
+
+    def __init__(self, status: int):
+        self.status = status
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        return synthetic.FakeResponse("", self.status)
+
+
+def test_repeated_5xx_responses_open_the_http_breaker():
+    fake = FakeSession(503)
+    with mock.patch.object(providers, "session", lambda: fake):
+        for _ in range(providers.FAILURE_THRESHOLD):
+            assert providers.http_get("https://example.org/x").status_code == 503
+        with pytest.raises(providers.CircuitOpenError):
+            providers.http_get("https://example.org/x")
+    assert fake.calls == providers.FAILURE_THRESHOLD
+
+
+def test_successful_response_resets_the_http_breaker():
+    with mock.patch.object(providers, "session", lambda: FakeSession(503)):
+        for _ in range(providers.FAILURE_THRESHOLD - 1):
+            providers.http_get("https://example.org/x")
+    with mock.patch.object(providers, "session", lambda: FakeSession(404)):
+        providers.http_get("https://example.org/x")
+    assert providers.breaker("example.org").failures == 0
+
+
+class FlakyYFinance:
+    """前 failures 次返回空表（yfinance 吞掉限流错误时的表现），之后返回正常数据"""
+
+    def __init__(self, failures: int, drop: tuple[str, ...] = ()):
+        bars = synthetic.daily_bars(
+            ["^AAA", "^BBB"], start="2024-01-01", end="2024-03-01"
+        )
+        self.fake = synthetic.FakeYFinance(bars)
+        self.failures = failures
+        self.drop = drop
+        self.calls = 0
+
+    def download(self, tickers, start=None, auto_adjust=True, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return pandas.DataFrame()
+        kept = [t for t in tickers if t not in self.drop]
+        return self.fake.download(kept, start=start)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(providers, "DOWNLOAD_BACKOFF", 0)
+
+
+def test_empty_download_is_retried(no_backoff):
+    fake = FlakyYFinance(failures=2)
+    with mock.patch.object(yfinance, "download", fake.download):
+        data = providers.download(["^AAA", "^BBB"])
+    assert fake.calls == 3
+    assert providers.missing_symbols(data, ["^AAA", "^BBB"]) == []
+
+
+def test_persistently_empty_download_fails_and_opens_the_breaker(no_backoff):
+    fake = FlakyYFinance(failures=100)
+    with mock.patch.object(yfinance, "download", fake.download):
+        with pytest.raises(providers.IncompleteDownloadError):
+            providers.download(["^AAA"])
+        with pytest.raises(providers.CircuitOpenError):
+            providers.download(["^AAA"])
+    # 连续失败达到熔断阈值后不再发出请求
+    assert fake.calls == providers.FAILURE_THRESHOLD
+
+
+def test_missing_symbol_fails_only_when_all_are_required(no_backoff):
+    fake = FlakyYFinance(failures=0, drop=("^BBB",))
+    with mock.patch.object(yfinance, "download", fake.download):
+        with pytest.raises(providers.IncompleteDownloadError):
+            providers.download(["^AAA", "^BBB"])
+        data = providers.download(["^AAA", "^BBB"], require_all=False)
+    assert providers.missing_symbols(data, ["^AAA", "^BBB"]) == ["^BBB"]
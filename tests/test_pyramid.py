@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas
+
+import market_change
+import pyramid
+import storage
+import synthetic
+
+NAME = market_change.series_name("sp500", pyramid.BASE_FREQ)
+
+
+def write_weekly(seed: int = 0) -> pandas.Series:
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    close = synthetic.daily_close(["^GSPC"], "2010-01-01", "2020-12-31", seed=seed)
+    weekly = close["^GSPC"].resample("W").last()
+    df = pandas.DataFrame({"Date": weekly.index, "^GSPC": weekly.to_numpy()})
+    df["Rate"] = (df["^GSPC"].pct_change() * 100).round(2)
+    df.to_csv(storage.csv_path(NAME), index=False)
+    return weekly
+
+
+def test_levels_match_pandas_resample():
+    weekly = synthetic.daily_close(["^GSPC"], "2010-01-01", "2020-12-31")["^GSPC"]
+    weekly = weekly.resample("W").last().astype(np.float32)
+    quarterly = pyramid.build_levels(weekly)["quarterly"]
+    grouped = weekly.groupby(weekly.index.to_period("Q"))
+    np.testing.assert_array_equal(quarterly["first"], grouped.first().to_numpy())
+    np.testing.assert_array_equal(quarterly["last"], grouped.last().to_numpy())
+    np.testing.assert_array_equal(quarterly["min"], grouped.min().to_numpy())
+    np.testing.assert_array_equal(quarterly["max"], grouped.max().to_numpy())
+
+
+def test_load_rebuilds_when_csv_content_changes(workdir):
+    write_weekly()
+    first = pyramid.load("sp500")
+
+    # 模拟 git checkout：CSV 内容变化，修改时间却早于金字塔文件
+    weekly = write_weekly(seed=1)
+    os.utime(storage.csv_path(NAME), (0, 0))
+    rebuilt = pyramid.load("sp500")
+    assert not np.array_equal(rebuilt.levels["weekly"], first.levels["weekly"])
+    np.testing.assert_array_equal(
+        rebuilt.levels["weekly"]["last"], weekly.to_numpy(dtype=np.float32)
+    )
+    assert sorted(os.listdir(os.path.join(pyramid.PYRAMID_DIR, "sp500"))) == sorted(
+        [f"{level}.npy" for level in pyramid.LEVELS] + ["source.txt"]
+    )
+
+
+def test_load_reuses_files_for_unchanged_csv(workdir):
+    write_weekly()
+    pyramid.load("sp500")
+    path = pyramid.level_path("sp500", "weekly")
+    mtime = os.path.getmtime(path)
+    os.utime(storage.csv_path(NAME))  # 只改变修改时间
+    pyramid.load("sp500")
+    assert os.path.getmtime(path) == mtime
@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pandas
+import pytest
+
+import risk_stats
+import synthetic
+from risk_stats import RiskStats
+
+
+@pytest.fixture
+def weekly():
+    close = synthetic.daily_close(["^DEMO"], start="2000-01-01", end="2020-12-31")
+    close = close["^DEMO"].resample("W").last()
+    df = pandas.DataFrame({"Date": close.index, "^DEMO": close.to_numpy()})
+    df["Rate"] = (df["^DEMO"].pct_change() * 100).round(2)
+    return df
+
+
+def test_summary_matches_pandas(weekly):
+    engine = RiskStats("weekly")
+    engine.update(weekly)
+    stats = engine.summary()
+
+    returns = weekly["^DEMO"].pct_change().dropna()
+    assert stats["periods"] == len(returns)
+    assert stats["volatility"] == pytest.approx(returns.std() * np.sqrt(52))
+    drawdown = weekly["^DEMO"] / weekly["^DEMO"].cummax() - 1
+    assert stats["max_drawdown"] == pytest.approx(drawdown.min())
+
+    rolling = engine.rolling()
+    expected = returns.rolling(52).std().dropna() * np.sqrt(52)
+    np.testing.assert_allclose(rolling["Volatility"], expected, rtol=1e-9)
+
+
+def test_incremental_update_equals_full_computation(weekly):
+    engine = RiskStats("weekly")
+    engine.update(weekly.iloc[:-30])
+    changed = weekly.copy()
+    assert engine.update(changed) == 30
+    full = RiskStats("weekly")
+    full.update(changed)
+    # 前缀和的累加顺序不同，只允许浮点误差
+    incremental, expected = engine.summary(), full.summary()
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert incremental[key] == pytest.approx(value)
+        else:
+            assert incremental[key] == value
+
+
+def test_open_period_is_excluded(weekly):
+    # 最后一行的周期结束日在未来，即本周尚未结束
+    future = pandas.Timestamp.today().normalize() + pandas.Timedelta(days=3)
+    partial = pandas.concat(
+        [weekly, pandas.DataFrame({"Date": [future], "^DEMO": [1.0], "Rate": [-99.0]})],
+        ignore_index=True,
+    )
+    engine = RiskStats("weekly")
+    engine.update(partial)
+    closed = RiskStats("weekly")
+    closed.update(weekly)
+    assert engine.summary() == closed.summary()
+
+
+def test_get_stats_is_consistent_across_threads(weekly):
+    expected = risk_stats.get_stats("demo_weekly", "weekly", weekly)
+    results = []
+
+    def worker(i):
+        # 各线程交替传入不同长度的序列，结果必须与各自的输入一致
+        df = weekly if i % 2 else weekly.iloc[:-52]
+        stats = risk_stats.get_stats("demo_weekly", "weekly", df)
+        results.append((i % 2, stats["periods"]))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for full, periods in results:
+        assert periods == (expected["periods"] if full else expected["periods"] - 52)
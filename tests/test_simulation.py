@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas
+import pytest
+
+import market_change
+import simulation
+import storage
+
+
+def write_annual(rows):
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    df = pandas.DataFrame(rows, columns=["Date", "^GSPC", "Rate"])
+    df.to_csv(
+        storage.csv_path(market_change.series_name("sp500", "annual")), index=False
+    )
+
+
+def test_load_returns_drops_the_open_period(workdir):
+    # 最后一行是今年截至今天的数据，周期尚未结束
+    year_end = pandas.Timestamp.today().normalize() + pandas.offsets.YearEnd(0)
+    write_annual(
+        [
+            ["2022-12-31", 100.0, None],
+            ["2023-12-31", 110.0, 10.0],
+            ["2024-12-31", 99.0, -10.0],
+            [year_end.strftime("%Y-%m-%d"), 98.0, -1.01],
+        ]
+    )
+    returns = simulation.load_returns("sp500", "annual")
+    np.testing.assert_allclose(returns, [0.1, -0.1])
+
+
+def test_single_period_paths_draw_only_closed_returns(workdir):
+    year_end = pandas.Timestamp.today().normalize() + pandas.offsets.YearEnd(0)
+    write_annual(
+        [
+            ["2023-12-31", 100.0, None],
+            ["2024-12-31", 110.0, 10.0],
+            [year_end.strftime("%Y-%m-%d"), 50.0, -54.55],
+        ]
+    )
+    returns = simulation.load_returns("sp500", "annual")
+    result = simulation.simulate(returns, horizon=1, paths=1000, seed=0, workers=1)
+    assert result.terminal == pytest.approx(np.full(1000, 1.1), rel=1e-6)
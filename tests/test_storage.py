@@ -0,0 +1,58 @@
+import os
+import threading
+
+import pandas
+
+import storage
+
+NAME = "demo_weekly_change"
+
+
+def write_csv(rows):
+    os.makedirs(storage.CSV_DIR, exist_ok=True)
+    df = pandas.DataFrame(rows, columns=["Date", "^DEMO", "Rate"])
+    df.to_csv(storage.csv_path(NAME), index=False)
+    return df
+
+
+def test_load_series_detects_changed_csv_regardless_of_mtime(workdir):
+    write_csv([["2025-01-05", 100.0, None], ["2025-01-12", 101.0, 1.0]])
+    assert len(storage.load_series(NAME)) == 2  # 生成 Parquet
+
+    # 模拟 git checkout：CSV 内容变化，但修改时间早于 Parquet
+    write_csv([["2025-01-05", 100.0, None], ["2025-01-12", 99.0, -1.0]])
+    os.utime(storage.csv_path(NAME), (0, 0))
+
+    df = storage.load_series(NAME)
+    assert df["^DEMO"].tolist() == [100.0, 99.0]
+
+
+def test_load_series_reuses_parquet_for_unchanged_csv(workdir):
+    write_csv([["2025-01-05", 100.0, None], ["2025-01-12", 101.0, 1.0]])
+    storage.load_series(NAME)
+    mtime = os.path.getmtime(storage.parquet_path(NAME))
+    os.utime(storage.csv_path(NAME))  # 只改变修改时间
+
+    storage.load_series(NAME)
+    assert os.path.getmtime(storage.parquet_path(NAME)) == mtime
+
+
+def test_concurrent_rebuilds_of_the_same_file(workdir):
+    write_csv([["2025-01-05", 100.0, None], ["2025-01-12", 101.0, 1.0]])
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def worker():
+        barrier.wait()
+        try:
+            assert len(storage.load_series(NAME)) == 2
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(storage.PARQUET_DIR) == [f"{NAME}.parquet"]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import utils
+
+
+def old_get_color(x):
+    """原来逐行调用的分档函数"""
+    if x > 5:
+        return "#1E8449"
+    elif x > 0:
+        return "#58D68D"
+    elif x > -5:
+        return "#F1948A"
+    else:
+        return "#C0392B"
+
+
+def test_rate_colors_matches_old_bands():
+    rates = np.array([-10, -5.01, -5, -4.99, -0.01, 0, 0.01, 4.99, 5, 5.01, 10, np.nan])
+    assert utils.rate_colors(rates).tolist() == [old_get_color(x) for x in rates]
+
+
+def test_lod_indices_returns_everything_for_short_series():
+    values = np.arange(10.0)
+    np.testing.assert_array_equal(utils.lod_indices(values, 10), np.arange(10))
+    np.testing.assert_array_equal(utils.lod_indices(values, 50), np.arange(10))
+
+
+@pytest.mark.parametrize("max_points", [2, 7, 100, 999])
+def test_lod_indices_keeps_ends_and_bucket_extremes(max_points):
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.normal(size=10_000))
+    values[rng.random(len(values)) < 0.05] = np.nan
+    values[3000:3400] = np.nan  # 整段缺失
+    indices = utils.lod_indices(values, max_points)
+
+    assert indices[0] == 0 and indices[-1] == len(values) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) <= max(max_points, 2) + 2
+    inner = indices[1:-1]
+    assert not np.isnan(values[inner]).any()
+
+    # 每个桶的最小值与最大值都被保留
+    buckets = max(1, max_points // 2)
+    size = -(-len(values) // buckets)
+    kept = set(indices.tolist())
+    for start in range(0, len(values), size):
+        bucket = values[start : start + size]
+        if np.isnan(bucket).all():
+            continue
+        assert start + int(np.nanargmin(bucket)) in kept
+        assert start + int(np.nanargmax(bucket)) in kept
@@ -0,0 +1,75 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from 需求价格弹性 import _安全比值, 批量弧弹性, 批量点弹性, 需求弹性计算, 需求曲线
+
+曲线列表 = [
+    lambda q: -0.5 * q + 5,
+    需求曲线,
+    lambda q: 10 * np.exp(-0.3 * q),
+    lambda q: 8 * np.asarray(q, dtype=float) ** -0.5,  # 点弹性恒为 2
+]
+
+
+def 标量弧弹性(q1: float, q2: float, f) -> float:
+    p1, p2 = float(f(np.array(q1))), float(f(np.array(q2)))
+    数量变化率 = (q2 - q1) / ((q1 + q2) / 2)
+    价格变化率 = (p2 - p1) / ((p1 + p2) / 2)
+    return abs(数量变化率 / 价格变化率)
+
+
+@pytest.fixture(autouse=True)
+def 警告视为错误():
+    # 奇异点不应触发 NumPy 的除零警告
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        yield
+
+
+def test_批量弧弹性与标量公式一致():
+    数量 = np.linspace(0.5, 9, 12)
+    q1, q2 = np.meshgrid(数量, 数量 + 0.25, indexing="ij")
+    结果 = 批量弧弹性(q1, q2, 曲线列表)
+    assert 结果.shape == (len(曲线列表), *q1.shape)
+    for i, f in enumerate(曲线列表):
+        期望 = [
+            [标量弧弹性(a, b, f) for a, b in zip(行1, 行2)] for 行1, 行2 in zip(q1, q2)
+        ]
+        np.testing.assert_allclose(结果[i], 期望, rtol=1e-12)
+        np.testing.assert_allclose(需求弹性计算(q1, q2, f), 期望, rtol=1e-12)
+
+
+def test_标量输入返回标量():
+    结果 = 需求弹性计算(1.0, 2.0, 曲线列表[0])
+    assert isinstance(结果, float)
+    assert 结果 == pytest.approx(标量弧弹性(1.0, 2.0, 曲线列表[0]))
+    assert 需求弹性计算([1.0], [2.0], 曲线列表[0]).shape == (1,)
+
+
+def test_奇异点为_inf_或_nan():
+    # 数量不变：0 / 0
+    assert np.isnan(需求弹性计算(2.0, 2.0, 曲线列表[0]))
+    # 价格不变而数量变化：完全弹性
+    水平 = [lambda q: np.full_like(q, 3.0)]
+    assert 批量弧弹性([1.0], [2.0], 水平)[0, 0] == np.inf
+    # q = 0 处价格无定义
+    assert np.isnan(需求曲线(0.0))
+    assert np.isnan(批量弧弹性([0.0], [1.0], [需求曲线])[0, 0])
+
+
+def test_安全比值():
+    结果 = _安全比值(np.array([1.0, 0.0, 0.0, np.nan, -2.0]), np.array([0, 0, 2, 0, 4]))
+    np.testing.assert_array_equal(结果, [np.inf, np.nan, 0.0, np.nan, -0.5])
+
+
+def test_批量点弹性():
+    q = np.array([0.0, 1.0, 2.0, 4.0])
+    结果 = 批量点弹性(q, [曲线列表[0], 曲线列表[3]])
+    # 线性需求 P = 5 - 0.5Q：|(P / Q) / (dP/dQ)| = (5 - 0.5Q) / (0.5Q)
+    assert 结果[0, 0] == np.inf
+    np.testing.assert_allclose(
+        结果[0, 1:], (5 - 0.5 * q[1:]) / (0.5 * q[1:]), rtol=1e-6
+    )
+    np.testing.assert_allclose(结果[1, 1:], 2.0, rtol=1e-6)